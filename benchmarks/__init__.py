@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for the WhatsApp MCP clients and servers.
+
+Run each benchmark from the repository root, e.g.:
+    python -m benchmarks.tool_catalog
+"""
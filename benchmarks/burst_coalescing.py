@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: assistant runs per inbound burst with and without coalescing.
+
+Every chat sends a burst of short messages a fraction of a second apart. The
+in-process auto-reply engine answers them through the local Assistants API
+stand-in; with --quiet-window 0 each fragment gets its own run, otherwise the
+burst is answered once.
+
+Usage:
+    python -m benchmarks.burst_coalescing --chats 5 --burst 4 --gap-ms 300
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from realtime import assistant_running
+from realtime.auto_reply import AutoReplyEngine
+from benchmarks.fakes import FakeAssistantsClient, FakeWhatsAppClient
+
+
+def run_scenario(label: str, args, quiet_window: float) -> None:
+    fake = FakeAssistantsClient(args.model_latency_ms / 1000, tool_steps=1, calls_per_step=1)
+    whatsapp = FakeWhatsAppClient(args.tool_latency_ms / 1000)
+    assistant_running.openai_client = fake
+    assistant_running.whatsapp_client = whatsapp
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = AutoReplyEngine("asst_bench", workers=0, max_concurrent_chats=args.chats,
+                                 threads_db=os.path.join(tmp, "threads.db"),
+                                 quiet_window=quiet_window, max_wait=args.max_wait)
+        engine.start()
+        start = time.perf_counter()
+        for i in range(args.burst):
+            for chat in range(args.chats):
+                engine.dispatch({"chat_jid": f"5190000{chat:04d}@s.whatsapp.net",
+                                 "content": f"fragment {i}", "is_from_me": False})
+            time.sleep(args.gap_ms / 1000)
+        engine.stop()
+        elapsed = time.perf_counter() - start
+
+    snapshot = engine.metrics.snapshot()
+    print(f"{label:12s} runs={snapshot['runs']:3d}  cancelled={snapshot['cancelled_runs']:3d}  "
+          f"replies sent={len(whatsapp.sent):3d}  api calls={fake.api_calls:4d}  "
+          f"e2e p50={snapshot['end_to_end']['p50']:6.3f}s  wall={elapsed:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=5)
+    parser.add_argument("--burst", type=int, default=4, help="Messages per chat")
+    parser.add_argument("--gap-ms", type=float, default=300.0, help="Gap between messages of a burst")
+    parser.add_argument("--quiet-window", type=float, default=1.0)
+    parser.add_argument("--max-wait", type=float, default=8.0)
+    parser.add_argument("--model-latency-ms", type=float, default=300.0)
+    parser.add_argument("--tool-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    run_scenario("per-message", args, quiet_window=0)
+    run_scenario("coalesced", args, quiet_window=args.quiet_window)
+
+
+if __name__ == "__main__":
+    main()
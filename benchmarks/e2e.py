@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark: the real clients against local stand-ins.
+
+Every scenario drives unmodified repository code; only the outside world is
+replaced:
+
+- WhatsApp bridge + SQLite store -> benchmarks.fake_whatsapp (behind the real
+  server/main.py tools, served over stdio or HTTP JSON-RPC)
+- Anthropic Messages / OpenAI Assistants -> benchmarks.fake_llm
+
+Scenarios:
+    send_message       client_request1.send_whatsapp_message (spawns the stdio server)
+    send_message_shared  the same against one long-running streamable-http server
+    read_messages      client_response.read_whatsapp_messages (spawns the stdio server)
+    http_client        claude_chat_client.WhatsAppMCPClient over HTTP JSON-RPC
+    web_send           web_app POST /send
+    agent_loop         client/main.py WhatsAppMCPClient.process_query
+    assistant_run      realtime.assistant_running.stream_run
+
+The report (throughput, p50/p95/p99 per scenario, git commit, parameters) is
+written as JSON so two commits can be compared:
+
+    python -m benchmarks.e2e --output before.json
+    git checkout other-branch
+    python -m benchmarks.e2e --compare before.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from typing import Any, Callable, Dict, List, Optional
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+# Keep the scheduler in memory and out of the way of the measurements
+os.environ.setdefault("LLM_SCHEDULER_STATE", "")
+os.environ.setdefault("LLM_RATE_LIMITS", json.dumps({
+    "anthropic": {"rpm": 100000, "tpm": 100000000},
+    "openai": {"rpm": 100000, "tpm": 100000000},
+}))
+
+from latency_stats import summarize
+from benchmarks import fake_whatsapp
+from benchmarks.fake_llm import FakeLLMServer
+from benchmarks.fake_mcp_server import start_http_server, stdio_command
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# Seeded contact 0 of the fake store (see FakeWhatsAppStore._seed)
+FIRST_CONTACT = "51910000000"
+AGENT_QUERIES = [
+    "Muéstrame mis chats recientes",
+    "Envía un mensaje a 51959812636 diciendo que llego en 10 minutos",
+    "¿Qué me escribió Ana hoy?",
+]
+
+
+class Recorder:
+    """Latency samples and error counts for one scenario"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.elapsed: Dict[str, float] = {}
+
+    def measure(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Time fn(); a falsy result or an exception counts as an error"""
+        start = time.perf_counter()
+        try:
+            result = fn()
+            ok = bool(result) or result == []
+        except Exception:
+            result, ok = None, False
+        self.record(name, time.perf_counter() - start, ok)
+        return result
+
+    def record(self, name: str, duration: float, ok: bool) -> None:
+        self.samples.setdefault(name, []).append(duration)
+        self.elapsed[name] = self.elapsed.get(name, 0.0) + duration
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        rows = {}
+        for name, samples in self.samples.items():
+            row = summarize(samples)
+            row["errors"] = self.errors.get(name, 0)
+            row["throughput"] = len(samples) / self.elapsed[name] if self.elapsed[name] else 0.0
+            rows[name] = row
+        return rows
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """Swallow the clients' progress prints while measuring"""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def server_command(args) -> List[str]:
+    return stdio_command(sys.executable, args.chats, args.messages_per_chat, args.bridge_latency_ms)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    """Block until something accepts connections on 127.0.0.1:port"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"nothing listening on port {port} after {timeout}s")
+
+
+# --- Scenarios -------------------------------------------------------------
+
+def scenario_send_message(args, recorder: Recorder) -> None:
+    import client_request1
+    client_request1.SERVER_COMMAND = server_command(args)
+    for i in range(args.spawn_iterations):
+        with quiet(args.quiet):
+            recorder.measure("send_message", lambda: client_request1.send_whatsapp_message(
+                "51959812636", f"Mensaje de prueba {i}"))
+
+
+def scenario_send_message_shared(args, recorder: Recorder) -> None:
+    import client_request1
+    port = free_port()
+    command = server_command(args) + ["--transport", "streamable-http", "--port", str(port)]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client_request1.SERVER_URL = f"http://127.0.0.1:{port}/mcp"
+    try:
+        wait_for_port(port)
+        for i in range(args.iterations):
+            with quiet(args.quiet):
+                recorder.measure("send_message_shared", lambda: client_request1.send_whatsapp_message(
+                    "51959812636", f"Mensaje de prueba {i}"))
+    finally:
+        client_request1.SERVER_URL = None
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def scenario_read_messages(args, recorder: Recorder) -> None:
+    import client_response
+    client_response.SERVER_COMMAND = server_command(args)
+    for _ in range(args.spawn_iterations):
+        with quiet(args.quiet):
+            recorder.measure("read_messages", lambda: client_response.read_whatsapp_messages(FIRST_CONTACT, limit=15))
+
+
+def scenario_http_client(args, recorder: Recorder) -> None:
+    from claude_chat_client import WhatsAppMCPClient
+    server, url = start_http_server(rtt=args.rtt_ms / 1000)
+    try:
+        client = WhatsAppMCPClient(url)
+        store = fake_whatsapp.store()
+        chat_jid = f"{FIRST_CONTACT}@s.whatsapp.net"
+        for i in range(args.iterations):
+            recorder.measure("http_client.list_chats", lambda: client.list_chats(limit=20))
+            recorder.measure("http_client.list_messages", lambda: client.list_messages(chat_jid=chat_jid, limit=20))
+            recorder.measure("http_client.send_message",
+                             lambda: client.send_message("51959812636", f"Mensaje {i}").get("success"))
+            store.push_inbound(3)
+            recorder.measure("http_client.check_new_messages", lambda: client.check_new_messages())
+    finally:
+        server.shutdown()
+
+
+# Minimal index.html used when the checkout has no templates/ directory
+FALLBACK_TEMPLATE = "{% if success %}OK {{ success }}{% endif %}{% if error %}ERROR {{ error }}{% endif %}"
+
+
+def web_app_module(templates_dir: str):
+    """Import web_app, supplying the pieces this checkout does not ship (client_request2, templates/)"""
+    if "client_request2" not in sys.modules:
+        try:
+            import client_request2  # noqa: F401
+        except ImportError:
+            # web_app expects a dict-returning sender; adapt client_request1
+            import client_request1
+            stand_in = types.ModuleType("client_request2")
+
+            def send_whatsapp_message(phone_number: str, message: str) -> Dict[str, Any]:
+                timings: Dict[str, float] = {}
+                ok = client_request1.send_whatsapp_message(phone_number, message, timings)
+                return {"success": ok, "message": "Mensaje enviado" if ok else "Error al enviar",
+                        "timings": timings}
+
+            stand_in.send_whatsapp_message = send_whatsapp_message
+            sys.modules["client_request2"] = stand_in
+    import web_app
+    if not os.path.exists(os.path.join(REPO_ROOT, "templates", "index.html")):
+        from fastapi.templating import Jinja2Templates
+        with open(os.path.join(templates_dir, "index.html"), "w", encoding="utf-8") as f:
+            f.write(FALLBACK_TEMPLATE)
+        web_app.templates = Jinja2Templates(directory=templates_dir)
+    return web_app
+
+
+def scenario_web_send(args, recorder: Recorder) -> Optional[str]:
+    import client_request1
+    client_request1.SERVER_COMMAND = server_command(args)
+
+    with tempfile.TemporaryDirectory() as templates_dir:
+        try:
+            from fastapi.testclient import TestClient
+            web_app = web_app_module(templates_dir)
+        except ImportError as e:
+            return f"skipped: {e}"
+        client = TestClient(web_app.app)
+        for i in range(args.spawn_iterations):
+            with quiet(args.quiet):
+                recorder.measure("web_send", lambda: client.post(
+                    "/send", data={"phone_number": "51959812636", "message": f"Hola {i}"}).status_code == 200)
+    return None
+
+
+def scenario_agent_loop(args, recorder: Recorder, llm: FakeLLMServer) -> None:
+    from anthropic import AsyncAnthropic
+    from client import main as client_main
+    client_main.SERVER_COMMAND = server_command(args)
+
+    async def run():
+        with quiet(args.quiet):
+            client = client_main.WhatsAppMCPClient()
+        client.anthropic = AsyncAnthropic(api_key="benchmark", base_url=llm.url, max_retries=0)
+        try:
+            start = time.perf_counter()
+            with quiet(args.quiet):
+                connected = await client.connect_to_whatsapp_server()
+            recorder.record("agent_loop.connect", time.perf_counter() - start, connected)
+            if not connected:
+                return
+            for i in range(args.iterations):
+                query = AGENT_QUERIES[i % len(AGENT_QUERIES)]
+                start = time.perf_counter()
+                try:
+                    with quiet(args.quiet):
+                        ok = bool(await client.process_query(query))
+                except Exception:
+                    ok = False
+                recorder.record("agent_loop.query", time.perf_counter() - start, ok)
+        finally:
+            with quiet(args.quiet):
+                await client.cleanup()
+
+    asyncio.run(run())
+
+
+def scenario_assistant_run(args, recorder: Recorder, llm: FakeLLMServer) -> None:
+    import openai
+    from claude_chat_client import WhatsAppMCPClient
+    from realtime import assistant_running
+
+    server, url = start_http_server(rtt=args.rtt_ms / 1000)
+    assistant_running.openai_client = openai.OpenAI(api_key="benchmark", base_url=f"{llm.url}/v1", max_retries=0)
+    assistant_running.whatsapp_client = WhatsAppMCPClient(url)
+    try:
+        for i in range(args.iterations):
+            thread = assistant_running.openai_client.beta.threads.create()
+            assistant_running.openai_client.beta.threads.messages.create(
+                thread_id=thread.id, role="user", content=AGENT_QUERIES[i % len(AGENT_QUERIES)])
+            with quiet(args.quiet):
+                recorder.measure("assistant_run", lambda: assistant_running.stream_run(
+                    thread.id, "asst_benchmark")["status"] == "completed")
+    finally:
+        server.shutdown()
+
+
+SCENARIOS = ["send_message", "send_message_shared", "read_messages", "http_client", "web_send", "agent_loop", "assistant_run"]
+
+
+# --- Report ----------------------------------------------------------------
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(results: Dict[str, Dict[str, Any]], skipped: Dict[str, str]) -> None:
+    print(f"\n{'scenario':<34}{'n':>5}{'err':>5}{'p50 ms':>10}{'p99 ms':>10}{'ops/s':>9}")
+    for name, row in results.items():
+        print(f"{name:<34}{row['count']:>5}{row['errors']:>5}{row['p50'] * 1000:>10.1f}"
+              f"{row['p99'] * 1000:>10.1f}{row['throughput']:>9.2f}")
+    for name, reason in skipped.items():
+        print(f"{name:<34}{reason}")
+
+
+def print_comparison(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any]) -> None:
+    """Relative change of p50/p99/throughput against a previous report"""
+    print(f"\nvs {baseline['meta']['commit']} ({baseline['meta']['timestamp']})")
+    print(f"{'scenario':<34}{'p50':>10}{'p99':>10}{'ops/s':>10}")
+
+    def delta(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    for name, row in results.items():
+        old = baseline["scenarios"].get(name)
+        if not old:
+            print(f"{name:<34}{'(new)':>10}")
+            continue
+        print(f"{name:<34}{delta(row['p50'], old['p50']):>10}{delta(row['p99'], old['p99']):>10}"
+              f"{delta(row['throughput'], old['throughput']):>10}")
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="End-to-end benchmark against local WhatsApp/LLM stand-ins")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--iterations", type=int, default=20, help="Iterations for in-process scenarios")
+    parser.add_argument("--spawn-iterations", type=int, default=3,
+                        help="Iterations for scenarios that start a server per call")
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--messages-per-chat", type=int, default=200)
+    parser.add_argument("--bridge-latency-ms", type=float, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=30, help="Round trip added by the HTTP server (tunnel)")
+    parser.add_argument("--ttft-ms", type=float, default=300, help="LLM time to first token")
+    parser.add_argument("--token-latency-ms", type=float, default=5, help="LLM time per streamed token")
+    parser.add_argument("--output", help="Report path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Previous report to compare against")
+    parser.add_argument("--verbose", dest="quiet", action="store_false", help="Show the clients' own output")
+    args = parser.parse_args(argv)
+
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # The stdio server is started as `python -m benchmarks.fake_mcp_server`
+    os.chdir(REPO_ROOT)
+    # Importing server/main.py turns on INFO logging; keep per-request lines out
+    for name in ("httpx", "mcp"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    fake_whatsapp.configure(chats=args.chats, messages_per_chat=args.messages_per_chat,
+                            bridge_latency=args.bridge_latency_ms / 1000)
+    llm = FakeLLMServer(ttft=args.ttft_ms / 1000, token_latency=args.token_latency_ms / 1000).start()
+
+    recorder = Recorder()
+    skipped: Dict[str, str] = {}
+    try:
+        for name in selected:
+            print(f"▶ {name}")
+            runner = globals()[f"scenario_{name}"]
+            try:
+                outcome = runner(args, recorder, llm) if name in ("agent_loop", "assistant_run") else runner(args, recorder)
+            except Exception as e:
+                outcome = f"failed: {type(e).__name__}: {e}"
+            if outcome:
+                skipped[name] = outcome
+    finally:
+        llm.stop()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        "scenarios": recorder.report(),
+        "skipped": skipped,
+    }
+    print_report(report["scenarios"], skipped)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Report written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(report["scenarios"], json.load(f))
+    return report
+
+
+if __name__ == "__main__":
+    main()
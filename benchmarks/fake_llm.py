@@ -0,0 +1,315 @@
+"""
+Local HTTP stand-ins for the Anthropic and OpenAI APIs with configurable latency.
+
+One server answers both:
+- Anthropic Messages API: POST /v1/messages, plain JSON or SSE streaming.
+  Point the SDK at it with base_url=<url> (or ANTHROPIC_BASE_URL).
+- OpenAI Assistants API (threads, messages, runs, streamed runs, tool-output
+  submission and cancel): base_url=<url>/v1 (or OPENAI_BASE_URL).
+
+The "model" is scripted. When tools are offered and no tool result has come
+back yet, it calls one tool picked from keywords in the user's message
+(send -> send_message, messages -> list_messages, contact -> search_contacts,
+otherwise list_chats). Once the results are in, it answers with text. An
+assistant run asks for `tool_steps` rounds of tool calls before replying.
+
+Every model step waits `ttft` seconds before its first token and
+`token_latency` seconds per streamed text chunk.
+"""
+
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+
+from benchmarks.fakes import TOOL_PLAN
+
+TOOL_RULES = [
+    (("envia", "envía", "manda", "send", "reply", "responde"), "send_message",
+     {"recipient": "51959812636", "message": "Hola desde el benchmark"}),
+    (("mensaje", "message"), "list_messages", {"limit": 10, "include_context": False}),
+    (("contacto", "contact", "busca", "search"), "search_contacts", {"query": "Ana"}),
+]
+DEFAULT_TOOL = ("list_chats", {"limit": 10})
+REPLY = "Listo. Revisé tu WhatsApp y todo está en orden; avísame si necesitas algo más."
+
+
+def _text_of(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def pick_tool(text: str, tool_names: List[str]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Tool call the scripted model makes for a user message"""
+    lowered = text.lower()
+    for keywords, name, args in TOOL_RULES:
+        if name in tool_names and any(keyword in lowered for keyword in keywords):
+            return name, args
+    if DEFAULT_TOOL[0] in tool_names:
+        return DEFAULT_TOOL
+    return None
+
+
+class FakeLLMServer:
+    """Threaded HTTP server speaking enough of both APIs for the repo's clients"""
+
+    def __init__(self, ttft: float = 0.3, token_latency: float = 0.005, tool_steps: int = 1,
+                 calls_per_step: int = 2, port: int = 0, host: str = "127.0.0.1"):
+        """
+        Initialize the server (call start() to serve)
+
+        Args:
+            ttft: Seconds before the first token of every model step
+            token_latency: Seconds per streamed text chunk
+            tool_steps: requires_action rounds per assistant run
+            calls_per_step: Tool calls per requires_action round
+        """
+        self.ttft = ttft
+        self.token_latency = token_latency
+        self.tool_steps = tool_steps
+        self.calls_per_step = calls_per_step
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._threads: Dict[str, List[Dict[str, Any]]] = {}
+        self._runs: Dict[str, Dict[str, Any]] = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+
+    def start(self) -> "FakeLLMServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids):06d}"
+
+    # -- Anthropic -------------------------------------------------------
+
+    def anthropic_reply(self, body: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        """(stop_reason, content blocks) for a Messages API request"""
+        messages = body.get("messages", [])
+        last = messages[-1] if messages else {"content": ""}
+        has_results = isinstance(last.get("content"), list) and any(
+            isinstance(block, dict) and block.get("type") == "tool_result" for block in last["content"]
+        )
+        tool_names = [tool["name"] for tool in body.get("tools", [])]
+        choice = None if has_results else pick_tool(_text_of(messages[0]["content"]) if messages else "", tool_names)
+        if choice is None:
+            return "end_turn", [{"type": "text", "text": REPLY}]
+        name, args = choice
+        return "tool_use", [{"type": "tool_use", "id": self._id("toolu"), "name": name, "input": args}]
+
+    def anthropic_message(self, body: Dict[str, Any], stop_reason: str, content: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "id": self._id("msg"), "type": "message", "role": "assistant", "model": body.get("model", "fake"),
+            "content": content, "stop_reason": stop_reason, "stop_sequence": None,
+            "usage": {"input_tokens": len(json.dumps(body.get("messages", []))) // 4,
+                      "output_tokens": sum(len(json.dumps(block)) // 4 for block in content)},
+        }
+
+    def anthropic_events(self, body: Dict[str, Any]):
+        """SSE events of a streamed Messages API response"""
+        stop_reason, content = self.anthropic_reply(body)
+        message = self.anthropic_message(body, stop_reason, content)
+        yield "message_start", {"type": "message_start", "message": {**message, "content": [], "stop_reason": None}}
+        time.sleep(self.ttft)
+        for index, block in enumerate(content):
+            if block["type"] == "text":
+                yield "content_block_start", {"type": "content_block_start", "index": index,
+                                              "content_block": {"type": "text", "text": ""}}
+                for chunk in re.findall(r"\S+\s*", block["text"]):
+                    time.sleep(self.token_latency)
+                    yield "content_block_delta", {"type": "content_block_delta", "index": index,
+                                                  "delta": {"type": "text_delta", "text": chunk}}
+            else:
+                yield "content_block_start", {"type": "content_block_start", "index": index,
+                                              "content_block": {**block, "input": {}}}
+                yield "content_block_delta", {"type": "content_block_delta", "index": index,
+                                              "delta": {"type": "input_json_delta",
+                                                        "partial_json": json.dumps(block["input"])}}
+            yield "content_block_stop", {"type": "content_block_stop", "index": index}
+        yield "message_delta", {"type": "message_delta", "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                                "usage": {"output_tokens": message["usage"]["output_tokens"]}}
+        yield "message_stop", {"type": "message_stop"}
+
+    # -- OpenAI Assistants -----------------------------------------------
+
+    def _message(self, thread_id: str, role: str, text: str, run_id: Optional[str] = None) -> Dict[str, Any]:
+        message = {
+            "id": self._id("msg"), "object": "thread.message", "created_at": int(time.time()),
+            "thread_id": thread_id, "role": role, "status": "completed", "run_id": run_id, "assistant_id": None,
+            "attachments": [], "metadata": {},
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+        }
+        with self._lock:
+            self._threads.setdefault(thread_id, []).insert(0, message)
+        return message
+
+    def _new_run(self, thread_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        run = {
+            "id": self._id("run"), "object": "thread.run", "created_at": int(time.time()), "thread_id": thread_id,
+            "assistant_id": body.get("assistant_id"), "status": "queued", "required_action": None,
+            "last_error": None, "model": "gpt-4o", "instructions": "", "tools": [], "usage": None,
+            "step": 0, "phase_started": time.monotonic(),
+        }
+        with self._lock:
+            self._runs[run["id"]] = run
+        return run
+
+    @staticmethod
+    def _public(run: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in run.items() if key not in ("step", "phase_started")}
+
+    def _required_action(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        calls = []
+        for i in range(self.calls_per_step):
+            name, args = TOOL_PLAN[(run["step"] * self.calls_per_step + i) % len(TOOL_PLAN)]
+            calls.append({"id": self._id("call"), "type": "function",
+                          "function": {"name": name, "arguments": json.dumps(args)}})
+        return {"type": "submit_tool_outputs", "submit_tool_outputs": {"tool_calls": calls}}
+
+    def _finish_step(self, run: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Move a run past its current model step; returns the reply message when it completes"""
+        if run["step"] < self.tool_steps:
+            run["status"] = "requires_action"
+            run["required_action"] = self._required_action(run)
+            return None
+        run["status"] = "completed"
+        run["required_action"] = None
+        run["usage"] = {"prompt_tokens": 800, "completion_tokens": 60, "total_tokens": 860}
+        return self._message(run["thread_id"], "assistant", REPLY, run["id"])
+
+    def run_events(self, run: Dict[str, Any]):
+        """SSE events of one streamed run segment"""
+        if run["step"] == 0:
+            yield "thread.run.created", self._public(run)
+        run["status"] = "in_progress"
+        yield "thread.run.in_progress", self._public(run)
+        time.sleep(self.ttft)
+        if run["status"] == "cancelled":
+            yield "thread.run.cancelled", self._public(run)
+            return
+        message = self._finish_step(run)
+        if message is None:
+            yield "thread.run.requires_action", self._public(run)
+            return
+        yield "thread.message.created", {**message, "content": [], "status": "in_progress"}
+        yield "thread.message.completed", message
+        yield "thread.run.completed", self._public(run)
+
+    def retrieve_run(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        """Polling API: advance the run once its model step has taken ttft seconds"""
+        if run["status"] in ("queued", "in_progress") and time.monotonic() - run["phase_started"] >= self.ttft:
+            self._finish_step(run)
+        return self._public(run)
+
+    def submit_tool_outputs(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        run["step"] += 1
+        run["status"] = "in_progress"
+        run["required_action"] = None
+        run["phase_started"] = time.monotonic()
+        return run
+
+    def openai(self, method: str, path: str, query: Dict[str, str], body: Dict[str, Any]):
+        """Route an Assistants API request; returns (status, json) or ("stream", events)"""
+        parts = path.strip("/").split("/")[1:]  # drop "v1"
+        if parts[:1] == ["assistants"]:
+            return 200, {"id": parts[1] if len(parts) > 1 else self._id("asst"), "object": "assistant",
+                         "model": body.get("model", "gpt-4o"), "name": body.get("name"), "tools": []}
+        if parts == ["threads"] and method == "POST":
+            thread_id = self._id("thread")
+            with self._lock:
+                self._threads[thread_id] = []
+            return 200, {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}}
+        thread_id = parts[1]
+        if parts[2:] == ["messages"]:
+            if method == "POST":
+                return 200, self._message(thread_id, body.get("role", "user"), _text_of(body.get("content", "")))
+            data = self._threads.get(thread_id, [])[:int(query.get("limit", 20))]
+            return 200, {"object": "list", "data": data, "has_more": False,
+                         "first_id": data[0]["id"] if data else None, "last_id": data[-1]["id"] if data else None}
+        if parts[2:] == ["runs"]:
+            run = self._new_run(thread_id, body)
+            return ("stream", self.run_events(run)) if body.get("stream") else (200, self._public(run))
+        run = self._runs.get(parts[3]) if len(parts) > 3 else None
+        if run is None:
+            return 404, {"error": {"message": "No such run", "type": "invalid_request_error"}}
+        action = parts[4] if len(parts) > 4 else None
+        if action == "submit_tool_outputs":
+            self.submit_tool_outputs(run)
+            return ("stream", self.run_events(run)) if body.get("stream") else (200, self._public(run))
+        if action == "cancel":
+            if run["status"] not in ("completed", "failed", "expired"):
+                run["status"] = "cancelled"
+            return 200, self._public(run)
+        return 200, self.retrieve_run(run)
+
+    # -- HTTP ------------------------------------------------------------
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _json(self, status: int, payload: Dict[str, Any]) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, events, done: bool) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for name, data in events:
+                    self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                if done:
+                    self.wfile.write(b"event: done\ndata: [DONE]\n\n")
+                self.wfile.flush()
+
+            def _dispatch(self, method: str) -> None:
+                with server._lock:
+                    server.requests += 1
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                path, _, raw_query = self.path.partition("?")
+                query = dict(item.split("=", 1) for item in raw_query.split("&") if "=" in item)
+                if path.rstrip("/") == "/v1/messages":
+                    if body.get("stream"):
+                        self._stream(server.anthropic_events(body), done=False)
+                    else:
+                        stop_reason, content = server.anthropic_reply(body)
+                        time.sleep(server.ttft + server.token_latency * len(REPLY.split()))
+                        self._json(200, server.anthropic_message(body, stop_reason, content))
+                    return
+                status, payload = server.openai(method, path, query, body)
+                if status == "stream":
+                    self._stream(payload, done=True)
+                else:
+                    self._json(status, payload)
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+The real server/main.py tools on top of the fake WhatsApp store.
+
+Two ways to serve them:
+
+- stdio (what client/main.py, client_request1 and client_response spawn):
+      python -m benchmarks.fake_mcp_server --chats 50 --messages-per-chat 200
+  or the server's own network transports (see server/http_transport.py):
+      python -m benchmarks.fake_mcp_server --transport streamable-http --port 8000
+- JSON-RPC over HTTP, like the remote server claude_chat_client talks to:
+      server, url = start_http_server(rtt=0.03)
+
+The HTTP variant also offers the remote server's check_new_messages and
+mark_messages_as_seen tools, and can add a fixed round-trip time to stand
+in for the ngrok tunnel.
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from benchmarks import fake_whatsapp
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server")
+
+
+def load_server():
+    """Import server/main.py with the fake `whatsapp` module behind it"""
+    fake_whatsapp.install()
+    # The fake store lives in this process, so audio calls can't go to a process pool
+    os.environ.setdefault("MCP_TOOL_CLASSES", json.dumps({"audio": {"executor": "thread"}}))
+    # server/main.py imports its siblings (metrics) as top-level modules
+    if SERVER_DIR not in sys.path:
+        sys.path.insert(0, SERVER_DIR)
+    from server import main as server_main
+    return server_main
+
+
+def stdio_command(python: str, chats: int = 50, messages_per_chat: int = 200, bridge_latency_ms: float = 20) -> list:
+    """Command line that starts the stdio server (run with the repository root as cwd)"""
+    return [python, "-m", "benchmarks.fake_mcp_server", "--chats", str(chats),
+            "--messages-per-chat", str(messages_per_chat), "--bridge-latency-ms", str(bridge_latency_ms)]
+
+
+def http_tools() -> Tuple[Dict[str, Callable[..., Any]], list]:
+    """Tool functions and tools/list entries served over HTTP"""
+    server_main = load_server()
+    definitions = [tool.model_dump(exclude_none=True) for tool in asyncio.run(server_main.mcp.list_tools())]
+    functions = {definition["name"]: getattr(server_main, definition["name"]) for definition in definitions}
+    functions["check_new_messages"] = fake_whatsapp.check_new_messages
+    functions["mark_messages_as_seen"] = fake_whatsapp.mark_messages_as_seen
+    definitions += [
+        {"name": "check_new_messages", "description": "Check for new WhatsApp messages since the last check.",
+         "inputSchema": {"type": "object", "properties": {"mark_as_seen": {"type": "boolean"}}}},
+        {"name": "mark_messages_as_seen", "description": "Mark all current messages as seen.",
+         "inputSchema": {"type": "object", "properties": {}}},
+    ]
+    return functions, definitions
+
+
+def start_http_server(port: int = 0, rtt: float = 0.0, auth_token: Optional[str] = None,
+                      host: str = "127.0.0.1") -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Serve the tools as JSON-RPC 2.0 over HTTP POST in a background thread
+
+    Args:
+        port: Port to bind (0 picks a free one)
+        rtt: Extra seconds added to every request (tunnel round trip)
+        auth_token: Bearer token required on requests, if set
+
+    Returns:
+        (server, base URL)
+    """
+    functions, definitions = http_tools()
+
+    def handle(request: Dict[str, Any]) -> Dict[str, Any]:
+        method, params = request.get("method"), request.get("params") or {}
+        if method == "initialize":
+            result = {"protocolVersion": "2024-11-05", "capabilities": {"tools": {}},
+                      "serverInfo": {"name": "whatsapp-fake", "version": "1.0.0"}}
+        elif method == "tools/list":
+            result = {"tools": definitions}
+        elif method == "tools/call":
+            function = functions.get(params.get("name"))
+            if function is None:
+                return {"jsonrpc": "2.0", "id": request.get("id"),
+                        "error": {"code": -32602, "message": f"Unknown tool: {params.get('name')}"}}
+            try:
+                value = function(**(params.get("arguments") or {}))
+                if inspect.isawaitable(value):
+                    # server/main.py tools are async (their WhatsApp calls run in tool_pools executors)
+                    value = asyncio.run(value)
+                result = {"content": [{"type": "text", "text": json.dumps(value, default=str)}], "isError": False}
+            except Exception as e:
+                result = {"content": [{"type": "text", "text": str(e)}], "isError": True}
+        else:
+            return {"jsonrpc": "2.0", "id": request.get("id"),
+                    "error": {"code": -32601, "message": f"Method not found: {method}"}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            return not auth_token or self.headers.get("Authorization") == f"Bearer {auth_token}"
+
+        def do_GET(self):
+            if rtt:
+                time.sleep(rtt)
+            self._send(200, {"name": "whatsapp-fake", "status": "ok", "tools": len(definitions)})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if rtt:
+                time.sleep(rtt)
+            if not self._authorized():
+                self._send(401, {"error": "unauthorized"})
+                return
+            self._send(200, handle(request))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="server/main.py on a fake WhatsApp store")
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--messages-per-chat", type=int, default=200)
+    parser.add_argument("--bridge-latency-ms", type=float, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--transport", choices=["stdio", "streamable-http", "sse"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--auth-token")
+    parser.add_argument("--max-sessions", type=int, default=64)
+    parser.add_argument("--stateless", action="store_true")
+    parser.add_argument("--json-response", action="store_true")
+    args = parser.parse_args()
+
+    fake_whatsapp.configure(chats=args.chats, messages_per_chat=args.messages_per_chat,
+                            bridge_latency=args.bridge_latency_ms / 1000, seed=args.seed)
+    # Keep the per-request INFO lines out of the client's stderr
+    logging.getLogger("mcp").setLevel(logging.WARNING)
+    server_main = load_server()
+    if args.transport == "stdio":
+        server_main.mcp.run(transport="stdio")
+        return
+    from http_transport import configure, serve
+    configure(server_main.mcp, args.host, args.port, args.max_sessions or None, 1800,
+              stateless=args.stateless, json_response=args.json_response)
+    serve(server_main.mcp, args.transport, args.auth_token, args.max_sessions or None)
+
+
+if __name__ == "__main__":
+    main()
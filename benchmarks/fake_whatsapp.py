@@ -0,0 +1,321 @@
+"""
+Stand-in for the `whatsapp` module that server/main.py imports.
+
+The real module reads the bridge's SQLite message store and sends through the
+Go bridge's HTTP API. This one keeps a seeded in-memory SQLite store with the
+same kind of data and simulates the bridge round trip for sends and
+downloads with a fixed latency, so the real server/main.py tool functions run
+unchanged on top of it.
+
+Volumes and latency come from the environment, so a stdio server subprocess
+can be configured too:
+    FAKE_WA_CHATS               chats (and contacts) to seed (default 50)
+    FAKE_WA_MESSAGES_PER_CHAT   messages per chat (default 200)
+    FAKE_WA_BRIDGE_LATENCY_MS   bridge round trip for sends/downloads (default 20)
+    FAKE_WA_SEED                random seed (default 7)
+
+Call install() before importing server.main.
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from benchmarks.payloads import FIRST_NAMES, LAST_NAMES, PHRASES
+
+
+class FakeWhatsAppStore:
+    """Seeded message store plus a simulated bridge"""
+
+    def __init__(self, chats: int = 50, messages_per_chat: int = 200, bridge_latency: float = 0.02, seed: int = 7):
+        self.bridge_latency = bridge_latency
+        self.sent = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seen_rowid = 0
+        self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript("""
+            CREATE TABLE contacts (jid TEXT PRIMARY KEY, phone_number TEXT, name TEXT);
+            CREATE TABLE chats (jid TEXT PRIMARY KEY, name TEXT, last_message_time TEXT);
+            CREATE TABLE messages (
+                id TEXT, chat_jid TEXT, sender TEXT, content TEXT, timestamp TEXT,
+                is_from_me INTEGER, media_type TEXT
+            );
+            CREATE INDEX idx_messages_chat ON messages (chat_jid, timestamp);
+            CREATE INDEX idx_messages_sender ON messages (sender, timestamp);
+            CREATE INDEX idx_messages_id ON messages (id);
+        """)
+        self._seed(chats, messages_per_chat)
+        self._seen_rowid = self.db.execute("SELECT COALESCE(MAX(rowid), 0) FROM messages").fetchone()[0]
+
+    def _seed(self, chats: int, messages_per_chat: int) -> None:
+        rng = self._rng
+        start = datetime(2025, 6, 1, 9, 0, 0)
+        contacts, chat_rows, messages = [], [], []
+        for i in range(chats):
+            phone = f"519{10000000 + i * 7919 % 89999999}"
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            jid = f"{phone}@s.whatsapp.net"
+            contacts.append((jid, phone, name))
+            last = start
+            for j in range(messages_per_chat):
+                last = start + timedelta(minutes=3 * j + i)
+                is_from_me = rng.random() < 0.45
+                media_type = rng.choice([None] * 8 + ["image", "audio"])
+                messages.append((
+                    f"3EB0{rng.getrandbits(64):016X}", jid, "me" if is_from_me else phone,
+                    "" if media_type else rng.choice(PHRASES), last.isoformat(), int(is_from_me), media_type
+                ))
+            chat_rows.append((jid, name, last.isoformat()))
+        self.db.executemany("INSERT INTO contacts VALUES (?, ?, ?)", contacts)
+        self.db.executemany("INSERT INTO chats VALUES (?, ?, ?)", chat_rows)
+        self.db.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)", messages)
+        self.db.commit()
+
+    def query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self.db.execute(sql, params).fetchall()]
+
+    def _message(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        row["is_from_me"] = bool(row["is_from_me"])
+        return row
+
+    def add_message(self, chat_jid: str, sender: str, content: str, is_from_me: bool,
+                    media_type: Optional[str] = None) -> Dict[str, Any]:
+        """Insert a message (an outgoing send or a simulated inbound message)"""
+        now = datetime.now().isoformat()
+        message = {
+            "id": f"3EB0{self._rng.getrandbits(64):016X}", "chat_jid": chat_jid, "sender": sender,
+            "content": content, "timestamp": now, "is_from_me": is_from_me, "media_type": media_type,
+        }
+        with self._lock:
+            self.db.execute("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)", (
+                message["id"], chat_jid, sender, content, now, int(is_from_me), media_type
+            ))
+            self.db.execute("INSERT OR IGNORE INTO chats VALUES (?, ?, ?)", (chat_jid, chat_jid.split("@")[0], now))
+            self.db.execute("UPDATE chats SET last_message_time = ? WHERE jid = ?", (now, chat_jid))
+            self.db.commit()
+        return message
+
+    def push_inbound(self, count: int = 1, chat_jid: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Simulate messages arriving from contacts"""
+        jids = [row["jid"] for row in self.query("SELECT jid FROM chats")]
+        pushed = []
+        for _ in range(count):
+            jid = chat_jid or self._rng.choice(jids)
+            pushed.append(self.add_message(jid, jid.split("@")[0], self._rng.choice(PHRASES), False))
+        return pushed
+
+    def bridge(self) -> None:
+        """One simulated round trip to the Go bridge"""
+        time.sleep(self.bridge_latency)
+
+    def new_messages(self, mark_as_seen: bool = True) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT rowid, * FROM messages WHERE rowid > ? AND is_from_me = 0 ORDER BY rowid",
+                (self._seen_rowid,)
+            ).fetchall()
+            if mark_as_seen and rows:
+                self._seen_rowid = rows[-1]["rowid"]
+        return [self._message({key: row[key] for key in row.keys() if key != "rowid"}) for row in rows]
+
+    def mark_all_seen(self) -> None:
+        with self._lock:
+            self._seen_rowid = self.db.execute("SELECT COALESCE(MAX(rowid), 0) FROM messages").fetchone()[0]
+
+
+_store: Optional[FakeWhatsAppStore] = None
+_store_lock = threading.Lock()
+
+
+def configure(**options) -> FakeWhatsAppStore:
+    """Replace the store (options as FakeWhatsAppStore)"""
+    global _store
+    with _store_lock:
+        _store = FakeWhatsAppStore(**options)
+        return _store
+
+
+def store() -> FakeWhatsAppStore:
+    """The current store, created from the FAKE_WA_* environment variables on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FakeWhatsAppStore(
+                chats=int(os.getenv("FAKE_WA_CHATS", "50")),
+                messages_per_chat=int(os.getenv("FAKE_WA_MESSAGES_PER_CHAT", "200")),
+                bridge_latency=float(os.getenv("FAKE_WA_BRIDGE_LATENCY_MS", "20")) / 1000,
+                seed=int(os.getenv("FAKE_WA_SEED", "7")),
+            )
+        return _store
+
+
+def install() -> None:
+    """Make `import whatsapp` (as done by server/main.py) resolve to this module"""
+    sys.modules["whatsapp"] = sys.modules[__name__]
+
+
+def _jid(recipient: str) -> str:
+    return recipient if "@" in recipient else f"{recipient}@s.whatsapp.net"
+
+
+# -- functions imported by server/main.py -----------------------------------
+
+def search_contacts(query: str) -> List[Dict[str, Any]]:
+    pattern = f"%{query.lower()}%"
+    return store().query(
+        "SELECT phone_number, name, jid FROM contacts WHERE LOWER(name) LIKE ? OR phone_number LIKE ? LIMIT 50",
+        (pattern, pattern)
+    )
+
+
+def list_messages(after: Optional[str] = None, before: Optional[str] = None,
+                  sender_phone_number: Optional[str] = None, chat_jid: Optional[str] = None,
+                  query: Optional[str] = None, limit: int = 20, page: int = 0, include_context: bool = True,
+                  context_before: int = 1, context_after: int = 1) -> List[Dict[str, Any]]:
+    where, params = [], []
+    for clause, value in (("timestamp > ?", after), ("timestamp < ?", before), ("sender = ?", sender_phone_number),
+                          ("chat_jid = ?", chat_jid), ("LOWER(content) LIKE ?", query and f"%{query.lower()}%")):
+        if value:
+            where.append(clause)
+            params.append(value)
+    sql = "SELECT * FROM messages" + (" WHERE " + " AND ".join(where) if where else "")
+    sql += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
+    db = store()
+    matches = [db._message(row) for row in db.query(sql, tuple(params) + (limit, page * limit))]
+    if not include_context:
+        return matches
+    results = []
+    for message in matches:
+        context = get_message_context(message["id"], context_before, context_after)
+        results.extend(context["before"] + [message] + context["after"])
+    return results
+
+
+def list_chats(query: Optional[str] = None, limit: int = 20, page: int = 0, include_last_message: bool = True,
+               sort_by: str = "last_active") -> List[Dict[str, Any]]:
+    order = "name" if sort_by == "name" else "last_message_time DESC"
+    sql = "SELECT * FROM chats"
+    params: tuple = ()
+    if query:
+        sql += " WHERE LOWER(name) LIKE ? OR jid LIKE ?"
+        params = (f"%{query.lower()}%", f"%{query}%")
+    chats = store().query(f"{sql} ORDER BY {order} LIMIT ? OFFSET ?", params + (limit, page * limit))
+    if include_last_message:
+        for chat in chats:
+            chat.update(_last_message(chat["jid"]))
+    return chats
+
+
+def _last_message(chat_jid: str) -> Dict[str, Any]:
+    rows = store().query(
+        "SELECT content, sender, is_from_me FROM messages WHERE chat_jid = ? ORDER BY timestamp DESC LIMIT 1",
+        (chat_jid,)
+    )
+    if not rows:
+        return {}
+    return {"last_message": rows[0]["content"], "last_sender": rows[0]["sender"],
+            "last_is_from_me": bool(rows[0]["is_from_me"])}
+
+
+def get_chat(chat_jid: str, include_last_message: bool = True) -> Dict[str, Any]:
+    rows = store().query("SELECT * FROM chats WHERE jid = ?", (chat_jid,))
+    if not rows:
+        return {}
+    chat = rows[0]
+    if include_last_message:
+        chat.update(_last_message(chat_jid))
+    return chat
+
+
+def get_direct_chat_by_contact(sender_phone_number: str) -> Dict[str, Any]:
+    return get_chat(_jid(sender_phone_number))
+
+
+def get_contact_chats(jid: str, limit: int = 20, page: int = 0) -> List[Dict[str, Any]]:
+    return store().query(
+        "SELECT DISTINCT chats.* FROM chats JOIN messages ON messages.chat_jid = chats.jid "
+        "WHERE chats.jid = ? OR messages.sender = ? LIMIT ? OFFSET ?",
+        (jid, jid.split("@")[0], limit, page * limit)
+    )
+
+
+def get_last_interaction(jid: str) -> str:
+    rows = store().query(
+        "SELECT * FROM messages WHERE chat_jid = ? OR sender = ? ORDER BY timestamp DESC LIMIT 1",
+        (jid, jid.split("@")[0])
+    )
+    if not rows:
+        return "No interactions found"
+    message = rows[0]
+    who = "Me" if message["is_from_me"] else message["sender"]
+    return f"[{message['timestamp']}] {who}: {message['content'] or '[' + str(message['media_type']) + ']'}"
+
+
+def get_message_context(message_id: str, before: int = 5, after: int = 5) -> Dict[str, Any]:
+    db = store()
+    rows = db.query("SELECT * FROM messages WHERE id = ?", (message_id,))
+    if not rows:
+        return {"message": None, "before": [], "after": []}
+    message = db._message(rows[0])
+    earlier = db.query(
+        "SELECT * FROM messages WHERE chat_jid = ? AND timestamp < ? ORDER BY timestamp DESC LIMIT ?",
+        (message["chat_jid"], message["timestamp"], before)
+    )
+    later = db.query(
+        "SELECT * FROM messages WHERE chat_jid = ? AND timestamp > ? ORDER BY timestamp LIMIT ?",
+        (message["chat_jid"], message["timestamp"], after)
+    )
+    return {"message": message, "before": [db._message(row) for row in reversed(earlier)],
+            "after": [db._message(row) for row in later]}
+
+
+def send_message(recipient: str, message: str) -> Tuple[bool, str]:
+    db = store()
+    db.bridge()
+    db.add_message(_jid(recipient), "me", message, True)
+    db.sent += 1
+    return True, f"Message sent to {recipient}"
+
+
+def send_file(recipient: str, media_path: str) -> Tuple[bool, str]:
+    db = store()
+    db.bridge()
+    db.add_message(_jid(recipient), "me", "", True, media_type="document")
+    db.sent += 1
+    return True, f"File sent to {recipient}"
+
+
+def send_audio_message(recipient: str, media_path: str) -> Tuple[bool, str]:
+    db = store()
+    db.bridge()
+    db.add_message(_jid(recipient), "me", "", True, media_type="audio")
+    db.sent += 1
+    return True, f"Audio message sent to {recipient}"
+
+
+def download_media(message_id: str, chat_jid: str) -> Optional[str]:
+    db = store()
+    db.bridge()
+    rows = db.query("SELECT media_type FROM messages WHERE id = ? AND chat_jid = ?", (message_id, chat_jid))
+    if not rows or not rows[0]["media_type"]:
+        return None
+    return os.path.join(os.path.abspath("store"), chat_jid, f"{message_id}.{rows[0]['media_type']}")
+
+
+# -- inbox functions of the remote (HTTP) server -----------------------------
+
+def check_new_messages(mark_as_seen: bool = True) -> List[Dict[str, Any]]:
+    return store().new_messages(mark_as_seen)
+
+
+def mark_messages_as_seen() -> Dict[str, Any]:
+    store().mark_all_seen()
+    return {"success": True, "message": "All messages marked as seen"}
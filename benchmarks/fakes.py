@@ -0,0 +1,237 @@
+"""
+In-process stand-ins for the remote services used by the realtime runner.
+
+- FakeWhatsAppClient mirrors claude_chat_client.WhatsAppMCPClient, with a fixed
+  per-call latency and seeded payloads.
+- FakeAssistantsClient mirrors the parts of openai.OpenAI().beta.threads that
+  the runner uses, both the polling API (runs.create/retrieve/submit_tool_outputs)
+  and the event-streaming API (runs.stream/submit_tool_outputs_stream).
+  Each run needs `tool_steps` model steps that request tool calls followed by
+  one step that writes the reply. Every model step takes `model_latency` seconds.
+"""
+
+import itertools
+import json
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Any, List, Optional
+
+from benchmarks.payloads import make_chats, make_contacts, make_messages
+
+TOOL_PLAN = [
+    ("search_contacts", {"query": "Ana"}),
+    ("list_messages", {"limit": 20}),
+    ("send_message", {"recipient": "51959812636", "message": "Hola"}),
+    ("list_chats", {"limit": 20}),
+]
+
+
+class FakeWhatsAppClient:
+    """Stand-in for claude_chat_client.WhatsAppMCPClient with fixed latency"""
+
+    def __init__(self, latency: float = 0.05, new_messages: Optional[List[Dict[str, Any]]] = None):
+        self.latency = latency
+        self.calls: List[str] = []
+        self.sent: List[Dict[str, Any]] = []
+        self._new_messages = list(new_messages or [])
+        self._lock = threading.Lock()
+
+    def _call(self, name: str, result: Any) -> Any:
+        with self._lock:
+            self.calls.append(name)
+        time.sleep(self.latency)
+        return result
+
+    def search_contacts(self, query: str):
+        return self._call("search_contacts", make_contacts(5))
+
+    def list_messages(self, **kwargs):
+        return self._call("list_messages", make_messages(kwargs.get("limit", 20), with_context=False))
+
+    def list_chats(self, **kwargs):
+        return self._call("list_chats", make_chats(kwargs.get("limit", 20)))
+
+    def send_message(self, recipient: str, message: str):
+        with self._lock:
+            self.sent.append({"recipient": recipient, "message": message})
+        return self._call("send_message", {"success": True, "message": f"Message sent to {recipient}"})
+
+    def send_file(self, recipient: str, media_path: str):
+        return self._call("send_file", {"success": True, "message": f"File sent to {recipient}"})
+
+    def download_media(self, message_id: str, chat_jid: str):
+        return self._call("download_media", {"success": True, "file_path": f"/tmp/{message_id}.jpg"})
+
+    def check_new_messages(self, mark_as_seen: bool = True):
+        with self._lock:
+            messages, self._new_messages = self._new_messages, ([] if mark_as_seen else self._new_messages)
+        return self._call("check_new_messages", messages)
+
+    def pop_stats(self, scope: str) -> Dict[str, Any]:
+        """Same shape as WhatsAppMCPClient.pop_stats; the fake keeps no per-run stats"""
+        return {"calls": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "tools": {}}
+
+    def push_messages(self, messages: List[Dict[str, Any]]) -> None:
+        """Queue inbound messages for the next check_new_messages call"""
+        with self._lock:
+            self._new_messages.extend(messages)
+
+    def mark_messages_as_seen(self):
+        with self._lock:
+            self._new_messages = []
+        return self._call("mark_messages_as_seen", {"success": True})
+
+
+def _event(name: str, data: Any) -> SimpleNamespace:
+    return SimpleNamespace(event=name, data=data)
+
+
+class _FakeStream:
+    """Context manager + iterator over the events of one run segment"""
+
+    def __init__(self, api: "FakeAssistantsClient", run: SimpleNamespace):
+        self.api = api
+        self.run = run
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        api, run = self.api, self.run
+        yield _event("thread.run.created" if run.step == 0 else "thread.run.in_progress", run)
+        time.sleep(api.model_latency)
+        if run.status == "cancelled":
+            yield _event("thread.run.cancelled", run)
+            return
+        if run.step < api.tool_steps:
+            run.status = "requires_action"
+            run.required_action = api._required_action(run)
+            yield _event("thread.run.requires_action", run)
+            return
+        message = api._complete(run)
+        yield _event("thread.message.completed", message)
+        yield _event("thread.run.completed", run)
+
+
+class FakeAssistantsClient:
+    """Stand-in for the OpenAI Assistants API (threads, messages and runs)"""
+
+    def __init__(self, model_latency: float = 0.3, tool_steps: int = 2, calls_per_step: int = 2):
+        self.model_latency = model_latency
+        self.tool_steps = tool_steps
+        self.calls_per_step = calls_per_step
+        self.api_calls = 0
+        self._ids = itertools.count(1)
+        self._threads: Dict[str, List[SimpleNamespace]] = {}
+        self._runs: Dict[str, SimpleNamespace] = {}
+        self._lock = threading.Lock()
+
+        threads = SimpleNamespace(
+            create=self._create_thread,
+            messages=SimpleNamespace(create=self._create_message, list=self._list_messages),
+            runs=SimpleNamespace(
+                create=self._create_run,
+                retrieve=self._retrieve_run,
+                submit_tool_outputs=self._submit_tool_outputs,
+                stream=self._stream_run,
+                submit_tool_outputs_stream=self._submit_tool_outputs_stream,
+                cancel=self._cancel_run,
+            ),
+        )
+        self.beta = SimpleNamespace(threads=threads)
+
+    # -- helpers ---------------------------------------------------------
+
+    def _count(self):
+        with self._lock:
+            self.api_calls += 1
+
+    def _required_action(self, run: SimpleNamespace) -> SimpleNamespace:
+        tool_calls = []
+        for i in range(self.calls_per_step):
+            name, args = TOOL_PLAN[(run.step * self.calls_per_step + i) % len(TOOL_PLAN)]
+            tool_calls.append(SimpleNamespace(
+                id=f"call_{next(self._ids)}",
+                type="function",
+                function=SimpleNamespace(name=name, arguments=json.dumps(args)),
+            ))
+        return SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=tool_calls))
+
+    def _complete(self, run: SimpleNamespace) -> SimpleNamespace:
+        run.status = "completed"
+        text = SimpleNamespace(type="text", text=SimpleNamespace(value=f"Done ({run.step} tool steps)."))
+        message = SimpleNamespace(id=f"msg_{next(self._ids)}", role="assistant", content=[text])
+        self._threads[run.thread_id].insert(0, message)
+        return message
+
+    # -- threads and messages --------------------------------------------
+
+    def _create_thread(self, **kwargs):
+        self._count()
+        thread_id = f"thread_{next(self._ids)}"
+        self._threads[thread_id] = []
+        return SimpleNamespace(id=thread_id)
+
+    def _create_message(self, thread_id: str, role: str, content: str, **kwargs):
+        self._count()
+        text = SimpleNamespace(type="text", text=SimpleNamespace(value=content))
+        message = SimpleNamespace(id=f"msg_{next(self._ids)}", role=role, content=[text])
+        self._threads[thread_id].insert(0, message)
+        return message
+
+    def _list_messages(self, thread_id: str, limit: int = 20, **kwargs):
+        self._count()
+        return SimpleNamespace(data=self._threads[thread_id][:limit])
+
+    # -- runs: polling API -----------------------------------------------
+
+    def _new_run(self, thread_id: str) -> SimpleNamespace:
+        run = SimpleNamespace(id=f"run_{next(self._ids)}", thread_id=thread_id, status="in_progress",
+                              step=0, phase_started=time.monotonic(), required_action=None, last_error=None)
+        self._runs[run.id] = run
+        return run
+
+    def _create_run(self, thread_id: str, assistant_id: str, **kwargs):
+        self._count()
+        return self._new_run(thread_id)
+
+    def _retrieve_run(self, thread_id: str, run_id: str, **kwargs):
+        self._count()
+        run = self._runs[run_id]
+        if run.status == "in_progress" and time.monotonic() - run.phase_started >= self.model_latency:
+            if run.step < self.tool_steps:
+                run.status = "requires_action"
+                run.required_action = self._required_action(run)
+            else:
+                self._complete(run)
+        return run
+
+    def _submit_tool_outputs(self, thread_id: str, run_id: str, tool_outputs: List[Dict[str, str]], **kwargs):
+        self._count()
+        run = self._runs[run_id]
+        run.step += 1
+        run.status = "in_progress"
+        run.required_action = None
+        run.phase_started = time.monotonic()
+        return run
+
+    def _cancel_run(self, thread_id: str, run_id: str, **kwargs):
+        self._count()
+        run = self._runs[run_id]
+        if run.status not in ("completed", "failed", "expired"):
+            run.status = "cancelled"
+        return run
+
+    # -- runs: streaming API ---------------------------------------------
+
+    def _stream_run(self, thread_id: str, assistant_id: str, **kwargs):
+        self._count()
+        return _FakeStream(self, self._new_run(thread_id))
+
+    def _submit_tool_outputs_stream(self, thread_id: str, run_id: str, tool_outputs: List[Dict[str, str]], **kwargs):
+        run = self._submit_tool_outputs(thread_id, run_id, tool_outputs)
+        return _FakeStream(self, run)
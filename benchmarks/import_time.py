@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for the entry points.
+
+Each entry point is imported in a fresh interpreter (--runs times, median
+reported), the way a cold start or client_request1's per-send server
+subprocess pays for it. The check fails (exit status 1) when an import takes
+longer than its budget, or when it loads a module that is meant to be
+imported lazily (e.g. the Anthropic/OpenAI SDKs, or the WhatsApp store
+behind server/main.py).
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 10 --budget server/main.py=0.8 --output imports.json
+    IMPORT_BUDGET_SCALE=2 python -m benchmarks.import_time     # slower machine
+
+On failure the heaviest imports of the slow entry point (from
+`python -X importtime`) are listed.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.e2e import REPO_ROOT, git_commit
+
+# name -> directory put first on sys.path, module imported, budget (seconds), modules that must stay unloaded
+ENTRY_POINTS: Dict[str, Dict[str, Any]] = {
+    "claude_chat_api": {"path": ".", "module": "claude_chat_api", "budget": 0.35, "lazy": ["anthropic"]},
+    "claude_chat_client": {"path": ".", "module": "claude_chat_client", "budget": 0.35, "lazy": []},
+    "realtime/assistant_running.py": {"path": ".", "module": "realtime.assistant_running", "budget": 0.4,
+                                      "lazy": ["openai"]},
+    "client_request1": {"path": ".", "module": "client_request1", "budget": 0.25, "lazy": ["mcp"]},
+    "client_response": {"path": ".", "module": "client_response", "budget": 0.25, "lazy": ["mcp"]},
+    "server/main.py": {"path": "server", "module": "main", "budget": 1.2, "lazy": ["whatsapp"]},
+    # The agent CLI needs the Anthropic SDK for its first query anyway
+    "client/main.py": {"path": "client", "module": "main", "budget": 2.5, "lazy": []},
+}
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {lazy!r} if name in sys.modules]}}))
+"""
+
+
+def child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.pop("TRAFFIC_LOG", None)
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    env.setdefault("ANTHROPIC_API_KEY", "benchmark")
+    return env
+
+
+def import_once(entry: Dict[str, Any], importtime: bool = False) -> Tuple[Dict[str, Any], str]:
+    """(child report, -X importtime output) for one fresh-interpreter import"""
+    code = CHILD.format(path=os.path.join(REPO_ROOT, entry["path"]), module=entry["module"], lazy=entry["lazy"])
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    result = subprocess.run(command, cwd=REPO_ROOT, env=child_env(), capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}"
+        raise RuntimeError(error)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def heaviest_imports(importtime_output: str, module: str, limit: int = 10) -> List[Tuple[str, float]]:
+    """Imports with the largest cumulative time in `python -X importtime` output"""
+    rows = []
+    for line in importtime_output.splitlines():
+        parts = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        if name != module:
+            rows.append((name, int(parts[1]) / 1e6))
+    return sorted(rows, key=lambda row: -row[1])[:limit]
+
+
+def measure(entry: Dict[str, Any], runs: int, scale: float) -> Dict[str, Any]:
+    """Median import time of an entry point against its (scaled) budget"""
+    samples, loaded = [], set()
+    for _ in range(runs):
+        report, _ = import_once(entry)
+        samples.append(report["seconds"])
+        loaded.update(report["loaded"])
+    median = statistics.median(samples)
+    budget = entry["budget"] * scale
+    row = {
+        "median_seconds": round(median, 4),
+        "min_seconds": round(min(samples), 4),
+        "max_seconds": round(max(samples), 4),
+        "budget_seconds": round(budget, 4),
+        "eagerly_loaded": sorted(loaded),
+        "ok": median <= budget and not loaded,
+    }
+    if not row["ok"]:
+        _, output = import_once(entry, importtime=True)
+        row["heaviest_imports"] = [{"module": module, "seconds": round(seconds, 4)}
+                                   for module, seconds in heaviest_imports(output, entry["module"])]
+    return row
+
+
+def parse_budgets(values: List[str]) -> Dict[str, float]:
+    budgets = {}
+    for value in values:
+        name, _, seconds = value.rpartition("=")
+        if name not in ENTRY_POINTS:
+            raise SystemExit(f"unknown entry point {name!r} (choose from {', '.join(ENTRY_POINTS)})")
+        budgets[name] = float(seconds)
+    return budgets
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fail when entry point import time exceeds its budget")
+    parser.add_argument("--entry-points", default=",".join(ENTRY_POINTS), help="Comma-separated subset")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per entry point (median is used)")
+    parser.add_argument("--budget", action="append", default=[], metavar="NAME=SECONDS",
+                        help="Override one budget (repeatable)")
+    parser.add_argument("--scale", type=float, default=float(os.getenv("IMPORT_BUDGET_SCALE", "1")),
+                        help="Multiply every budget (IMPORT_BUDGET_SCALE)")
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args(argv)
+
+    overrides = parse_budgets(args.budget)
+    results: Dict[str, Dict[str, Any]] = {}
+    skipped: Dict[str, str] = {}
+    print(f"{'entry point':<32}{'median ms':>10}{'budget ms':>10}  status")
+    for name in args.entry_points.split(","):
+        entry = dict(ENTRY_POINTS[name])
+        entry["budget"] = overrides.get(name, entry["budget"])
+        try:
+            row = measure(entry, args.runs, args.scale)
+        except RuntimeError as e:
+            skipped[name] = str(e)
+            print(f"{name:<32}{'':>10}{'':>10}  skipped: {e}")
+            continue
+        results[name] = row
+        status = "ok" if row["ok"] else "OVER BUDGET" if not row["eagerly_loaded"] else \
+            f"EAGER: {', '.join(row['eagerly_loaded'])}"
+        print(f"{name:<32}{row['median_seconds'] * 1000:>10.0f}{row['budget_seconds'] * 1000:>10.0f}  {status}")
+        for heavy in row.get("heaviest_imports", []):
+            print(f"{'':<4}{heavy['module']:<40}{heavy['seconds'] * 1000:>8.0f} ms")
+
+    failed = [name for name, row in results.items() if not row["ok"]]
+    if args.output:
+        report = {
+            "meta": {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                     "python": platform.python_version(), "runs": args.runs, "scale": args.scale},
+            "entry_points": results,
+            "skipped": skipped,
+            "failed": failed,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Report written to {args.output}")
+    if failed:
+        print(f"\n❌ Import budget exceeded: {', '.join(failed)}")
+        return 1
+    print("\n✅ All entry points within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Load generator for web_app (POST /send, or any other form/JSON endpoint).
+
+Two ways to apply load, each stepped through stages to find where the
+service saturates:
+
+- open loop (--rate): requests arrive at a fixed rate (or as a Poisson
+  process with --poisson) whether or not earlier ones have finished; latency
+  is measured from the scheduled arrival, so queueing is not hidden
+- closed loop (--concurrency): N workers each send the next request as soon
+  as the previous one answers
+
+A level is a number (`5`), a linear ramp (`1:10:1`) or a geometric one
+(`1:64:x2`). Without --url the real web_app is started locally (uvicorn, in
+a separate process) on top of the stdio stand-in MCP server
+(benchmarks.fake_mcp_server), so each /send goes through client_request1
+exactly as in production.
+
+    python -m benchmarks.load_web_app --rate 1:8:1 --stage-seconds 20
+    python -m benchmarks.load_web_app --concurrency 1:32:x2 --output load.json
+    python -m benchmarks.load_web_app --url http://127.0.0.1:5002 --rate 2 --compare load.json
+
+Each stage reports offered vs achieved throughput, p50/p95/p99, error rate
+by kind, a per-interval timeline and (when the target exposes /metrics) the
+server-side time per /send phase. The saturation point is the first stage
+where p99 exceeds --slo-ms, the error rate exceeds --max-error-rate, or
+throughput stops keeping up (open loop: below 90% of the offered rate;
+closed loop: less than 5% above the best earlier stage).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from latency_stats import summarize
+from benchmarks.e2e import REPO_ROOT, RESULTS_DIR, free_port, git_commit, server_command, web_app_module
+
+# Open loop: achieved throughput below this share of the offered rate means saturated
+KEEP_UP_RATIO = 0.9
+# Closed loop: a stage must beat the best earlier throughput by this much to count as progress
+MIN_THROUGHPUT_GAIN = 0.05
+
+PHASE_METRIC = re.compile(r'^web_app_send_phase_seconds_(sum|count)\{phase="([^"]+)"\} ([0-9.eE+-]+)$')
+
+
+def parse_levels(spec: str) -> List[float]:
+    """'5' -> [5], '1:10:3' -> [1, 4, 7, 10], '1:64:x2' -> [1, 2, 4, ..., 64]"""
+    parts = spec.split(":")
+    if len(parts) == 1:
+        return [float(parts[0])]
+    if len(parts) != 3:
+        raise ValueError(f"invalid level spec {spec!r} (use N, start:stop:step or start:stop:xfactor)")
+    start, stop, step = float(parts[0]), float(parts[1]), parts[2]
+    levels = []
+    value = start
+    if step.startswith("x"):
+        factor = float(step[1:])
+        if factor <= 1:
+            raise ValueError("geometric factor must be > 1")
+        while value <= stop * (1 + 1e-9):
+            levels.append(round(value, 6))
+            value *= factor
+    else:
+        increment = float(step)
+        if increment <= 0:
+            raise ValueError("step must be > 0")
+        while value <= stop + 1e-9:
+            levels.append(round(value, 6))
+            value += increment
+    return levels
+
+
+# --- Local target ----------------------------------------------------------
+
+def serve(args) -> None:
+    """Run web_app on top of the stdio stand-in MCP server (blocks)"""
+    import uvicorn
+    import client_request1
+    client_request1.SERVER_COMMAND = server_command(args)
+    with tempfile.TemporaryDirectory() as templates_dir:
+        web_app = web_app_module(templates_dir)
+        uvicorn.run(web_app.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def start_local_server(args) -> Tuple[subprocess.Popen, str]:
+    """Start `serve` in a child process and wait until it answers; returns (process, base URL)"""
+    port = free_port()
+    command = [sys.executable, "-m", "benchmarks.load_web_app", "--serve", "--port", str(port),
+               "--chats", str(args.chats), "--messages-per-chat", str(args.messages_per_chat),
+               "--bridge-latency-ms", str(args.bridge_latency_ms)]
+    output = None if args.verbose else subprocess.DEVNULL
+    process = subprocess.Popen(command, cwd=REPO_ROOT, stdout=output, stderr=None if args.verbose else subprocess.PIPE)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            error = process.stderr.read().decode("utf-8", errors="replace") if process.stderr else ""
+            raise RuntimeError(f"local web_app exited with {process.returncode}: {error.strip()[-500:]}")
+        try:
+            httpx.get(f"{url}/metrics", timeout=1)
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("local web_app did not start within 30s")
+
+
+# --- Load ------------------------------------------------------------------
+
+class Sample:
+    __slots__ = ("offset", "latency", "error")
+
+    def __init__(self, offset: float, latency: float, error: Optional[str]):
+        self.offset = offset    # seconds since the stage started (scheduled arrival)
+        self.latency = latency
+        self.error = error      # None, "http_<status>", "failure" or an exception name
+
+
+class LoadGenerator:
+    """Sends the configured request and classifies the outcome"""
+
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.path = args.path
+        self.json_body = args.json
+        self.payload = json.loads(args.payload) if args.payload else {
+            "phone_number": args.phone_number, "message": args.message}
+        self.failure_text = args.failure_text
+        self.counter = 0
+
+    async def send(self) -> Optional[str]:
+        self.counter += 1
+        # Vary the message so nothing downstream can dedupe or cache it
+        payload = {key: value.replace("{n}", str(self.counter)) if isinstance(value, str) else value
+                   for key, value in self.payload.items()}
+        try:
+            if self.json_body:
+                response = await self.client.post(self.path, json=payload)
+            else:
+                response = await self.client.post(self.path, data=payload)
+        except httpx.TimeoutException:
+            return "timeout"
+        except httpx.HTTPError as e:
+            return type(e).__name__
+        if response.status_code >= 400:
+            return f"http_{response.status_code}"
+        if self.failure_text and self.failure_text in response.text:
+            return "failure"
+        return None
+
+    async def timed(self, samples: List[Sample], stage_start: float, scheduled: float) -> None:
+        error = await self.send()
+        samples.append(Sample(scheduled - stage_start, time.perf_counter() - scheduled, error))
+
+    async def open_loop(self, rate: float, duration: float, poisson: bool, max_outstanding: int) -> Tuple[List[Sample], int]:
+        """Arrivals at `rate` per second for `duration`; returns (samples, arrivals dropped)"""
+        samples: List[Sample] = []
+        tasks = set()
+        dropped = 0
+        stage_start = time.perf_counter()
+        next_arrival = stage_start
+        while next_arrival < stage_start + duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(tasks) >= max_outstanding:
+                # The client itself can't keep more requests open: count it, don't block the schedule
+                dropped += 1
+                samples.append(Sample(next_arrival - stage_start, 0.0, "dropped"))
+            else:
+                task = asyncio.ensure_future(self.timed(samples, stage_start, next_arrival))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            next_arrival += random.expovariate(rate) if poisson else 1 / rate
+        if tasks:
+            await asyncio.gather(*tasks)
+        return samples, dropped
+
+    async def closed_loop(self, concurrency: int, duration: float) -> List[Sample]:
+        """`concurrency` workers sending back to back for `duration`"""
+        samples: List[Sample] = []
+        stage_start = time.perf_counter()
+
+        async def worker() -> None:
+            while time.perf_counter() < stage_start + duration:
+                await self.timed(samples, stage_start, time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return samples
+
+
+async def scrape_phases(client: httpx.AsyncClient) -> Optional[Dict[str, Tuple[float, float]]]:
+    """{phase: (sum, count)} from the target's /metrics, or None if it has none"""
+    try:
+        response = await client.get("/metrics")
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    phases: Dict[str, List[float]] = {}
+    for line in response.text.splitlines():
+        match = PHASE_METRIC.match(line)
+        if match:
+            kind, phase, value = match.groups()
+            phases.setdefault(phase, [0.0, 0.0])[0 if kind == "sum" else 1] = float(value)
+    return {phase: (values[0], values[1]) for phase, values in phases.items()}
+
+
+def phase_means(before: Optional[Dict[str, Tuple[float, float]]],
+                after: Optional[Dict[str, Tuple[float, float]]]) -> Optional[Dict[str, float]]:
+    """Mean seconds per /send phase between two scrapes"""
+    if before is None or after is None:
+        return None
+    means = {}
+    for phase, (total, count) in after.items():
+        old_total, old_count = before.get(phase, (0.0, 0.0))
+        if count > old_count:
+            means[phase] = round((total - old_total) / (count - old_count), 6)
+    return means
+
+
+# --- Report ----------------------------------------------------------------
+
+def timeline(samples: List[Sample], duration: float, interval: float) -> List[Dict[str, Any]]:
+    """Throughput, error rate and percentiles per interval (by scheduled arrival)"""
+    buckets: List[List[Sample]] = [[] for _ in range(max(int(-(-duration // interval)), 1))]
+    for sample in samples:
+        buckets[min(int(sample.offset // interval), len(buckets) - 1)].append(sample)
+    rows = []
+    for i, bucket in enumerate(buckets):
+        latencies = [s.latency for s in bucket if s.error is None]
+        stats = summarize(latencies)
+        rows.append({
+            "t": round(i * interval, 3),
+            "requests": len(bucket),
+            "ok_per_second": round(len(latencies) / interval, 3),
+            "error_rate": round(1 - len(latencies) / len(bucket), 4) if bucket else 0.0,
+            "p50": stats["p50"], "p95": stats["p95"], "p99": stats["p99"],
+        })
+    return rows
+
+
+def stage_report(mode: str, level: float, samples: List[Sample], elapsed: float, duration: float,
+                 interval: float, phases: Optional[Dict[str, float]]) -> Dict[str, Any]:
+    errors: Dict[str, int] = {}
+    for sample in samples:
+        if sample.error:
+            errors[sample.error] = errors.get(sample.error, 0) + 1
+    ok = [s.latency for s in samples if s.error is None]
+    return {
+        "mode": mode,
+        "level": level,
+        "offered_rps": level if mode == "rate" else None,
+        "achieved_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        "elapsed_seconds": round(elapsed, 3),
+        "latency": summarize(ok),
+        "timeline": timeline(samples, duration, interval),
+        "server_phases": phases,
+    }
+
+
+def find_saturation(stages: List[Dict[str, Any]], slo: float, max_error_rate: float) -> Dict[str, Any]:
+    """First stage that breaks the SLO, the error budget or stops gaining throughput"""
+    best = 0.0
+    for i, stage in enumerate(stages):
+        reasons = []
+        if stage["latency"]["count"] and stage["latency"]["p99"] > slo:
+            reasons.append(f"p99 {stage['latency']['p99'] * 1000:.0f}ms > {slo * 1000:.0f}ms")
+        if stage["error_rate"] > max_error_rate:
+            reasons.append(f"error rate {stage['error_rate']:.1%} > {max_error_rate:.1%}")
+        if stage["mode"] == "rate":
+            if stage["achieved_rps"] < KEEP_UP_RATIO * stage["offered_rps"]:
+                reasons.append(f"achieved {stage['achieved_rps']:.2f}/s < {KEEP_UP_RATIO:.0%} of offered")
+        elif i and stage["achieved_rps"] < best * (1 + MIN_THROUGHPUT_GAIN):
+            reasons.append(f"throughput {stage['achieved_rps']:.2f}/s no better than {best:.2f}/s")
+        if reasons:
+            sustainable = stages[i - 1] if i else None
+            return {
+                "saturated": True,
+                "stage": i,
+                "level": stage["level"],
+                "reasons": reasons,
+                "max_sustainable_level": sustainable["level"] if sustainable else None,
+                "max_sustainable_rps": sustainable["achieved_rps"] if sustainable else None,
+            }
+        best = max(best, stage["achieved_rps"])
+    return {"saturated": False, "stage": None, "level": None, "reasons": [],
+            "max_sustainable_level": stages[-1]["level"] if stages else None,
+            "max_sustainable_rps": stages[-1]["achieved_rps"] if stages else None}
+
+
+def print_stage(stage: Dict[str, Any]) -> None:
+    latency = stage["latency"]
+    offered = f"{stage['offered_rps']:>8.2f}" if stage["offered_rps"] is not None else f"{'-':>8}"
+    print(f"{stage['mode']:<12}{stage['level']:>7g}{offered}{stage['achieved_rps']:>9.2f}{stage['requests']:>7}"
+          f"{stage['error_rate']:>8.1%}{latency['p50'] * 1000:>9.0f}{latency['p95'] * 1000:>9.0f}"
+          f"{latency['p99'] * 1000:>9.0f}")
+    if stage["server_phases"]:
+        print(" " * 12 + "server: " + ", ".join(f"{phase} {seconds * 1000:.0f}ms"
+                                                 for phase, seconds in sorted(stage["server_phases"].items())))
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Achieved throughput and p99 per level against a previous report"""
+    print(f"\nvs {baseline['meta']['commit']} ({baseline['meta']['timestamp']})")
+    print(f"{'mode':<12}{'level':>7}{'ok/s':>16}{'p99 ms':>18}")
+    old_stages = {(s["mode"], s["level"]): s for s in baseline["stages"]}
+    for stage in report["stages"]:
+        old = old_stages.get((stage["mode"], stage["level"]))
+        if not old:
+            print(f"{stage['mode']:<12}{stage['level']:>7g}{'(new)':>16}")
+            continue
+        print(f"{stage['mode']:<12}{stage['level']:>7g}"
+              f"{old['achieved_rps']:>8.2f}{stage['achieved_rps']:>8.2f}"
+              f"{old['latency']['p99'] * 1000:>9.0f}{stage['latency']['p99'] * 1000:>9.0f}")
+    old_sat, new_sat = baseline["saturation"], report["saturation"]
+    print(f"max sustainable: {old_sat['max_sustainable_level']} -> {new_sat['max_sustainable_level']}")
+
+
+async def run_stages(args, url: str) -> List[Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=args.max_outstanding, max_keepalive_connections=args.max_outstanding)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        generator = LoadGenerator(client, args)
+        mode = "rate" if args.rate else "concurrency"
+        stages = []
+        print(f"{'mode':<12}{'level':>7}{'offered':>8}{'ok/s':>9}{'reqs':>7}{'errors':>8}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for level in parse_levels(args.rate or args.concurrency):
+            before = await scrape_phases(client)
+            start = time.perf_counter()
+            if mode == "rate":
+                samples, _ = await generator.open_loop(level, args.stage_seconds, args.poisson, args.max_outstanding)
+            else:
+                samples = await generator.closed_loop(int(level), args.stage_seconds)
+            elapsed = time.perf_counter() - start
+            phases = phase_means(before, await scrape_phases(client))
+            stage = stage_report(mode, level, samples, elapsed, args.stage_seconds, args.interval, phases)
+            stages.append(stage)
+            print_stage(stage)
+            if args.stop_at_saturation and find_saturation(stages, args.slo_ms / 1000, args.max_error_rate)["saturated"]:
+                break
+            if args.pause_seconds:
+                await asyncio.sleep(args.pause_seconds)
+        return stages
+
+
+def main(argv: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="Stepped load test for web_app")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rate", help="Open loop arrivals per second: N, start:stop:step or start:stop:xfactor")
+    load.add_argument("--concurrency", help="Closed loop workers: N, start:stop:step or start:stop:xfactor")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times (open loop)")
+    parser.add_argument("--stage-seconds", type=float, default=15)
+    parser.add_argument("--pause-seconds", type=float, default=2, help="Idle time between stages")
+    parser.add_argument("--interval", type=float, default=1, help="Timeline resolution in seconds")
+    parser.add_argument("--slo-ms", type=float, default=5000, help="p99 above this marks saturation")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--stop-at-saturation", action="store_true", help="Skip the stages after saturation")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--max-outstanding", type=int, default=512, help="Open requests before arrivals are dropped")
+    parser.add_argument("--url", help="Existing web_app to load (default: start one locally)")
+    parser.add_argument("--path", default="/send")
+    parser.add_argument("--json", action="store_true", help="Send the payload as JSON instead of a form")
+    parser.add_argument("--payload", help="JSON object to send ({n} in strings becomes the request number)")
+    parser.add_argument("--phone-number", default="51959812636")
+    parser.add_argument("--message", default="Prueba de carga {n}")
+    parser.add_argument("--failure-text", help="Response text that marks a failed send (default locally: ERROR)")
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--messages-per-chat", type=int, default=200)
+    parser.add_argument("--bridge-latency-ms", type=float, default=20)
+    parser.add_argument("--output", help="Report path (default: benchmarks/results/load-<commit>.json)")
+    parser.add_argument("--compare", help="Previous report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show the local server's output")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args)
+        return None
+    if not args.rate and not args.concurrency:
+        args.rate = "1:5:1"
+
+    process = None
+    url = args.url
+    try:
+        if url is None:
+            try:
+                import jinja2  # noqa: F401  (web_app renders its responses with it)
+            except ImportError:
+                parser.error("the local web_app needs jinja2; install it or pass --url")
+            process, url = start_local_server(args)
+            if args.failure_text is None:
+                # benchmarks.e2e.FALLBACK_TEMPLATE renders failures as "ERROR <message>"
+                args.failure_text = "ERROR" if not os.path.exists(
+                    os.path.join(REPO_ROOT, "templates", "index.html")) else None
+        print(f"🚀 Loading {url}{args.path}")
+        stages = asyncio.run(run_stages(args, url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "target": url if args.url else "local",
+            "params": {key: value for key, value in vars(args).items()
+                       if key not in ("output", "compare", "serve", "port", "verbose")},
+        },
+        "stages": stages,
+        "saturation": find_saturation(stages, args.slo_ms / 1000, args.max_error_rate),
+    }
+    saturation = report["saturation"]
+    if saturation["saturated"]:
+        print(f"\n📈 Saturated at {saturation['level']:g} ({'; '.join(saturation['reasons'])}); "
+              f"max sustainable: {saturation['max_sustainable_level']}")
+    else:
+        print(f"\n📈 Not saturated up to {saturation['max_sustainable_level']}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Report written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+    return report
+
+
+if __name__ == "__main__":
+    main()
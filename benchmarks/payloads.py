@@ -0,0 +1,72 @@
+"""
+Realistic, seeded WhatsApp payloads shaped like the server/main.py tool results.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Any, List
+
+FIRST_NAMES = ["Ana", "Luis", "María", "Jorge", "Lucía", "Carlos", "Sofía", "Diego", "Valeria", "Miguel"]
+LAST_NAMES = ["Pérez", "García", "Rodríguez", "Torres", "Flores", "Ramírez", "Castillo", "Vargas"]
+PHRASES = [
+    "Hola, ¿cómo estás?", "¿A qué hora abren mañana?", "Te envío el documento en un rato",
+    "Perfecto, gracias!", "¿Cuál es el precio del plan mensual?", "Nos vemos en la reunión de las 5",
+    "Ya hice la transferencia, te paso el comprobante", "Ok 👍", "¿Me confirmas la dirección de entrega?",
+    "Buenísimo, quedamos así entonces. Cualquier cosa me avisas por aquí.",
+]
+
+
+def make_contacts(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Contacts as returned by search_contacts"""
+    rng = random.Random(seed)
+    contacts = []
+    for i in range(count):
+        phone = f"519{rng.randint(10000000, 99999999)}"
+        contacts.append({
+            "phone_number": phone,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "jid": f"{phone}@s.whatsapp.net",
+        })
+    return contacts
+
+
+def make_chats(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Chats as returned by list_chats(include_last_message=True)"""
+    rng = random.Random(seed)
+    now = datetime(2025, 6, 1, 12, 0, 0)
+    chats = []
+    for i, contact in enumerate(make_contacts(count, seed)):
+        is_group = rng.random() < 0.2
+        last = now - timedelta(minutes=rng.randint(1, 60 * 24 * 30))
+        chats.append({
+            "jid": f"1203630{rng.randint(10000000, 99999999)}@g.us" if is_group else contact["jid"],
+            "name": f"Grupo {contact['name'].split()[1]}" if is_group else contact["name"],
+            "last_message_time": last.isoformat(),
+            "last_message": rng.choice(PHRASES),
+            "last_sender": contact["phone_number"],
+            "last_is_from_me": rng.random() < 0.4,
+        })
+    return chats
+
+
+def make_messages(count: int, chat_jid: str = "51959812636@s.whatsapp.net", seed: int = 7,
+                  with_context: bool = True) -> List[Dict[str, Any]]:
+    """Messages as returned by list_messages for one chat"""
+    rng = random.Random(seed)
+    start = datetime(2025, 6, 1, 9, 0, 0)
+    sender = chat_jid.split("@")[0]
+    messages = []
+    for i in range(count * (3 if with_context else 1)):
+        is_from_me = rng.random() < 0.45
+        media_type = rng.choice([None] * 8 + ["image", "audio"])
+        messages.append({
+            "id": f"3EB0{rng.getrandbits(64):016X}",
+            "timestamp": (start + timedelta(minutes=3 * i)).isoformat(),
+            "sender": "me" if is_from_me else sender,
+            "chat_jid": chat_jid,
+            "chat_name": "Cliente",
+            "content": "" if media_type else rng.choice(PHRASES),
+            "is_from_me": is_from_me,
+            "media_type": media_type,
+        })
+    return messages
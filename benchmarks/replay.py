@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Serve a recorded traffic log back (see traffic_log.py for recording).
+
+    TRAFFIC_LOG=traffic.jsonl python client/main.py        # record a session
+    python -m benchmarks.replay stats traffic.jsonl
+    python -m benchmarks.replay http traffic.jsonl --port 8765 --time-scale 0.5
+    python -m benchmarks.replay stdio traffic.jsonl       # as the MCP server command
+
+`http` answers the recorded HTTP MCP exchanges (point claude_chat_client at
+http://127.0.0.1:8765) and LLM exchanges (ANTHROPIC_BASE_URL=http://127.0.0.1:8765,
+OPENAI_BASE_URL=http://127.0.0.1:8765/v1). `stdio` stands in for the stdio MCP
+server; use stdio_command() as a client's SERVER_COMMAND.
+
+Requests are matched to recorded ones deterministically: the first unused
+exchange with the same method, path and body (ignoring JSON-RPC ids and
+client info) wins, otherwise the next unused one for that method and path
+(for stdio: JSON-RPC method and tool name) in recording order. Responses
+keep their recorded timing multiplied by --time-scale (1 = original, 0 = as
+fast as possible), including the gaps between streamed chunks.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+
+from latency_stats import summarize
+from traffic_log import read_log, redact
+
+# Fields that legitimately differ between a recording and its replay
+VOLATILE_FIELDS = ("id", "jsonrpc", "metadata")
+VOLATILE_PARAMS = ("_meta", "clientInfo")
+
+
+def stdio_endpoint(message: Dict[str, Any]) -> str:
+    """Pool a stdio request is matched in: the method, plus the tool name for tools/call"""
+    if message["method"] == "tools/call":
+        return f"tools/call:{(message.get('params') or {}).get('name')}"
+    return message["method"]
+
+
+def request_key(body: Any) -> str:
+    """Canonical form of a request body used for exact matching"""
+    # Recordings hold redacted secrets; redact the live request the same way
+    body = redact(body)
+    if isinstance(body, dict):
+        body = {key: value for key, value in body.items() if key not in VOLATILE_FIELDS}
+        if isinstance(body.get("params"), dict):
+            body["params"] = {key: value for key, value in body["params"].items() if key not in VOLATILE_PARAMS}
+    return json.dumps(body, sort_keys=True, ensure_ascii=False)
+
+
+class _Pool:
+    """Recorded exchanges for one endpoint, handed out in recording order"""
+
+    def __init__(self):
+        self.items: List[Tuple[str, Dict[str, Any]]] = []
+        self.used: List[bool] = []
+
+    def add(self, key: str, item: Dict[str, Any]) -> None:
+        self.items.append((key, item))
+        self.used.append(False)
+
+    def take(self, key: str) -> Tuple[Dict[str, Any], bool]:
+        if all(self.used):
+            # Replaying more traffic than was recorded: start over
+            self.used = [False] * len(self.items)
+        for exact in (True, False):
+            for i, (item_key, item) in enumerate(self.items):
+                if not self.used[i] and (not exact or item_key == key):
+                    self.used[i] = True
+                    return item, exact
+        raise LookupError("empty pool")
+
+
+class Replayer:
+    """Matches live requests against a traffic log"""
+
+    def __init__(self, entries: List[Dict[str, Any]], time_scale: float = 1.0):
+        self.time_scale = time_scale
+        self.http: Dict[Tuple[str, str], _Pool] = defaultdict(_Pool)
+        self.stdio: Dict[str, _Pool] = defaultdict(_Pool)
+        self.matches: Counter = Counter()
+        self._lock = threading.Lock()
+        for entry in entries:
+            if "req" in entry:
+                request = entry["req"]
+                self.http[(request["method"], request["path"])].add(request_key(request.get("body")), entry)
+        for pair in stdio_pairs(entries):
+            self.stdio[stdio_endpoint(pair["req"])].add(request_key(pair["req"]), pair)
+
+    def sleep(self, seconds: float) -> None:
+        if self.time_scale > 0 and seconds > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def _take(self, pools: Dict[Any, _Pool], endpoint: Any, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if endpoint not in pools:
+                self.matches["missing"] += 1
+                return None
+            item, exact = pools[endpoint].take(key)
+            self.matches["exact" if exact else "fallback"] += 1
+            return item
+
+    def http_exchange(self, method: str, path: str, body: Any) -> Optional[Dict[str, Any]]:
+        """Recorded exchange for an HTTP request (None if the endpoint was never recorded)"""
+        return self._take(self.http, (method, path), request_key(body))
+
+    def stdio_response(self, message: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        """Recorded JSON-RPC response for a stdio request, re-addressed to its id, and its delay"""
+        pair = self._take(self.stdio, stdio_endpoint(message), request_key(message))
+        if pair is None:
+            return {"jsonrpc": "2.0", "id": message["id"],
+                    "error": {"code": -32601, "message": f"{message['method']} not in recording"}}, 0.0
+        return dict(pair["res"], id=message["id"]), pair["delay"]
+
+
+def stdio_pairs(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Request/response pairs of the recorded stdio sessions, with the server's response delay"""
+    pending: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+    pairs = []
+    for entry in entries:
+        if entry.get("ch") != "mcp-stdio":
+            continue
+        message = entry["msg"]
+        key = (entry["sid"], message.get("id"))
+        if entry["dir"] == "c2s" and "method" in message and "id" in message:
+            pending[key] = entry
+        elif entry["dir"] == "s2c" and "method" not in message and key in pending:
+            request = pending.pop(key)
+            pairs.append({"req": request["msg"], "res": message, "delay": entry["ts"] - request["ts"]})
+    return pairs
+
+
+# --- Servers ---------------------------------------------------------------
+
+def _reply_body(entry: Dict[str, Any], body: Any) -> Any:
+    recorded = entry["res"].get("body")
+    # JSON-RPC over HTTP: answer with the live request id
+    if isinstance(recorded, dict) and "jsonrpc" in recorded and isinstance(body, dict) and "id" in body:
+        return dict(recorded, id=body["id"])
+    return recorded
+
+
+def start_http_server(replayer: Replayer, port: int = 0, host: str = "127.0.0.1") -> Tuple[ThreadingHTTPServer, str]:
+    """Serve the recorded HTTP exchanges in a background thread; returns (server, base URL)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _dispatch(self, method: str) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length) if length else b""
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                body = raw.decode("utf-8", errors="replace")
+            entry = replayer.http_exchange(method, self.path, body)
+            if entry is None:
+                payload = json.dumps({"error": f"{method} {self.path} not in recording"}).encode("utf-8")
+                self.send_response(404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            response = entry["res"]
+            replayer.sleep(entry.get("ttfb", 0.0))
+            self.send_response(response["status"])
+            for name, value in response.get("headers", {}).items():
+                self.send_header(name, value)
+            if "chunks" in response:
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                previous = 0.0
+                for offset, text in response["chunks"]:
+                    replayer.sleep(offset - previous)
+                    previous = offset
+                    self.wfile.write(text.encode("utf-8"))
+                    self.wfile.flush()
+                return
+            reply = _reply_body(entry, body)
+            payload = b"" if reply is None else (
+                reply.encode("utf-8") if isinstance(reply, str) else json.dumps(reply).encode("utf-8"))
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_DELETE(self):
+            self._dispatch("DELETE")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def serve_stdio(replayer: Replayer) -> None:
+    """Act as the stdio MCP server; requests are answered concurrently, like the real one"""
+    write_lock = threading.Lock()
+
+    def answer(message: Dict[str, Any]) -> None:
+        response, delay = replayer.stdio_response(message)
+        replayer.sleep(delay)
+        with write_lock:
+            sys.stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+
+    for line in sys.stdin:
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if "method" in message and "id" in message:
+            threading.Thread(target=answer, args=(message,), daemon=True).start()
+
+
+def stdio_command(python: str, log_path: str, time_scale: float = 1.0) -> List[str]:
+    """Command line that replays a log as the stdio server (run with the repository root as cwd)"""
+    return [python, "-m", "benchmarks.replay", "stdio", log_path, "--time-scale", str(time_scale)]
+
+
+# --- Report ----------------------------------------------------------------
+
+def stats(entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Exchange count and response-time percentiles per channel and endpoint"""
+    samples: Dict[str, List[float]] = defaultdict(list)
+    for entry in entries:
+        if "req" in entry:
+            path = entry["req"]["path"].split("?")[0]
+            chunks = entry["res"].get("chunks")
+            total = entry.get("ttfb", 0.0) + (chunks[-1][0] if chunks else 0.0)
+            samples[f"{entry['ch']} {entry['req']['method']} {path}"].append(total)
+    for pair in stdio_pairs(entries):
+        samples[f"mcp-stdio {pair['req']['method']}"].append(pair["delay"])
+    return {name: summarize(values) for name, values in sorted(samples.items())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a TRAFFIC_LOG recording")
+    parser.add_argument("mode", choices=["stats", "http", "stdio"])
+    parser.add_argument("log", help="JSONL log written with TRAFFIC_LOG")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier for recorded delays (0 = none)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+
+    entries = read_log(args.log)
+    if args.mode == "stats":
+        print(f"{'endpoint':<60}{'n':>6}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, row in stats(entries).items():
+            print(f"{name[:59]:<60}{row['count']:>6}{row['p50'] * 1000:>10.1f}{row['p99'] * 1000:>10.1f}")
+        return
+
+    replayer = Replayer(entries, args.time_scale)
+    if args.mode == "stdio":
+        serve_stdio(replayer)
+        return
+
+    server, url = start_http_server(replayer, args.port, args.host)
+    print(f"🔁 Replaying {len(entries)} entries from {args.log} on {url} (time scale {args.time_scale})")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Matches: {dict(replayer.matches)}")
+
+
+if __name__ == "__main__":
+    main()
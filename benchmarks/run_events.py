@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark: assistant run latency with polling vs. streamed run events.
+
+Both strategies drive the same local stand-in for the Assistants API and the
+same WhatsApp tool execution (realtime/assistant_running.execute_tool_calls);
+only the run orchestration differs. "polling" is the previous
+wait_for_completion loop (runs.retrieve + time.sleep(1)); "streaming" is
+assistant_running.stream_run.
+
+Usage:
+    python -m benchmarks.run_events --runs 5 --tool-steps 2 --model-latency-ms 300
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from realtime import assistant_running
+from benchmarks.fakes import FakeAssistantsClient, FakeWhatsAppClient
+
+
+def polling_run(client, thread_id: str, assistant_id: str) -> None:
+    """Previous behaviour: create the run, then poll it once per second"""
+    run = client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id)
+    while True:
+        run_status = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+        if run_status.status == "completed":
+            client.beta.threads.messages.list(thread_id=thread_id, limit=1)
+            return
+        if run_status.status == "requires_action":
+            tool_calls = run_status.required_action.submit_tool_outputs.tool_calls
+            tool_outputs = assistant_running.execute_tool_calls(tool_calls)
+            client.beta.threads.runs.submit_tool_outputs(thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs)
+        time.sleep(1)
+
+
+def measure(label: str, runs: int, fake: FakeAssistantsClient, run_once) -> float:
+    thread = fake.beta.threads.create()
+    fake.api_calls = 0
+    samples = []
+    for _ in range(runs):
+        fake.beta.threads.messages.create(thread_id=thread.id, role="user", content="hola")
+        start = time.perf_counter()
+        run_once(thread.id)
+        samples.append(time.perf_counter() - start)
+    mean = statistics.mean(samples)
+    print(f"{label:10s} mean={mean:6.3f}s  p50={statistics.median(samples):6.3f}s  "
+          f"max={max(samples):6.3f}s  api calls/run={fake.api_calls / runs:5.1f}")
+    return mean
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tool-steps", type=int, default=2, help="requires_action cycles per run")
+    parser.add_argument("--calls-per-step", type=int, default=2)
+    parser.add_argument("--model-latency-ms", type=float, default=300.0)
+    parser.add_argument("--tool-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    fake = FakeAssistantsClient(args.model_latency_ms / 1000, args.tool_steps, args.calls_per_step)
+    assistant_running.openai_client = fake
+    assistant_running.whatsapp_client = FakeWhatsAppClient(args.tool_latency_ms / 1000)
+
+    polling = measure("polling", args.runs, fake, lambda thread_id: polling_run(fake, thread_id, "asst_bench"))
+    streaming = measure("streaming", args.runs, fake,
+                        lambda thread_id: assistant_running.stream_run(thread_id, "asst_bench"))
+    print(f"saved per run: {polling - streaming:.3f}s ({1 - streaming / polling:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-turn latency saved by caching the MCP tool catalog in client/main.py.
+
+Compares listing tools on every query (previous behaviour) against the cached
+catalog returned by WhatsAppMCPClient.get_tools(), using a stand-in session
+whose tools/list round-trip takes a configurable time.
+
+Usage:
+    python -m benchmarks.tool_catalog --turns 50 --rtt-ms 40
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from mcp import types
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+from client.main import WhatsAppMCPClient
+
+TOOL_NAMES = [
+    "search_contacts", "list_messages", "list_chats", "get_chat",
+    "get_direct_chat_by_contact", "get_contact_chats", "get_last_interaction",
+    "get_message_context", "send_message", "send_file", "send_audio_message",
+    "download_media",
+]
+
+
+class FakeSession:
+    """Minimal stand-in for ClientSession.list_tools with a fixed round-trip time."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.calls = 0
+
+    async def list_tools(self) -> types.ListToolsResult:
+        self.calls += 1
+        await asyncio.sleep(self.rtt)
+        return types.ListToolsResult(tools=[
+            types.Tool(
+                name=name,
+                description=f"WhatsApp tool {name}",
+                inputSchema={"type": "object", "properties": {"query": {"type": "string"}}},
+            )
+            for name in TOOL_NAMES
+        ])
+
+
+async def uncached_turn(session: FakeSession):
+    """Previous behaviour: list and rebuild the catalog on every query."""
+    response = await session.list_tools()
+    return [{
+        "name": tool.name,
+        "description": tool.description,
+        "input_schema": tool.inputSchema
+    } for tool in response.tools]
+
+
+async def run(turns: int, rtt: float):
+    session = FakeSession(rtt)
+    client = WhatsAppMCPClient()
+    client.session = session
+
+    uncached = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        await uncached_turn(session)
+        uncached.append(time.perf_counter() - start)
+
+    await client.get_tools()  # fetched once at connect time
+    cached = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        await client.get_tools()
+        cached.append(time.perf_counter() - start)
+
+    for label, samples in (("list_tools per turn", uncached), ("cached catalog", cached)):
+        print(f"{label:22s} mean={statistics.mean(samples) * 1000:8.3f} ms  "
+              f"p50={statistics.median(samples) * 1000:8.3f} ms")
+    saved = statistics.mean(uncached) - statistics.mean(cached)
+    print(f"saved per turn: {saved * 1000:.3f} ms  (tools/list calls: {session.calls} for {turns * 2} turns)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=40.0, help="Simulated tools/list round-trip")
+    args = parser.parse_args()
+    asyncio.run(run(args.turns, args.rtt_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tokens fed back to the model per tool result, before and after encoding.
+
+"repr" is what client/main.py used to send (str(result.content) of the MCP
+TextContent list), "json" is what realtime/assistant_running.py used to send
+(json.dumps of the result) and "encoded" is tool_result_encoder's output.
+Token counts use the same ~4 chars/token estimate as the encoder itself.
+
+Usage:
+    python -m benchmarks.tool_result_encoding
+"""
+
+import argparse
+import json
+import time
+
+from mcp import types
+
+from conversation_memory import estimate_tokens
+from tool_result_encoder import ResultStore, encode_tool_result
+from benchmarks.payloads import make_chats, make_contacts, make_messages
+
+
+def mcp_repr(result):
+    """str(result.content) for a FastMCP list result (one TextContent per item)"""
+    items = result if isinstance(result, list) else [result]
+    return str([types.TextContent(type="text", text=json.dumps(item, indent=2, ensure_ascii=False))
+                for item in items])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-tokens", type=int, default=1500, help="Encoder budget per result")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("list_messages x20 (+context)", "list_messages", make_messages(20)),
+        ("list_messages x20", "list_messages", make_messages(20, with_context=False)),
+        ("list_chats x20", "list_chats", make_chats(20)),
+        ("search_contacts x10", "search_contacts", make_contacts(10)),
+        ("list_messages x200", "list_messages", make_messages(200, with_context=False)),
+    ]
+
+    print(f"{'payload':30s} {'repr':>8s} {'json':>8s} {'encoded':>8s} {'saved':>7s} {'encode ms':>10s}")
+    for label, tool_name, payload in scenarios:
+        before_repr = estimate_tokens(mcp_repr(payload))
+        before_json = estimate_tokens(json.dumps(payload, ensure_ascii=False))
+        start = time.perf_counter()
+        encoded = encode_tool_result(payload, tool_name, max_tokens=args.max_tokens, store=ResultStore())
+        elapsed = (time.perf_counter() - start) * 1000
+        after = estimate_tokens(encoded)
+        print(f"{label:30s} {before_repr:8d} {before_json:8d} {after:8d} "
+              f"{1 - after / before_json:6.0%} {elapsed:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
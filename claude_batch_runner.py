@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Concurrent batch runner for claude_chat_api.
+
+Reads a file of operator prompts ("summarize chat A", "reply to B"), runs them
+concurrently through claude_chat_api.achat_with_whatsapp_access with a
+configurable limit, and appends each result to a JSONL output file as soon as
+it finishes. Prompts that share a session run one after the other so their
+history stays consistent; everything else runs in parallel. Calls go through
+the shared LLM scheduler with BATCH priority, so interactive users keep
+their headroom.
+
+Prompt file: one prompt per line, or JSONL lines like
+    {"id": "a1", "prompt": "Summarize my chat with Ana", "session": "ana"}
+
+Usage:
+    python claude_batch_runner.py prompts.txt --output results.jsonl --concurrency 8
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+from latency_stats import summarize
+
+
+def load_prompts(path: str) -> List[Dict[str, Any]]:
+    """
+    Read prompts from a text or JSONL file
+
+    Returns:
+        List of {"id", "prompt", "session"} dicts; blank lines are skipped
+    """
+    prompts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+            else:
+                item = {"prompt": line}
+            item.setdefault("id", str(line_number))
+            item.setdefault("session", f"batch-{item['id']}")
+            prompts.append(item)
+    return prompts
+
+
+async def run_batch(prompts: List[Dict[str, Any]], output_path: str, concurrency: int = 4,
+                    chat=None) -> Dict[str, Any]:
+    """
+    Run prompts concurrently and stream each result to output_path (JSONL)
+
+    Args:
+        prompts: Items from load_prompts()
+        output_path: File receiving one JSON line per finished prompt
+        concurrency: Maximum prompts in flight
+        chat: async (prompt, session_id) -> Messages API response;
+              defaults to claude_chat_api.achat_with_whatsapp_access with BATCH priority
+
+    Returns:
+        Report with counts, latency percentiles and throughput
+    """
+    if chat is None:
+        from claude_chat_api import achat_with_whatsapp_access
+        from llm_scheduler import BATCH
+        chat = functools.partial(achat_with_whatsapp_access, priority=BATCH)
+    from claude_chat_api import reply_text
+
+    limit = asyncio.Semaphore(concurrency)
+    session_locks: Dict[str, asyncio.Lock] = {}
+    latencies: List[float] = []
+    failures = 0
+    started = time.monotonic()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+        async def run_one(item: Dict[str, Any]) -> None:
+            nonlocal failures
+            session_lock = session_locks.setdefault(item["session"], asyncio.Lock())
+            async with session_lock, limit:
+                call_started = time.monotonic()
+                record = {"id": item["id"], "session": item["session"], "prompt": item["prompt"]}
+                try:
+                    response = await chat(item["prompt"], item["session"])
+                    record.update(ok=True, response=reply_text(response),
+                                  usage={"input_tokens": response.usage.input_tokens,
+                                         "output_tokens": response.usage.output_tokens})
+                except Exception as e:
+                    failures += 1
+                    record.update(ok=False, error=f"{type(e).__name__}: {e}")
+                latency = time.monotonic() - call_started
+                latencies.append(latency)
+                record["latency"] = round(latency, 3)
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+
+        await asyncio.gather(*(run_one(item) for item in prompts))
+
+    elapsed = time.monotonic() - started
+    latency = summarize(latencies)
+    return {
+        "prompts": len(prompts),
+        "succeeded": len(prompts) - failures,
+        "failed": failures,
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(len(prompts) / elapsed, 3) if elapsed else 0.0,
+        "latency": {key: round(value, 3) for key, value in latency.items() if key != "count"},
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("prompts", help="Text file (one prompt per line) or JSONL file")
+    parser.add_argument("--output", "-o", default="batch_results.jsonl", help="JSONL file receiving the results")
+    parser.add_argument("--concurrency", "-c", type=int, default=4, help="Maximum prompts in flight")
+    parser.add_argument("--report", help="Also write the summary report to this JSON file")
+    args = parser.parse_args(argv)
+
+    prompts = load_prompts(args.prompts)
+    print(f"🚀 Running {len(prompts)} prompts with concurrency {args.concurrency} -> {args.output}")
+    report = asyncio.run(run_batch(prompts, args.output, args.concurrency))
+
+    latency = report["latency"]
+    print(f"✅ {report['succeeded']} succeeded, ❌ {report['failed']} failed in {report['elapsed_seconds']:.1f}s")
+    print(f"⏱️  p50 {latency['p50']:.2f}s · p95 {latency['p95']:.2f}s · "
+          f"throughput {report['throughput_per_second']:.2f} prompts/s")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,16 +11,58 @@ Dependencies are installed in wapp_env virtual environment.
 """
 
 import os
-import anthropic
+import threading
 from dotenv import load_dotenv
+from prompt_cache import CacheStats, cached_messages, cached_system
+from conversation_memory import ConversationStore
+from llm_scheduler import INTERACTIVE, estimate_request_tokens, get_scheduler
+from traffic_log import async_http_client, http_client
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Anthropic client
-client = anthropic.Anthropic(
-    api_key=os.getenv("ANTHROPIC_API_KEY")
-)
+# Anthropic clients are built on first use: importing the SDK alone takes about
+# a second, which every importer (claude_batch_runner, benchmarks) would pay
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client():
+    """
+    Shared anthropic.Anthropic client (rate-limit retries are left to the shared
+    scheduler; traffic is teed to TRAFFIC_LOG when set)
+    """
+    with _clients_lock:
+        if "sync" not in _clients:
+            import anthropic
+            _clients["sync"] = anthropic.Anthropic(
+                api_key=os.getenv("ANTHROPIC_API_KEY"),
+                max_retries=0,
+                http_client=http_client("anthropic")
+            )
+        return _clients["sync"]
+
+def get_async_client():
+    """Shared anthropic.AsyncAnthropic client for concurrent callers (claude_batch_runner.py)"""
+    with _clients_lock:
+        if "async" not in _clients:
+            import anthropic
+            _clients["async"] = anthropic.AsyncAnthropic(
+                api_key=os.getenv("ANTHROPIC_API_KEY"),
+                max_retries=0,
+                http_client=async_http_client("anthropic")
+            )
+        return _clients["async"]
+
+def __getattr__(name):
+    # `client` / `async_client` used to be module attributes built at import
+    if name == "client":
+        return get_client()
+    if name == "async_client":
+        return get_async_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+MODEL = "claude-sonnet-4-20250514"
+MAX_TOKENS = 2000
 
 # MCP Server configuration
 MCP_SERVER_CONFIG = {
@@ -30,36 +72,108 @@ MCP_SERVER_CONFIG = {
     "authorization_token": "microniii"  # From whatsapp-mcp-server/.env
 }
 
-def chat_with_whatsapp_access(user_message: str):
+# Stable system instructions; cached together with the MCP tool definitions
+SYSTEM_PROMPT = """You are an assistant with access to the user's WhatsApp account through the
+whatsapp-mcp-remote MCP server. You can search contacts, list chats and messages, read message
+context, send messages and files, and check for new messages.
+
+- Use the tools to fetch real data; never invent contacts, chats or messages.
+- When several independent lookups are needed, request them in the same turn.
+- Use the chat JID for groups and the phone number with country code (no '+') for people.
+- Answer in the user's language, briefly and clearly."""
+
+# Prompt cache hit/miss token counts across calls
+cache_stats = CacheStats("claude_chat_api")
+
+# Per-session conversation history, compacted once it exceeds the token budget
+conversations = ConversationStore(
+    token_budget=int(os.getenv("CHAT_TOKEN_BUDGET", "8000")),
+    keep_recent_turns=int(os.getenv("CHAT_KEEP_RECENT_TURNS", "4"))
+)
+
+def chat_with_whatsapp_access(user_message: str, session_id: str = "default", priority: int = INTERACTIVE):
     """
     Send a message to Claude with WhatsApp MCP server access.
     
     Args:
         user_message: The message to send to Claude
+        session_id: Conversation key; each session keeps its own history
+        priority: llm_scheduler priority (INTERACTIVE or BATCH)
         
     Returns:
         Claude's response with access to WhatsApp tools
     """
+    client = get_client()
+    import anthropic  # already loaded by get_client()
     try:
-        print(f"🔗 Connecting to MCP server: {MCP_SERVER_CONFIG['url']}")
-        response = client.beta.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=2000,
-            messages=[{
-                "role": "user", 
-                "content": user_message
-            }],
-            mcp_servers=[MCP_SERVER_CONFIG],
-            betas=["mcp-client-2025-04-04"]
-        )
+        memory = conversations.get(session_id)
+        with memory.lock:
+            print(f"🔗 Connecting to MCP server: {MCP_SERVER_CONFIG['url']}")
+            messages = cached_messages(memory.build_messages(user_message))
+            response = get_scheduler().call(
+                "anthropic", MODEL,
+                lambda: client.beta.messages.create(
+                    model=MODEL,
+                    max_tokens=MAX_TOKENS,
+                    system=cached_system(SYSTEM_PROMPT),
+                    messages=messages,
+                    mcp_servers=[MCP_SERVER_CONFIG],
+                    betas=["mcp-client-2025-04-04"]
+                ),
+                tokens=estimate_request_tokens(messages, MAX_TOKENS),
+                priority=priority
+            )
+            cache_stats.record(response.usage)
+            memory.add_turn(user_message, [block.model_dump(exclude_none=True) for block in response.content])
         
-        return response.content[0].text
+        return reply_text(response)
         
     except anthropic.APIError as e:
         return f"API Error: {e.status_code} - {e.message}"
     except Exception as e:
         return f"Error: {str(e)}"
 
+def reply_text(response) -> str:
+    """With MCP tools the reply may start with tool blocks; return the text parts"""
+    text = "\n".join(block.text for block in response.content if block.type == "text")
+    return text or "No response received."
+
+async def achat_with_whatsapp_access(user_message: str, session_id: str = "default", priority: int = INTERACTIVE):
+    """
+    Async variant of chat_with_whatsapp_access for concurrent callers.
+    
+    The session history is read before the request and updated after it, so
+    callers must not run two prompts of the same session at the same time.
+    
+    Args:
+        user_message: The message to send to Claude
+        session_id: Conversation key; each session keeps its own history
+        priority: llm_scheduler priority (INTERACTIVE or BATCH)
+        
+    Returns:
+        The Messages API response (raises anthropic.APIError on failure)
+    """
+    async_client = get_async_client()
+    memory = conversations.get(session_id)
+    messages = cached_messages(memory.build_messages(user_message))
+    response = await get_scheduler().call_async(
+        "anthropic", MODEL,
+        lambda: async_client.beta.messages.create(
+            model=MODEL,
+            max_tokens=MAX_TOKENS,
+            system=cached_system(SYSTEM_PROMPT),
+            messages=messages,
+            mcp_servers=[MCP_SERVER_CONFIG],
+            betas=["mcp-client-2025-04-04"]
+        ),
+        tokens=estimate_request_tokens(messages, MAX_TOKENS),
+        priority=priority
+    )
+    cache_stats.record(response.usage)
+    with memory.lock:
+        memory.add_turn(user_message, [block.model_dump(exclude_none=True) for block in response.content])
+    return response
+
 def main():
     """
     Simple interactive chat loop
@@ -107,8 +221,8 @@ if __name__ == "__main__":
         # Try alternative approach without MCP
         print("\n🔄 Testing without MCP server...")
         try:
-            simple_response = client.beta.messages.create(
-                model="claude-sonnet-4-20250514",
+            simple_response = get_client().beta.messages.create(
+                model=MODEL,
                 max_tokens=1000,
                 messages=[{"role": "user", "content": "Hello, are you open ai or anthropic team?"}],
                 betas=["mcp-client-2025-04-04"]
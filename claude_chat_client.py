@@ -4,64 +4,314 @@ WhatsApp MCP Client - A comprehensive client for interacting with WhatsApp MCP R
 Provides easy-to-use functions for all WhatsApp operations through the MCP protocol.
 """
 
+import contextvars
 import json
 import requests
-from typing import Dict, Any, Optional, List
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, Optional, List
 from datetime import datetime
 import os
+import time
 from dotenv import load_dotenv
+from deadlines import DEFAULT_BUDGET, Deadline, DeadlineExceeded
+from latency_stats import LatencyWindow
+from traffic_log import record_exchange
 
 # Load environment variables
 load_dotenv()
 
+# Every call has a deadline (deadlines.py: the tool's budget from MCP_TOOL_BUDGETS,
+# or the enclosing deadline_scope) that bounds its HTTP requests and retries.
+# JSON-RPC error of a server whose tool class is saturated; the call was refused
+# before doing any work, so it is retried (after its retry_after, default
+# BUSY_RETRY_AFTER seconds) up to MCP_MAX_RETRIES times for every tool.
+# Other failures are not retried.
+BUSY_ERROR_CODE = -32001
+BUSY_RETRY_AFTER = 0.5
+MCP_MAX_RETRIES = int(os.getenv("MCP_MAX_RETRIES", "1"))
+
+# Calls slower than this are logged (to MCP_SLOW_CALL_LOG as JSONL if set)
+SLOW_CALL_SECONDS = float(os.getenv("MCP_SLOW_CALL_SECONDS", "2.0"))
+SLOW_CALL_LOG = os.getenv("MCP_SLOW_CALL_LOG")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Calls made inside stats_scope(name) are also counted under that name
+_stats_scope: contextvars.ContextVar = contextvars.ContextVar("mcp_stats_scope", default=None)
+
+
+@contextmanager
+def stats_scope(name: str) -> Iterator[str]:
+    """
+    Attribute the tool calls made in this context (and in threads started with
+    contextvars.copy_context()) to `name`, readable with client.stats(name)
+    """
+    token = _stats_scope.set(name)
+    try:
+        yield name
+    finally:
+        _stats_scope.reset(token)
+
+
+class ToolCall:
+    """One _call_tool invocation, as seen by the instrumentation hooks"""
+
+    def __init__(self, tool: str, arguments: Dict[str, Any]):
+        self.tool = tool
+        self.arguments = arguments
+        self.scope: Optional[str] = _stats_scope.get()
+        self.started = time.time()
+        self.duration = 0.0
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.error: Optional[str] = None
+
+
+class _ToolStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.slow_calls = 0
+        self.total_seconds = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.response_bytes_max = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency = LatencyWindow(max_samples=2048, window_seconds=None)
+
+    def add(self, call: ToolCall, slow: bool) -> None:
+        self.calls += 1
+        self.errors += call.error is not None
+        self.retries += call.retries
+        self.slow_calls += slow
+        self.total_seconds += call.duration
+        self.request_bytes += call.request_bytes
+        self.response_bytes += call.response_bytes
+        self.response_bytes_max = max(self.response_bytes_max, call.response_bytes)
+        self.histogram[next((i for i, bound in enumerate(LATENCY_BUCKETS) if call.duration <= bound),
+                            len(LATENCY_BUCKETS))] += 1
+        self.latency.add(call.duration)
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"<={bound}s" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "slow_calls": self.slow_calls,
+            "total_seconds": round(self.total_seconds, 4),
+            "latency": {key: round(value, 4) for key, value in self.latency.summary().items()},
+            "histogram": dict(zip(labels, self.histogram)),
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "response_bytes_max": self.response_bytes_max,
+        }
+
+
+class ToolCallCollector:
+    """Built-in after-hook: per-tool latency histograms, retries, payload sizes and a slow-call log"""
+
+    def __init__(self, slow_threshold: float = SLOW_CALL_SECONDS, slow_log_path: Optional[str] = SLOW_CALL_LOG,
+                 max_scopes: int = 1000):
+        self.slow_threshold = slow_threshold
+        self.slow_log_path = slow_log_path
+        self.max_scopes = max_scopes
+        self.tools: Dict[str, _ToolStats] = {}
+        self.scopes: "OrderedDict[str, Dict[str, _ToolStats]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def after(self, call: ToolCall) -> None:
+        slow = call.duration >= self.slow_threshold
+        with self._lock:
+            targets = [self.tools]
+            if call.scope is not None:
+                if call.scope not in self.scopes:
+                    self.scopes[call.scope] = {}
+                    # Scopes nobody popped are dropped oldest first
+                    while len(self.scopes) > self.max_scopes:
+                        self.scopes.popitem(last=False)
+                targets.append(self.scopes[call.scope])
+            for tools in targets:
+                tools.setdefault(call.tool, _ToolStats()).add(call, slow)
+        if slow:
+            self._log_slow(call)
+
+    def _log_slow(self, call: ToolCall) -> None:
+        entry = {
+            "ts": round(call.started, 3),
+            "tool": call.tool,
+            "duration": round(call.duration, 4),
+            "retries": call.retries,
+            "request_bytes": call.request_bytes,
+            "response_bytes": call.response_bytes,
+            "error": call.error,
+            "scope": call.scope,
+            "arguments": {key: value[:100] if isinstance(value, str) else value
+                          for key, value in call.arguments.items()},
+        }
+        if self.slow_log_path:
+            with self._lock, open(self.slow_log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        else:
+            print(f"🐢 Slow MCP call: {call.tool} took {call.duration:.2f}s (retries: {call.retries})")
+
+    def snapshot(self, scope: Optional[str] = None, pop: bool = False) -> Dict[str, Any]:
+        """Totals and per-tool stats, for everything or for one scope"""
+        with self._lock:
+            if scope is None:
+                tools = self.tools
+            elif pop:
+                tools = self.scopes.pop(scope, {})
+            else:
+                tools = self.scopes.get(scope, {})
+            per_tool = {name: stats.snapshot() for name, stats in sorted(tools.items())}
+        return {
+            "calls": sum(stats["calls"] for stats in per_tool.values()),
+            "errors": sum(stats["errors"] for stats in per_tool.values()),
+            "retries": sum(stats["retries"] for stats in per_tool.values()),
+            "total_seconds": round(sum(stats["total_seconds"] for stats in per_tool.values()), 4),
+            "tools": per_tool,
+        }
+
+
 class WhatsAppMCPClient:
     """Client for WhatsApp MCP Remote Server"""
     
-    def __init__(self, base_url: str, auth_token: Optional[str] = None):
+    def __init__(self, base_url: str, auth_token: Optional[str] = None, max_retries: int = MCP_MAX_RETRIES):
         """
         Initialize the WhatsApp MCP client
         
         Args:
             base_url: Base URL of the MCP server (e.g., "https://ab9889ab3f65.ngrok-free.app")
             auth_token: Optional authentication token
+            max_retries: Retries of calls the server refused as busy
         """
         self.base_url = base_url.rstrip('/')
         self.auth_token = auth_token or os.getenv("MCP_AUTH_TOKEN")
         self.headers = {
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            # Required by server/main.py's streamable-http transport (--stateless --json-response)
+            "Accept": "application/json"
         }
         
         if self.auth_token and self.auth_token != "your-secret-token-here":
             self.headers["Authorization"] = f"Bearer {self.auth_token}"
+        
+        self.max_retries = max_retries
+        
+        # Instrumentation hooks around every tool call; the built-in collector backs stats()
+        self._before_hooks: List[Callable[[ToolCall], None]] = []
+        self._after_hooks: List[Callable[[ToolCall], None]] = []
+        self.collector = ToolCallCollector()
+        self.add_hooks(after=self.collector.after)
     
-    def _make_mcp_request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def add_hooks(self,
+                  before: Optional[Callable[[ToolCall], None]] = None,
+                  after: Optional[Callable[[ToolCall], None]] = None) -> None:
+        """
+        Register instrumentation callbacks for tool calls
+        
+        Args:
+            before: Called with the ToolCall before the request is sent
+            after: Called with the completed ToolCall (duration, retries, sizes, error)
+        """
+        if before:
+            self._before_hooks.append(before)
+        if after:
+            self._after_hooks.append(after)
+    
+    def _run_hooks(self, hooks: List[Callable[[ToolCall], None]], call: ToolCall) -> None:
+        for hook in hooks:
+            try:
+                hook(call)
+            except Exception as e:
+                # Instrumentation must never break the call itself
+                print(f"⚠️ Tool hook failed: {e}")
+    
+    def stats(self, scope: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Snapshot of the built-in collector
+        
+        Args:
+            scope: Only the calls made inside stats_scope(scope)
+            
+        Returns:
+            Call/error/retry totals and per-tool latency, histogram and payload sizes
+        """
+        return self.collector.snapshot(scope)
+    
+    def pop_stats(self, scope: str) -> Dict[str, Any]:
+        """Like stats(scope), and forget the scope afterwards"""
+        return self.collector.snapshot(scope, pop=True)
+    
+    def _make_mcp_request(self, method: str, params: Optional[Dict[str, Any]] = None,
+                          call: Optional[ToolCall] = None,
+                          deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Make an MCP JSON-RPC 2.0 request
         
         Args:
             method: MCP method name
             params: Optional parameters
+            call: ToolCall that receives retry count and payload sizes
+            deadline: When to give up, retries included (default: MCP_DEFAULT_BUDGET from now);
+                the time left is sent to the server in params._meta.timeout
             
         Returns:
             Response data
         """
+        deadline = deadline or Deadline.after(DEFAULT_BUDGET)
         payload = {
             "jsonrpc": "2.0",
             "method": method,
-            "params": params or {},
+            "params": dict(params or {}),
             "id": 1
         }
         
         try:
-            response = requests.post(
-                self.base_url,
-                json=payload,
-                headers=self.headers,
-                timeout=30
-            )
+            attempt = 0
+            while True:
+                # The server is stateless (one session per POST), so an abandoned call can't be
+                # cancelled with notifications/cancelled; the deadline stops it there instead
+                remaining = deadline.check(method)
+                payload["params"]["_meta"] = dict(payload["params"].get("_meta") or {}, **deadline.meta())
+                body = json.dumps(payload).encode("utf-8")
+                if call and not attempt:
+                    call.request_bytes = len(body)
+                start = time.perf_counter()
+                try:
+                    response = requests.post(
+                        self.base_url,
+                        data=body,
+                        headers=self.headers,
+                        timeout=remaining
+                    )
+                except requests.Timeout as e:
+                    if deadline.expired:
+                        raise DeadlineExceeded(f"{method} did not complete before its deadline") from e
+                    raise
+                busy = self._busy_retry_after(response)
+                if busy is None or attempt >= self.max_retries or busy >= deadline.remaining():
+                    break
+                attempt += 1
+                if call:
+                    call.retries = attempt
+                time.sleep(busy)
             response.raise_for_status()
+            if call:
+                call.response_bytes = len(response.content)
             
             result = response.json()
+            record_exchange(
+                "mcp-http",
+                {"method": "POST", "path": "/", "body": payload},
+                {"status": response.status_code, "headers": {"content-type": "application/json"}, "body": result},
+                time.perf_counter() - start
+            )
             
             if "error" in result:
                 raise Exception(f"MCP Error: {result['error'].get('message', 'Unknown error')}")
@@ -71,22 +321,45 @@ class WhatsAppMCPClient:
         except requests.RequestException as e:
             raise Exception(f"Request failed: {str(e)}")
     
-    def _call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+    @staticmethod
+    def _busy_retry_after(response: requests.Response) -> Optional[float]:
+        """Seconds to wait if the server refused the call as busy (BUSY_ERROR_CODE), else None"""
+        try:
+            error = response.json().get("error") or {}
+        except ValueError:
+            return None
+        if error.get("code") != BUSY_ERROR_CODE:
+            return None
+        return float((error.get("data") or {}).get("retry_after", BUSY_RETRY_AFTER))
+    
+    def _call_tool(self, tool_name: str, arguments: Dict[str, Any], deadline: Optional[Deadline] = None) -> Any:
         """
         Call a WhatsApp MCP tool
         
         Args:
             tool_name: Name of the tool to call
             arguments: Tool arguments
+            deadline: Deadline of the call (default: the tool's budget, or the
+                enclosing deadlines.deadline_scope if that ends sooner)
             
         Returns:
             Tool result
         """
-        result = self._make_mcp_request("tools/call", {
-            "name": tool_name,
-            "arguments": arguments,
-            "server_name": "whatsapp-mcp-remote"
-        })
+        call = ToolCall(tool_name, arguments)
+        self._run_hooks(self._before_hooks, call)
+        start = time.perf_counter()
+        try:
+            result = self._make_mcp_request("tools/call", {
+                "name": tool_name,
+                "arguments": arguments,
+                "server_name": "whatsapp-mcp-remote"
+            }, call=call, deadline=Deadline.for_tool(tool_name, deadline))
+        except Exception as e:
+            call.error = str(e)
+            raise
+        finally:
+            call.duration = time.perf_counter() - start
+            self._run_hooks(self._after_hooks, call)
         
         # Extract content from MCP response
         if "content" in result and result["content"]:
@@ -261,9 +534,17 @@ class WhatsAppMCPClient:
             Server information dict
         """
         try:
+            start = time.perf_counter()
             response = requests.get(self.base_url, headers=self.headers, timeout=10)
             response.raise_for_status()
-            return response.json()
+            info = response.json()
+            record_exchange(
+                "mcp-http",
+                {"method": "GET", "path": "/", "body": None},
+                {"status": response.status_code, "headers": {"content-type": "application/json"}, "body": info},
+                time.perf_counter() - start
+            )
+            return info
         except requests.RequestException as e:
             raise Exception(f"Failed to get server info: {str(e)}")
     
@@ -1,65 +1,205 @@
 import asyncio
+import json
 import sys
 import os
-from typing import Optional
+import time
+import uuid
+from typing import Optional, List, Dict, Any, Callable
 from contextlib import AsyncExitStack
 
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
 
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 from dotenv import load_dotenv
 
+# Permitir importar los módulos compartidos de la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_cache import CacheStats, cached_messages, cached_system, cached_tools
+from tool_result_encoder import FETCH_MORE_TOOL, ResultStore, encode_tool_result, mcp_result_to_python
+from llm_scheduler import INTERACTIVE, estimate_request_tokens, get_scheduler
+from model_router import FAST, LARGE, ModelRouter
+from traffic_log import async_http_client, wrap_command
+from deadlines import Deadline, DeadlineExceeded
+
 # Cargar variables de entorno
 load_dotenv()
 
+# Ruta opcional para persistir el catálogo de herramientas entre ejecuciones
+# (con FastMCP, serverInfo.version es la del SDK y no cambia al editar las
+# herramientas, así que el catálogo guardado se revalida en segundo plano)
+TOOLS_CACHE_PATH = os.getenv("WHATSAPP_MCP_TOOLS_CACHE")
+
+# Comando del servidor MCP de WhatsApp (misma configuración que Claude Desktop;
+# los benchmarks lo reemplazan por un servidor local)
+SERVER_COMMAND = [
+    r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp - copia\wapp_env\Scripts\uv.exe",
+    "--directory",
+    r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp - copia\whatsapp-mcp-server",
+    "run",
+    "main.py"
+]
+
+# URL de un servidor MCP compartido (server/main.py --transport streamable-http,
+# p. ej. "http://127.0.0.1:8000/mcp"); si está definida no se inicia un servidor propio.
+# MCP_AUTH_TOKEN se envía como token Bearer
+SERVER_URL = os.getenv("MCP_SERVER_URL")
+
+MODEL = "claude-3-5-sonnet-20241022"
+# Modelo rápido para pasos simples (enrutamiento desactivable con CLIENT_MODEL_ROUTING=0)
+FAST_MODEL = os.getenv("CLIENT_FAST_MODEL", "claude-3-5-haiku-20241022")
+MODEL_ROUTING = os.getenv("CLIENT_MODEL_ROUTING", "1") != "0"
+
+# Instrucciones de sistema estables (se cachean junto con las herramientas)
+SYSTEM_PROMPT = """Eres un asistente que gestiona la cuenta de WhatsApp del usuario mediante herramientas MCP.
+Puedes buscar contactos, listar chats y mensajes, obtener contexto de mensajes, enviar mensajes,
+archivos y audios, y descargar contenido multimedia.
+
+- Usa las herramientas para obtener datos reales; no inventes contactos, chats ni mensajes.
+- Si necesitas varias herramientas independientes, pídelas todas en el mismo turno.
+- Para enviar a grupos usa el JID del chat; para personas, el número con código de país sin '+'.
+- Responde en el idioma del usuario, de forma breve y clara."""
+
+# Límites del bucle de agente por consulta
+MAX_AGENT_ITERATIONS = int(os.getenv("MAX_AGENT_ITERATIONS", "8"))
+MAX_AGENT_SECONDS = float(os.getenv("MAX_AGENT_SECONDS", "120"))
+
+# Clave de _meta con el id que el cliente asigna a cada tools/call (para cancelarlo)
+CALL_ID_META_KEY = "call_id"
+
+class RequestIdTap:
+    """Flujo de escritura de la sesión MCP que anota el id JSON-RPC con el que
+    sale cada petición marcada con _meta.call_id.
+
+    El SDK no expone el id de sus peticiones ni avisa al servidor al cancelarlas;
+    así notifications/cancelled usa el id real del mensaje enviado.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.request_ids: Dict[str, Any] = {}
+
+    async def send(self, message) -> None:
+        root = message.message.root
+        if isinstance(root, types.JSONRPCRequest):
+            call_id = ((root.params or {}).get("_meta") or {}).get(CALL_ID_META_KEY)
+            if call_id:
+                self.request_ids[call_id] = root.id
+        await self._stream.send(message)
+
+    async def __aenter__(self):
+        await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._stream.__aexit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
 class WhatsAppMCPClient:
-    def __init__(self):
-        """Inicializar el cliente MCP para WhatsApp."""
+    def __init__(self, max_iterations: int = MAX_AGENT_ITERATIONS, max_seconds: float = MAX_AGENT_SECONDS):
+        """Inicializar el cliente MCP para WhatsApp.
+
+        Args:
+            max_iterations: Máximo de llamadas a Claude por consulta
+            max_seconds: Tiempo máximo (en segundos) por consulta
+        """
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
+        self.max_iterations = max_iterations
+        self.max_seconds = max_seconds
+
+        # Catálogo de herramientas: se obtiene al conectar y solo se refresca
+        # cuando el servidor envía notifications/tools/list_changed
+        self.available_tools: Optional[List[Dict[str, Any]]] = None
+        self.tools_stale = False
+        self.server_key: Optional[str] = None
+        # Revalidación del catálogo cargado desde caché
+        self._tools_refresh: Optional[asyncio.Task] = None
         
         # Inicializar cliente de Anthropic
         api_key = os.getenv('ANTHROPIC_API_KEY')
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY no encontrada en variables de entorno")
         
-        self.anthropic = Anthropic(api_key=api_key)
+        # Los reintentos por límite de tasa los gestiona el planificador compartido
+        # (con TRAFFIC_LOG definido, las peticiones se graban para reproducirlas)
+        self.anthropic = AsyncAnthropic(api_key=api_key, max_retries=0,
+                                        http_client=async_http_client("anthropic"))
+        self.scheduler = get_scheduler()
+        self.router = ModelRouter(FAST_MODEL, MODEL, enabled=MODEL_ROUTING)
+        self.last_timing: Dict[str, float] = {}
+        # Traza de la consulta en curso; viaja en _meta.traceparent de cada tools/call
+        self.trace_id: Optional[str] = None
+        # Fin de la consulta en curso; cada tools/call lleva lo que quede (o su
+        # presupuesto, si es menor) en _meta.timeout
+        self.deadline: Optional[Deadline] = None
+        self.cache_stats = CacheStats("client")
+        # Filas de resultados truncados, paginables con fetch_more_result
+        self.result_store = ResultStore()
         print("✓ Cliente Anthropic inicializado")
 
+    async def _connect_http(self):
+        """Abrir el transporte streamable HTTP hacia SERVER_URL"""
+        import httpx
+        from mcp.client.streamable_http import streamable_http_client
+        
+        token = os.getenv("MCP_AUTH_TOKEN")
+        http = await self.exit_stack.enter_async_context(httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {token}"} if token else None,
+            timeout=httpx.Timeout(30, read=300)
+        ))
+        read_stream, write_stream, _ = await self.exit_stack.enter_async_context(
+            streamable_http_client(SERVER_URL, http_client=http)
+        )
+        return read_stream, write_stream
+
     async def connect_to_whatsapp_server(self):
         """Conectar al servidor MCP de WhatsApp."""
         
-        # Configuración específica para tu servidor de WhatsApp
-        # Usando la misma configuración que tienes en Claude Desktop
+        # Configuración específica para tu servidor de WhatsApp (ver SERVER_COMMAND);
+        # con TRAFFIC_LOG definido pasa por el proxy que graba el tráfico
+        command = wrap_command(SERVER_COMMAND)
         server_params = StdioServerParameters(
-            command=r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp - copia\wapp_env\Scripts\uv.exe",
-            args=[
-                "--directory",
-                r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp - copia\whatsapp-mcp-server",
-                "run",
-                "main.py"
-            ],
+            command=command[0],
+            args=command[1:],
             env=None
         )
         
         try:
             # Conectar al servidor
-            stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-            self.stdio, self.write = stdio_transport
-            self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
+            if SERVER_URL:
+                self.stdio, self.write = await self._connect_http()
+            else:
+                stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
+                self.stdio, self.write = stdio_transport
+            self.write = RequestIdTap(self.write)
+            self.session = await self.exit_stack.enter_async_context(
+                ClientSession(self.stdio, self.write, message_handler=self._handle_server_message)
+            )
             
             # Inicializar sesión
-            await self.session.initialize()
+            init_result = await self.session.initialize()
+            server_info = init_result.serverInfo
+            self.server_key = f"{server_info.name}@{server_info.version}"
             
-            # Listar herramientas disponibles
-            response = await self.session.list_tools()
-            tools = response.tools
+            # Listar herramientas disponibles (o reutilizar el catálogo guardado)
+            tools = self._load_tools_cache()
+            if tools is None:
+                tools = await self._refresh_tools()
+            else:
+                self.available_tools = tools
+                # El servidor pudo cambiar sus herramientas sin cambiar de versión:
+                # se vuelven a pedir en segundo plano y se reemplazan si difieren
+                self._tools_refresh = asyncio.create_task(self._revalidate_tools())
+                print("⚡ Catálogo de herramientas cargado desde caché")
             
             print("✓ Conectado al servidor de WhatsApp MCP")
             print(f"📱 Herramientas disponibles ({len(tools)}):")
             for tool in tools:
-                print(f"  • {tool.name}: {tool.description}")
+                print(f"  • {tool['name']}: {tool['description']}")
             
             return True
             
@@ -67,20 +207,92 @@ class WhatsAppMCPClient:
             print(f"❌ Error conectando al servidor: {e}")
             return False
 
-    async def process_query(self, query: str) -> str:
-        """Procesar una consulta usando Claude y las herramientas de WhatsApp."""
+    async def _handle_server_message(self, message) -> None:
+        """Marcar el catálogo como obsoleto cuando el servidor lo notifique."""
+        if isinstance(message, types.ServerNotification) and isinstance(
+            message.root, types.ToolListChangedNotification
+        ):
+            self.tools_stale = True
+
+    async def _fetch_tools(self) -> List[Dict[str, Any]]:
+        """Catálogo de herramientas tal como lo anuncia el servidor."""
+        response = await self.session.list_tools()
+        return [{
+            "name": tool.name,
+            "description": tool.description,
+            "input_schema": tool.inputSchema
+        } for tool in response.tools]
+
+    async def _refresh_tools(self) -> List[Dict[str, Any]]:
+        """Obtener el catálogo de herramientas del servidor y guardarlo."""
+        self.available_tools = await self._fetch_tools()
+        self.tools_stale = False
+        self._save_tools_cache()
+        return self.available_tools
+
+    async def _revalidate_tools(self) -> None:
+        """Comparar el catálogo en caché con el del servidor y reemplazarlo si cambió."""
+        try:
+            tools = await self._fetch_tools()
+        except Exception as e:
+            print(f"⚠️  No se pudo revalidar el catálogo de herramientas: {e}")
+            return
+        if tools != self.available_tools:
+            self.available_tools = tools
+            self._save_tools_cache()
+            print("🔄 Catálogo de herramientas actualizado (la caché estaba desactualizada)")
+
+    async def get_tools(self) -> List[Dict[str, Any]]:
+        """Devolver el catálogo en memoria, refrescándolo solo si cambió."""
+        if self._tools_refresh is not None:
+            # No usar el catálogo en caché antes de revalidarlo
+            await self._tools_refresh
+            self._tools_refresh = None
+        if self.available_tools is None or self.tools_stale:
+            return await self._refresh_tools()
+        return self.available_tools
+
+    def _load_tools_cache(self) -> Optional[List[Dict[str, Any]]]:
+        """Leer el catálogo persistido si corresponde a la misma versión del servidor."""
+        if not TOOLS_CACHE_PATH:
+            return None
+        try:
+            with open(TOOLS_CACHE_PATH, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("server") != self.server_key:
+            return None
+        return cached.get("tools")
+
+    def _save_tools_cache(self) -> None:
+        """Persistir el catálogo en disco, indexado por versión del servidor."""
+        if not TOOLS_CACHE_PATH:
+            return
+        try:
+            with open(TOOLS_CACHE_PATH, "w", encoding="utf-8") as f:
+                json.dump({"server": self.server_key, "tools": self.available_tools}, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar el catálogo de herramientas: {e}")
+
+    async def process_query(self, query: str, on_text: Optional[Callable[[str], None]] = None) -> str:
+        """Procesar una consulta usando Claude y las herramientas de WhatsApp.
+
+        Ejecuta un bucle de agente: todas las herramientas pedidas en un turno
+        se ejecutan en paralelo y sus resultados vuelven en un solo mensaje,
+        hasta que Claude termina o se alcanzan los límites configurados.
+
+        Args:
+            query: Consulta del usuario
+            on_text: Callback opcional que recibe el texto a medida que llega
+        """
         
         if not self.session:
             return "❌ No hay conexión al servidor MCP"
         
         try:
-            # Obtener herramientas disponibles
-            response = await self.session.list_tools()
-            available_tools = [{ 
-                "name": tool.name,
-                "description": tool.description,
-                "input_schema": tool.inputSchema
-            } for tool in response.tools]
+            # Obtener herramientas disponibles (catálogo en memoria + paginación local)
+            available_tools = await self.get_tools() + [FETCH_MORE_TOOL]
 
             # Mensaje inicial al usuario
             messages = [
@@ -90,104 +302,233 @@ class WhatsAppMCPClient:
                 }
             ]
 
-            # Llamada inicial a Claude
-            response = self.anthropic.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=2000,
-                messages=messages,
-                tools=available_tools
-            )
-
             final_text = []
+            started = time.monotonic()
+            deadline = started + self.max_seconds
+            self.last_timing = {}
+            self.trace_id = uuid.uuid4().hex
+            self.deadline = Deadline(deadline)
 
-            # Separar texto inicial de las herramientas
-            initial_text = ""
-            tools_to_execute = []
-            
-            for content in response.content:
-                if content.type == 'text':
-                    initial_text = content.text
-                    final_text.append(content.text)
-                elif content.type == 'tool_use':
-                    tools_to_execute.append(content)
-            
-            # Ejecutar cada herramienta
-            for tool_content in tools_to_execute:
-                tool_name = tool_content.name
-                tool_args = tool_content.input
-                
-                print(f"🔧 Ejecutando: {tool_name}")
-                
-                try:
-                    result = await self.session.call_tool(tool_name, tool_args)
-                    
-                    # Construir mensaje del assistant correctamente
+            def emit(text: str):
+                if on_text:
+                    if "ttft" not in self.last_timing:
+                        self.last_timing["ttft"] = time.monotonic() - started
+                    on_text(text)
+
+            def note(text: str):
+                final_text.append(text)
+                emit(f"\n{text}\n")
+
+            route = None
+            tool_result_chars = 0
+            tool_tasks: List[asyncio.Task] = []
+            try:
+                for step in range(self.max_iterations):
+                    if time.monotonic() >= deadline:
+                        note("⏱️ Se alcanzó el tiempo límite de la consulta")
+                        break
+
+                    route, model, _ = self.router.choose(query, step, route, tool_result_chars)
+                    tool_tasks = []
+                    try:
+                        if route == FAST:
+                            # El modelo rápido se valida antes de mostrar texto o ejecutar herramientas
+                            buffered: List[str] = []
+                            response = await self._routed_turn(FAST, model, messages, available_tools,
+                                                               buffered.append, None, deadline)
+                            problem = self.router.check(response, available_tools)
+                            if problem:
+                                self.router.record_escalation(problem)
+                                route, model = LARGE, self.router.models[LARGE]
+                            else:
+                                for text in buffered:
+                                    emit(text)
+                                tool_tasks = [asyncio.create_task(self._execute_tool(content))
+                                              for content in response.content if content.type == "tool_use"]
+                        if route == LARGE:
+                            # Las herramientas se lanzan en cuanto su bloque termina en el stream
+                            response = await self._routed_turn(LARGE, model, messages, available_tools,
+                                                               emit, tool_tasks, deadline)
+                    except asyncio.TimeoutError:
+                        note("⏱️ Se alcanzó el tiempo límite de la consulta")
+                        break
+
+                    # Reconstruir el turno del assistant (sin bloques de texto vacíos)
                     assistant_content = []
-                    
-                    # Solo agregar texto si existió en la respuesta inicial
-                    if initial_text and initial_text.strip():
-                        assistant_content.append({
-                            "type": "text",
-                            "text": initial_text
-                        })
-                    
-                    # Agregar la herramienta usada
-                    assistant_content.append({
-                        "type": "tool_use",
-                        "id": tool_content.id,
-                        "name": tool_name,
-                        "input": tool_args
-                    })
-                    
-                    # Validar que tenemos contenido válido antes de agregar
-                    if assistant_content and len(assistant_content) > 0:
-                        # Verificar que no tengamos solo bloques de texto vacíos
-                        has_valid_content = False
-                        for block in assistant_content:
-                            if block["type"] == "tool_use":
-                                has_valid_content = True
-                                break
-                            elif block["type"] == "text" and block.get("text", "").strip():
-                                has_valid_content = True
-                                break
-                        
-                        if has_valid_content:
-                            messages.append({
-                                "role": "assistant", 
-                                "content": assistant_content
+                    tools_to_execute = []
+                    for content in response.content:
+                        if content.type == 'text' and content.text.strip():
+                            final_text.append(content.text)
+                            assistant_content.append({"type": "text", "text": content.text})
+                        elif content.type == 'tool_use':
+                            tools_to_execute.append(content)
+                            assistant_content.append({
+                                "type": "tool_use",
+                                "id": content.id,
+                                "name": content.name,
+                                "input": content.input
                             })
-                    
-                    # Agregar resultado de la herramienta
-                    messages.append({
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "tool_result",
-                                "tool_use_id": tool_content.id,
-                                "content": str(result.content)
-                            }
-                        ]
-                    })
-
-                    # Obtener respuesta final de Claude
-                    final_response = self.anthropic.messages.create(
-                        model="claude-3-5-sonnet-20241022",
-                        max_tokens=2000,
-                        messages=messages,
-                    )
-
-                    for final_content in final_response.content:
-                        if final_content.type == 'text':
-                            final_text.append(final_content.text)
-                            
-                except Exception as e:
-                    final_text.append(f"❌ Error ejecutando {tool_name}: {str(e)}")
 
+                    if assistant_content:
+                        messages.append({"role": "assistant", "content": assistant_content})
+
+                    if response.stop_reason != "tool_use" or not tools_to_execute:
+                        # El turno no terminó pidiendo herramientas (p. ej. max_tokens):
+                        # las ya lanzadas se cancelan en el finally
+                        break
+
+                    # Recoger los resultados de las herramientas (ya en ejecución)
+                    try:
+                        tool_results = await asyncio.wait_for(
+                            asyncio.gather(*tool_tasks),
+                            timeout=max(deadline - time.monotonic(), 0)
+                        )
+                    except asyncio.TimeoutError:
+                        note("⏱️ Se alcanzó el tiempo límite ejecutando herramientas")
+                        break
+
+                    # Devolver todos los resultados en un único turno del usuario
+                    messages.append({"role": "user", "content": list(tool_results)})
+                    tool_result_chars = sum(len(str(result["content"])) for result in tool_results)
+                else:
+                    note(f"⚠️ Se alcanzó el límite de {self.max_iterations} iteraciones")
+            finally:
+                # Herramientas del último turno que no se llegaron a usar (fin sin tool_use,
+                # tiempo límite o error): se cancelan para no dejarlas ejecutándose solas
+                await self._cancel_tool_tasks(tool_tasks)
+
+            self.last_timing["total"] = time.monotonic() - started
             return "\n".join(final_text) if final_text else "No se obtuvo respuesta."
             
         except Exception as e:
             return f"❌ Error procesando consulta: {str(e)}"
 
+    async def _cancel_tool_tasks(self, tool_tasks: List[asyncio.Task]) -> None:
+        """Cancelar las herramientas aún en curso y esperar a que terminen de cancelarse."""
+        pending = [task for task in tool_tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            # Cada una avisa al servidor con notifications/cancelled (ver _call_tool)
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _routed_turn(self, route: str, model: str, messages: List[Dict[str, Any]],
+                           tools: List[Dict[str, Any]], emit: Callable[[str], None],
+                           tool_tasks: Optional[List[asyncio.Task]], deadline: float):
+        """Ejecutar un turno con el modelo elegido, registrando latencia y tokens de la ruta."""
+        started = time.monotonic()
+        response = await asyncio.wait_for(
+            self.scheduler.call_async(
+                "anthropic", model,
+                lambda: self._stream_turn(messages, tools, emit, tool_tasks, model),
+                tokens=estimate_request_tokens(messages, 2000),
+                priority=INTERACTIVE
+            ),
+            timeout=max(deadline - time.monotonic(), 0)
+        )
+        self.router.record(route, model, time.monotonic() - started, response.usage)
+        return response
+
+    async def _stream_turn(self, messages: List[Dict[str, Any]], tools: List[Dict[str, Any]],
+                           emit: Callable[[str], None], tool_tasks: Optional[List[asyncio.Task]],
+                           model: str = MODEL):
+        """Ejecutar un turno de Claude en streaming.
+
+        El texto se emite a medida que llega y cada bloque tool_use se envía
+        a la sesión MCP en cuanto está completo, sin esperar al resto del turno.
+        Con tool_tasks=None las herramientas no se lanzan (las decide quien llama).
+        """
+        async with self.anthropic.messages.stream(
+            model=model,
+            max_tokens=2000,
+            system=cached_system(SYSTEM_PROMPT),
+            messages=cached_messages(messages),
+            tools=cached_tools(tools)
+        ) as stream:
+            async for event in stream:
+                if event.type == "text":
+                    emit(event.text)
+                elif event.type == "content_block_stop":
+                    if event.content_block.type == "text":
+                        emit("\n")
+                    elif event.content_block.type == "tool_use" and tool_tasks is not None:
+                        tool_tasks.append(asyncio.create_task(self._execute_tool(event.content_block)))
+            final_message = await stream.get_final_message()
+        self.cache_stats.record(final_message.usage)
+        return final_message
+
+    async def _execute_tool(self, tool_content) -> Dict[str, Any]:
+        """Ejecutar una herramienta MCP y devolver el bloque tool_result."""
+        print(f"🔧 Ejecutando: {tool_content.name}")
+        try:
+            if tool_content.name == FETCH_MORE_TOOL["name"]:
+                # Herramienta local: no requiere ida y vuelta al servidor MCP
+                args = tool_content.input
+                return {
+                    "type": "tool_result",
+                    "tool_use_id": tool_content.id,
+                    "content": self.result_store.fetch(args.get("handle", ""), args.get("offset", 0))
+                }
+
+            # El servidor enlaza su span de la herramienta con la traza de esta consulta
+            traceparent = f"00-{self.trace_id or uuid.uuid4().hex}-{uuid.uuid4().hex[:16]}-01"
+            result = await self._call_tool(
+                tool_content.name, tool_content.input, {"traceparent": traceparent},
+                Deadline.for_tool(tool_content.name, self.deadline)
+            )
+            return {
+                "type": "tool_result",
+                "tool_use_id": tool_content.id,
+                "content": encode_tool_result(
+                    mcp_result_to_python(result), tool_content.name, store=self.result_store
+                ),
+                "is_error": bool(result.isError)
+            }
+        except Exception as e:
+            return {
+                "type": "tool_result",
+                "tool_use_id": tool_content.id,
+                "content": f"❌ Error ejecutando {tool_content.name}: {str(e)}",
+                "is_error": True
+            }
+
+    async def _call_tool(self, name: str, arguments: Dict[str, Any], meta: Dict[str, Any],
+                         deadline: Deadline) -> types.CallToolResult:
+        """tools/call limitado por deadline.
+
+        El servidor recibe el plazo en _meta.timeout y deja la llamada al vencer;
+        si aquí se abandona antes (plazo o consulta cancelada) se le envía
+        notifications/cancelled para que libere el trabajo en curso.
+        """
+        call_id = uuid.uuid4().hex
+        try:
+            return await asyncio.wait_for(
+                self.session.call_tool(name, arguments,
+                                       meta={**meta, **deadline.meta(), CALL_ID_META_KEY: call_id}),
+                timeout=deadline.check(name)
+            )
+        except asyncio.TimeoutError:
+            await self._send_cancelled(call_id, "Deadline exceeded")
+            raise DeadlineExceeded(f"{name} no terminó dentro de su plazo")
+        except asyncio.CancelledError:
+            await self._send_cancelled(call_id, "Cancelled by client")
+            raise
+        finally:
+            self.write.request_ids.pop(call_id, None)
+
+    async def _send_cancelled(self, call_id: str, reason: str) -> None:
+        """Avisar al servidor de que la petición `call_id` ya no se espera"""
+        request_id = self.write.request_ids.get(call_id)
+        if request_id is None or not self.session:
+            # Nunca llegó a enviarse: no hay nada que cancelar
+            return
+        try:
+            await self.session.send_notification(types.ClientNotification(types.CancelledNotification(
+                params=types.CancelledNotificationParams(requestId=request_id, reason=reason)
+            )))
+        except Exception:
+            pass
+
     async def chat_loop(self):
         """Ejecutar bucle de chat interactivo."""
         print("\n" + "="*60)
@@ -204,7 +545,8 @@ class WhatsAppMCPClient:
         while True:
             try:
                 print("\n" + "-"*40)
-                query = input("🎤 Tu consulta: ").strip()
+                # Leer la entrada en un hilo para no bloquear el event loop
+                query = (await asyncio.to_thread(input, "🎤 Tu consulta: ")).strip()
                 
                 if query.lower() in ['quit', 'exit', 'salir']:
                     print("👋 ¡Hasta luego!")
@@ -214,8 +556,22 @@ class WhatsAppMCPClient:
                     continue
                     
                 print("\n🤔 Procesando...")
-                response = await self.process_query(query)
-                print(f"\n🤖 Respuesta:\n{response}")
+                print("\n🤖 Respuesta:")
+                response = await self.process_query(query, on_text=lambda text: print(text, end="", flush=True))
+                timing = self.last_timing
+                if "ttft" not in timing:
+                    # Nada se transmitió (p. ej. error antes de la primera respuesta)
+                    print(response)
+                elif "total" in timing:
+                    print(f"\n⏱️  Primer token: {timing['ttft']:.2f}s · Total: {timing['total']:.2f}s")
+                    stats = self.cache_stats
+                    print(f"🗄️  Caché de prompt: {stats.cache_read_input_tokens} tokens leídos, "
+                          f"{stats.cache_creation_input_tokens} escritos ({stats.hit_ratio:.0%} acierto)")
+                    routes = self.router.snapshot()["routes"]
+                    print("🧭 Modelos: " + " · ".join(
+                        f"{name} {info['calls']} llamadas (p50 {info['latency']['p50']:.2f}s)"
+                        for name, info in routes.items() if info["calls"]
+                    ))
                     
             except KeyboardInterrupt:
                 print("\n\n👋 ¡Hasta luego!")
@@ -225,6 +581,8 @@ class WhatsAppMCPClient:
     
     async def cleanup(self):
         """Limpiar recursos."""
+        if self._tools_refresh is not None:
+            self._tools_refresh.cancel()
         await self.exit_stack.aclose()
         print("🧹 Recursos liberados")
 
@@ -6,32 +6,98 @@ Ejemplo de uso básico.
 
 import subprocess
 import json
+import os
 import time
 import sys
+from typing import Dict, Any, Optional
 
+from deadlines import DEFAULT_BUDGET, Deadline, DeadlineExceeded, LineReader, cancelled_notification
+from traffic_log import wrap_command
 
-def send_whatsapp_message(phone_number: str, message: str) -> bool:
+# Comando para iniciar el servidor MCP (los benchmarks lo reemplazan por un servidor local)
+SERVER_COMMAND = [
+    r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp\wapp_env\Scripts\uv.exe",
+    "--directory",
+    r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp\whatsapp-mcp-server",
+    "run",
+    "main.py"
+]
+
+# URL de un servidor MCP compartido (server/main.py --transport streamable-http,
+# p. ej. "http://127.0.0.1:8000/mcp"); si está definida no se inicia un servidor por envío
+SERVER_URL = os.getenv("MCP_SERVER_URL")
+
+
+def _process_send_response(send_response: Dict[str, Any]) -> bool:
+    """Interpreta la respuesta JSON-RPC de send_message"""
+    if "result" in send_response:
+        result = send_response["result"]
+        # FastMCP devuelve una lista con el resultado
+        if isinstance(result, list) and len(result) > 0:
+            actual_result = result[0]
+            if isinstance(actual_result, dict):
+                if actual_result.get("success"):
+                    print(f"✓ {actual_result.get('message', 'Mensaje enviado')}")
+                    return True
+                else:
+                    print(f"✗ {actual_result.get('message', 'Error al enviar')}")
+                    return False
+        
+        print(f"✓ Respuesta: {result}")
+        return True
+        
+    elif "error" in send_response:
+        print(f"✗ Error: {send_response['error']}")
+        return False
+    else:
+        print(f"✗ Respuesta inesperada: {send_response}")
+        return False
+
+
+def _send_via_http(phone_number: str, message: str, timings: Dict[str, float]) -> bool:
+    """Envía el mensaje a través del servidor compartido en SERVER_URL"""
+    from mcp_http import MCPHttpSession
+    
+    started = time.perf_counter()
+    try:
+        print(f"Enviando mensaje a {phone_number}: {message}")
+        with MCPHttpSession(SERVER_URL) as session:
+            timings["session"] = time.perf_counter() - started
+            send_response = session.call_tool("send_message", {
+                "recipient": phone_number,
+                "message": message
+            })
+            timings["tool_call"] = time.perf_counter() - started - timings["session"]
+        return _process_send_response(send_response)
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        return False
+
+
+def send_whatsapp_message(phone_number: str, message: str, timings: Optional[Dict[str, float]] = None) -> bool:
     """
     Envía un mensaje de WhatsApp usando el servidor MCP.
     
     Args:
         phone_number: Número de teléfono (ej: "959888222")
         message: Mensaje a enviar
+        timings: Diccionario opcional que recibe la duración (segundos) de cada fase:
+                 "session" (arranque del servidor + initialize) y "tool_call" (send_message)
         
     Returns:
         True si el mensaje se envió exitosamente, False en caso contrario
     """
     
-    # Comando para iniciar el servidor MCP
-    server_command = [
-        r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp\wapp_env\Scripts\uv.exe",
-        "--directory",
-        r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp\whatsapp-mcp-server",
-        "run",
-        "main.py"
-    ]
+    if timings is None:
+        timings = {}
+    if SERVER_URL:
+        return _send_via_http(phone_number, message, timings)
+    
+    # Con TRAFFIC_LOG definido, el tráfico JSON-RPC se graba a través de un proxy
+    server_command = wrap_command(SERVER_COMMAND)
     
     process = None
+    started = time.perf_counter()
     try:
         print(f"Enviando mensaje a {phone_number}: {message}")
         print("Iniciando servidor MCP...")
@@ -45,6 +111,8 @@ def send_whatsapp_message(phone_number: str, message: str) -> bool:
             text=True,
             bufsize=0
         )
+        # Las respuestas se leen con plazo: si el servidor se cuelga no se espera para siempre
+        stdout = LineReader(process.stdout)
         
         # Esperar a que el servidor se inicialice
         time.sleep(3)
@@ -73,7 +141,7 @@ def send_whatsapp_message(phone_number: str, message: str) -> bool:
         
         process.stdin.write(json.dumps(init_request) + '\n')
         process.stdin.flush()
-        response = process.stdout.readline()
+        response = stdout.readline(Deadline.after(DEFAULT_BUDGET))
         
         if not response:
             print("✗ No se recibió respuesta de inicialización")
@@ -92,8 +160,10 @@ def send_whatsapp_message(phone_number: str, message: str) -> bool:
         
         process.stdin.write(json.dumps(initialized_request) + '\n')
         process.stdin.flush()
+        timings["session"] = time.perf_counter() - started
         
-        # 3. Enviar el mensaje
+        # 3. Enviar el mensaje (el servidor recibe el plazo en _meta.timeout)
+        deadline = Deadline.for_tool("send_message")
         send_request = {
             "jsonrpc": "2.0",
             "id": 2,
@@ -103,7 +173,8 @@ def send_whatsapp_message(phone_number: str, message: str) -> bool:
                 "arguments": {
                     "recipient": phone_number,
                     "message": message
-                }
+                },
+                "_meta": deadline.meta()
             }
         }
         
@@ -111,7 +182,15 @@ def send_whatsapp_message(phone_number: str, message: str) -> bool:
         process.stdin.flush()
         
         # Leer respuesta
-        response = process.stdout.readline()
+        try:
+            response = stdout.readline(deadline)
+        except DeadlineExceeded:
+            # Avisar al servidor para que abandone el envío (puede haberse realizado)
+            process.stdin.write(json.dumps(cancelled_notification(2)) + '\n')
+            process.stdin.flush()
+            print("✗ Tiempo de espera agotado: no se confirmó el envío")
+            return False
+        timings["tool_call"] = time.perf_counter() - started - timings["session"]
         if not response:
             print("✗ No se recibió respuesta del envío")
             return False
@@ -119,28 +198,7 @@ def send_whatsapp_message(phone_number: str, message: str) -> bool:
         send_response = json.loads(response.strip())
         
         # Procesar resultado
-        if "result" in send_response:
-            result = send_response["result"]
-            # FastMCP devuelve una lista con el resultado
-            if isinstance(result, list) and len(result) > 0:
-                actual_result = result[0]
-                if isinstance(actual_result, dict):
-                    if actual_result.get("success"):
-                        print(f"✓ {actual_result.get('message', 'Mensaje enviado')}")
-                        return True
-                    else:
-                        print(f"✗ {actual_result.get('message', 'Error al enviar')}")
-                        return False
-            
-            print(f"✓ Respuesta: {result}")
-            return True
-            
-        elif "error" in send_response:
-            print(f"✗ Error: {send_response['error']}")
-            return False
-        else:
-            print(f"✗ Respuesta inesperada: {send_response}")
-            return False
+        return _process_send_response(send_response)
             
     except Exception as e:
         print(f"✗ Error: {e}")
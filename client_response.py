@@ -11,6 +11,19 @@ import sys
 import os
 from datetime import datetime
 
+from deadlines import DEFAULT_BUDGET, Deadline, DeadlineExceeded, LineReader, cancelled_notification
+from traffic_log import wrap_command
+
+# Comando para iniciar el servidor MCP (mismo que funciona en simple_client.py;
+# los benchmarks lo reemplazan por un servidor local)
+SERVER_COMMAND = [
+    r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp\wapp_env\Scripts\uv.exe",
+    "--directory",
+    r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp\whatsapp-mcp-server",
+    "run",
+    "main.py"
+]
+
 
 def read_whatsapp_messages(phone_number: str, limit: int = 10) -> bool:
     """
@@ -24,14 +37,8 @@ def read_whatsapp_messages(phone_number: str, limit: int = 10) -> bool:
         True si se pudieron leer los mensajes exitosamente, False en caso contrario
     """
     
-    # Comando para iniciar el servidor MCP (mismo que funciona en simple_client.py)
-    server_command = [
-        r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp\wapp_env\Scripts\uv.exe",
-        "--directory",
-        r"C:\Users\jeanc\iCloudDrive\Python\Wapp_mcp_test3\whatsapp-mcp\whatsapp-mcp-server",
-        "run",
-        "main.py"
-    ]
+    # Con TRAFFIC_LOG definido, el tráfico JSON-RPC se graba a través de un proxy
+    server_command = wrap_command(SERVER_COMMAND)
     
     process = None
     try:
@@ -54,6 +61,8 @@ def read_whatsapp_messages(phone_number: str, limit: int = 10) -> bool:
             bufsize=0,
             env=env
         )
+        # Las respuestas se leen con plazo: si el servidor se cuelga no se espera para siempre
+        stdout = LineReader(process.stdout)
         
         # Esperar a que el servidor se inicialice
         time.sleep(3)
@@ -87,7 +96,7 @@ def read_whatsapp_messages(phone_number: str, limit: int = 10) -> bool:
         try:
             process.stdin.write(json.dumps(init_request, ensure_ascii=False) + '\n')
             process.stdin.flush()
-            response = process.stdout.readline()
+            response = stdout.readline(Deadline.after(DEFAULT_BUDGET))
             
             if not response:
                 print("✗ No se recibió respuesta de inicialización")
@@ -116,8 +125,9 @@ def read_whatsapp_messages(phone_number: str, limit: int = 10) -> bool:
             print(f"✗ Error enviando notificación: {e}")
             return False
         
-        # 3. Buscar mensajes del número específico
+        # 3. Buscar mensajes del número específico (el servidor recibe el plazo en _meta.timeout)
         try:
+            deadline = Deadline.for_tool("list_messages")
             messages_request = {
                 "jsonrpc": "2.0",
                 "id": 2,
@@ -128,7 +138,8 @@ def read_whatsapp_messages(phone_number: str, limit: int = 10) -> bool:
                         "sender_phone_number": phone_number,
                         "limit": limit,
                         "include_context": True
-                    }
+                    },
+                    "_meta": deadline.meta()
                 }
             }
             
@@ -136,13 +147,22 @@ def read_whatsapp_messages(phone_number: str, limit: int = 10) -> bool:
             process.stdin.flush()
             
             # Leer respuesta con timeout
-            response = process.stdout.readline()
+            response = stdout.readline(deadline)
             if not response:
                 print("✗ No se recibió respuesta de la búsqueda de mensajes")
                 return False
             
             messages_response = json.loads(response.strip())
             
+        except DeadlineExceeded:
+            # Avisar al servidor para que abandone la búsqueda
+            try:
+                process.stdin.write(json.dumps(cancelled_notification(2)) + '\n')
+                process.stdin.flush()
+            except OSError:
+                pass
+            print("✗ Tiempo de espera agotado buscando mensajes")
+            return False
         except json.JSONDecodeError as e:
             print(f"✗ Error decodificando JSON: {e}")
             print(f"Respuesta recibida: {repr(response[:200])}")
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted conversation memory for the Claude chat entry points.
+
+Recent turns are kept verbatim. Once a conversation exceeds its token budget,
+bulky tool results in older turns are truncated first and then the oldest
+turns are folded into a running summary, so the input size stays flat over
+long sessions. Compaction shrinks the history well below the budget in one go
+so that the prompt prefix (and with it the prompt cache) stays stable between
+compactions.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable
+
+# Block types whose payload is a (potentially large) tool result
+TOOL_RESULT_TYPES = ("tool_result", "mcp_tool_result")
+
+
+def estimate_tokens(value: Any) -> int:
+    """
+    Cheap token estimate (~4 characters per token) for strings or JSON content
+
+    Args:
+        value: String or JSON-serializable message content
+
+    Returns:
+        Estimated token count
+    """
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return len(text) // 4 + 1
+
+
+def _content_text(content: Any, result_chars: Optional[int] = None) -> str:
+    """Flatten message content (string or blocks) into plain text"""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content or []:
+        block_type = block.get("type")
+        if block_type == "text":
+            parts.append(block.get("text", ""))
+        elif block_type in ("tool_use", "mcp_tool_use"):
+            parts.append(f"[called {block.get('name')} {json.dumps(block.get('input', {}), ensure_ascii=False)}]")
+        elif block_type in TOOL_RESULT_TYPES:
+            result = _content_text(block.get("content"))
+            if result_chars is not None:
+                result = _shorten(result, result_chars)
+            parts.append(f"[tool result: {result}]")
+    return " ".join(part for part in parts if part)
+
+
+def _shorten(text: str, max_chars: int) -> str:
+    """Truncate text to max_chars with a marker"""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + f" …[+{len(text) - max_chars} chars]"
+
+
+def extractive_summary(previous: str, turns: List[Dict[str, Any]], max_chars: int) -> str:
+    """
+    Default summarizer: keep a short excerpt of each folded turn
+
+    Args:
+        previous: Existing summary text
+        turns: Turns being folded, each {"user": content, "assistant": content}
+        max_chars: Maximum summary length; the oldest lines are dropped first
+
+    Returns:
+        Updated summary text
+    """
+    lines = [previous] if previous else []
+    for turn in turns:
+        lines.append(f"- User: {_shorten(_content_text(turn['user'], 80), 200)}")
+        lines.append(f"  Assistant: {_shorten(_content_text(turn['assistant'], 80), 300)}")
+    summary = "\n".join(lines)
+    if len(summary) > max_chars:
+        summary = "…" + summary[-max_chars:]
+    return summary
+
+
+class ConversationMemory:
+    """Message history of one conversation, bounded by a token budget"""
+
+    def __init__(self,
+                 token_budget: int = 8000,
+                 keep_recent_turns: int = 4,
+                 compact_ratio: float = 0.6,
+                 tool_result_chars: int = 600,
+                 summary_ratio: float = 0.25,
+                 summarizer: Optional[Callable[[str, List[Dict[str, Any]], int], str]] = None,
+                 token_counter: Callable[[Any], int] = estimate_tokens):
+        """
+        Initialize an empty conversation
+
+        Args:
+            token_budget: Estimated token limit for the replayed history
+            keep_recent_turns: Number of latest turns that are never compacted
+            compact_ratio: Fraction of the budget to shrink to when compacting
+            tool_result_chars: Characters kept from each old tool result
+            summary_ratio: Fraction of the budget the summary may use
+            summarizer: Function (previous_summary, turns, max_chars) -> summary
+            token_counter: Function estimating the tokens of message content
+        """
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.compact_ratio = compact_ratio
+        self.tool_result_chars = tool_result_chars
+        self.summary_ratio = summary_ratio
+        self.summarizer = summarizer or extractive_summary
+        self.token_counter = token_counter
+        self.turns: List[Dict[str, Any]] = []
+        self.summary = ""
+        self.last_used = time.time()
+        # Serializes turns of the same conversation across threads
+        self.lock = threading.Lock()
+
+    def build_messages(self, user_message: str) -> List[Dict[str, Any]]:
+        """
+        Build the Messages API history for a new user message
+
+        Args:
+            user_message: The new user message
+
+        Returns:
+            Summary (if any), retained turns and the new message, alternating roles
+        """
+        self.last_used = time.time()
+        messages = []
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn["user"]})
+            messages.append({"role": "assistant", "content": turn["assistant"]})
+        messages.append({"role": "user", "content": user_message})
+
+        if self.summary:
+            first = messages[0]
+            content = first["content"]
+            blocks = [{"type": "text", "text": content}] if isinstance(content, str) else list(content)
+            note = {"type": "text", "text": f"<conversation_summary>\n{self.summary}\n</conversation_summary>"}
+            messages[0] = {"role": "user", "content": [note] + blocks}
+        return messages
+
+    def add_turn(self, user_message: str, assistant_content: List[Dict[str, Any]]) -> None:
+        """
+        Store a completed turn and compact the history if it exceeds the budget
+
+        Args:
+            user_message: The user message of the turn
+            assistant_content: Assistant content blocks as plain dicts
+        """
+        if not assistant_content:
+            return
+        self.turns.append({"user": user_message, "assistant": assistant_content})
+        if self.estimated_tokens() > self.token_budget:
+            self.compact()
+
+    def estimated_tokens(self) -> int:
+        """Estimated tokens of the summary plus all retained turns"""
+        total = self.token_counter(self.summary) if self.summary else 0
+        for turn in self.turns:
+            total += self.token_counter(turn["user"]) + self.token_counter(turn["assistant"])
+        return total
+
+    def compact(self) -> None:
+        """Shrink old tool results, then fold the oldest turns into the summary"""
+        target = int(self.token_budget * self.compact_ratio)
+        old_turns = self.turns[:-self.keep_recent_turns] if self.keep_recent_turns else self.turns
+
+        for turn in old_turns:
+            turn["assistant"] = [self._shrink_block(block) for block in turn["assistant"]]
+            if not isinstance(turn["user"], str):
+                turn["user"] = [self._shrink_block(block) for block in turn["user"]]
+
+        folded = []
+        while len(self.turns) > self.keep_recent_turns and self.estimated_tokens() > target:
+            folded.append(self.turns.pop(0))
+        if folded:
+            # ~4 characters per token
+            max_chars = int(self.token_budget * self.summary_ratio) * 4
+            self.summary = self.summarizer(self.summary, folded, max_chars)
+
+    def _shrink_block(self, block: Dict[str, Any]) -> Dict[str, Any]:
+        """Truncate the text of a tool result block, keeping it valid for the API"""
+        if block.get("type") not in TOOL_RESULT_TYPES:
+            return block
+        text = _content_text(block.get("content"))
+        if len(text) <= self.tool_result_chars:
+            return block
+        shrunk = _shorten(text, self.tool_result_chars)
+        content = shrunk if isinstance(block.get("content"), str) else [{"type": "text", "text": shrunk}]
+        return {**block, "content": content}
+
+
+class ConversationStore:
+    """Thread-safe map of session id -> ConversationMemory with LRU/idle eviction"""
+
+    def __init__(self, max_sessions: int = 1000, idle_ttl: float = 6 * 3600, **memory_options: Any):
+        """
+        Initialize the store
+
+        Args:
+            max_sessions: Maximum number of conversations kept in memory
+            idle_ttl: Seconds of inactivity after which a conversation is dropped
+            **memory_options: Options passed to every new ConversationMemory
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.memory_options = memory_options
+        self._sessions: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> ConversationMemory:
+        """
+        Get (or create) the conversation for a session id
+
+        Args:
+            session_id: Key identifying the user or conversation
+
+        Returns:
+            The session's ConversationMemory
+        """
+        with self._lock:
+            self._evict_idle()
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                memory = ConversationMemory(**self.memory_options)
+                self._sessions[session_id] = memory
+                self._sessions.move_to_end(session_id)
+                # Only a new conversation can push the store over its bound
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            return memory
+
+    def reset(self, session_id: str) -> None:
+        """Forget a conversation"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict_idle(self) -> None:
+        """Drop conversations idle for longer than idle_ttl"""
+        cutoff = time.time() - self.idle_ttl
+        for session_id in [key for key, memory in self._sessions.items() if memory.last_used < cutoff]:
+            del self._sessions[session_id]
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Deadlines for MCP tool calls.
+
+Every tools/call carries a deadline: the caller's (what is left of an agent
+query or tool-call budget, see `deadline_scope`) capped by the tool's default
+budget. The time left travels to the server in `params._meta.timeout`
+(seconds, relative like gRPC's grpc-timeout, so client and server clocks need
+not agree); the server stops working on the call once it runs out. A client
+that gives up on a call of a stateful session sends notifications/cancelled
+(`cancelled_notification`) so the server frees the call's worker too.
+
+    with deadline_scope(20):
+        client.list_messages(...)      # at most min(20 s left, list_messages budget)
+
+Default budgets per tool can be overridden with MCP_TOOL_BUDGETS, e.g.
+    MCP_TOOL_BUDGETS='{"download_media": 300, "list_messages": 5}'
+and for tools without one with MCP_DEFAULT_BUDGET.
+"""
+
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, IO, Iterator, Optional, Union
+
+# Key of params._meta holding the seconds left (server/tool_pools.py reads the same key)
+TIMEOUT_META_KEY = "timeout"
+
+DEFAULT_BUDGET = float(os.getenv("MCP_DEFAULT_BUDGET", "30"))
+DEFAULT_BUDGETS: Dict[str, float] = {
+    "search_contacts": 10,
+    "list_messages": 15,
+    "list_chats": 15,
+    "get_chat": 10,
+    "get_direct_chat_by_contact": 10,
+    "get_contact_chats": 10,
+    "get_last_interaction": 10,
+    "get_message_context": 10,
+    "check_new_messages": 15,
+    "mark_messages_as_seen": 10,
+    "send_message": 30,
+    "send_file": 120,
+    "send_audio_message": 120,
+    "download_media": 120,
+}
+
+
+def load_budgets() -> Dict[str, float]:
+    """DEFAULT_BUDGETS merged with the MCP_TOOL_BUDGETS environment variable"""
+    budgets = dict(DEFAULT_BUDGETS)
+    overrides = os.getenv("MCP_TOOL_BUDGETS")
+    if overrides:
+        budgets.update({name: float(seconds) for name, seconds in json.loads(overrides).items()})
+    return budgets
+
+
+TOOL_BUDGETS = load_budgets()
+
+
+def budget_for(tool: str) -> float:
+    """Default seconds a call of `tool` may take"""
+    return TOOL_BUDGETS.get(tool, DEFAULT_BUDGET)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A call's deadline passed before it completed"""
+
+
+class Deadline:
+    """A point in time (time.monotonic) by which a call must complete"""
+
+    def __init__(self, at: float):
+        self.at = at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    @classmethod
+    def for_tool(cls, tool: str, deadline: Optional["Deadline"] = None) -> "Deadline":
+        """The tool's default budget from now, or the given/enclosing deadline if that is sooner"""
+        own = cls.after(budget_for(tool))
+        outer = deadline or current_deadline()
+        return outer if outer is not None and outer.at < own.at else own
+
+    def remaining(self) -> float:
+        """Seconds left (0 once expired)"""
+        return max(self.at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    def check(self, what: str = "call") -> float:
+        """Seconds left, or DeadlineExceeded if there are none"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Deadline exceeded before {what}")
+        return remaining
+
+    def meta(self) -> Dict[str, Any]:
+        """params._meta entries that hand the deadline to the server"""
+        return {TIMEOUT_META_KEY: round(self.remaining(), 3)}
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f}s)"
+
+
+# Deadline of the enclosing deadline_scope (copied into worker threads with contextvars.copy_context)
+_current: contextvars.ContextVar = contextvars.ContextVar("mcp_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Union[Deadline, float, None]) -> Iterator[Optional[Deadline]]:
+    """Bound every tool call made inside the block by `deadline` (a Deadline or seconds from now)"""
+    if isinstance(deadline, (int, float)):
+        deadline = Deadline.after(deadline)
+    outer = _current.get()
+    if deadline is None or (outer is not None and outer.at <= deadline.at):
+        deadline = outer
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+class LineReader:
+    """
+    Reads a stdio server's stdout in a background thread so that waiting for a
+    line can time out (select() does not work on pipes on Windows)
+    """
+
+    def __init__(self, stream: IO[str]):
+        self._lines: queue.Queue = queue.Queue()
+        threading.Thread(target=self._pump, args=(stream,), daemon=True, name="mcp-stdout").start()
+
+    def _pump(self, stream: IO[str]) -> None:
+        try:
+            for line in iter(stream.readline, ""):
+                self._lines.put(line)
+        except (OSError, ValueError):  # pipe closed while reading
+            pass
+        self._lines.put("")
+
+    def readline(self, deadline: Deadline) -> str:
+        """Next line ("" once the stream ended), or DeadlineExceeded if none arrives in time"""
+        try:
+            return self._lines.get(timeout=deadline.remaining())
+        except queue.Empty:
+            raise DeadlineExceeded("No response from the MCP server before the deadline") from None
+
+
+def cancelled_notification(request_id: Any, reason: str = "Deadline exceeded") -> Dict[str, Any]:
+    """JSON-RPC notifications/cancelled for an abandoned request"""
+    return {
+        "jsonrpc": "2.0",
+        "method": "notifications/cancelled",
+        "params": {"requestId": request_id, "reason": reason}
+    }
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Small latency/throughput statistics helpers shared by the engines and benchmarks.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+def percentile(samples: Iterable[float], q: float) -> float:
+    """
+    Nearest-rank percentile
+
+    Args:
+        samples: Observed values
+        q: Percentile between 0 and 100
+
+    Returns:
+        The percentile, or 0.0 when there are no samples
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Count, mean, p50, p95, p99 and max of a list of samples"""
+    if not samples:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "max": max(samples),
+    }
+
+
+class LatencyWindow:
+    """Thread-safe sliding window of timestamped samples"""
+
+    def __init__(self, max_samples: int = 10000, window_seconds: Optional[float] = 300):
+        """
+        Initialize the window
+
+        Args:
+            max_samples: Maximum number of samples kept
+            window_seconds: Samples older than this are ignored (None keeps all)
+        """
+        self.window_seconds = window_seconds
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def add(self, value: float) -> None:
+        """Record one sample"""
+        with self._lock:
+            self._samples.append((time.time(), value))
+
+    def values(self) -> List[float]:
+        """Samples inside the window"""
+        cutoff = time.time() - self.window_seconds if self.window_seconds else 0
+        with self._lock:
+            return [value for ts, value in self._samples if ts >= cutoff]
+
+    def rate(self) -> float:
+        """Samples per second inside the window"""
+        if not self.window_seconds:
+            return 0.0
+        return len(self.values()) / self.window_seconds
+
+    def summary(self) -> Dict[str, float]:
+        """summarize() of the samples inside the window"""
+        return summarize(self.values())
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Rate-limit-aware scheduler shared by every LLM call site.
+
+Each call is charged to a bucket (provider + model) with requests-per-minute
+and tokens-per-minute budgets. A call waits until its bucket has room in the
+sliding one-minute window; interactive calls go first, and batch calls only use
+`batch_share` of the budget so there is always headroom for a person waiting
+on a reply. Rate-limit and overload errors (429/503/529) are retried with
+jittered exponential backoff; a `retry-after` header blocks the whole bucket
+for that long.
+
+The window and block state live in a small JSON file guarded by an exclusive
+file lock, so every process on the host (chat client, API, auto-reply
+workers) shares one view of the budget.
+
+Limits default to DEFAULT_LIMITS and can be overridden with LLM_RATE_LIMITS,
+e.g. '{"anthropic": {"rpm": 50, "tpm": 40000}, "openai:gpt-4o": {"rpm": 500}}'.
+Token budgets are combined input + output tokens.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: state is only shared between threads of one process
+    fcntl = None
+
+# Priorities (lower runs first)
+INTERACTIVE = 0
+BATCH = 1
+
+WINDOW_SECONDS = 60.0
+RETRYABLE_STATUS = {429, 503, 529}
+
+DEFAULT_LIMITS: Dict[str, Dict[str, int]] = {
+    "anthropic": {"rpm": 50, "tpm": 40000},
+    "openai": {"rpm": 500, "tpm": 200000},
+}
+
+DEFAULT_STATE_PATH = os.path.join(tempfile.gettempdir(), "whatsapp_mcp_llm_scheduler.json")
+
+
+class RateLimited(Exception):
+    """Raised by a call wrapper when the provider reported a rate limit without an HTTP error"""
+
+    def __init__(self, message: str = "rate limited", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def load_limits() -> Dict[str, Dict[str, int]]:
+    """DEFAULT_LIMITS merged with the LLM_RATE_LIMITS environment variable"""
+    limits = {key: dict(value) for key, value in DEFAULT_LIMITS.items()}
+    for key, value in json.loads(os.getenv("LLM_RATE_LIMITS", "{}")).items():
+        limits.setdefault(key, {}).update(value)
+    return limits
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, if the error carries retry-after"""
+    if isinstance(exc, RateLimited):
+        return exc.retry_after
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass  # HTTP-date form: fall back to backoff
+    return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Rate-limit or overload errors; mid-stream errors (status 200) are not retried"""
+    return isinstance(exc, RateLimited) or getattr(exc, "status_code", None) in RETRYABLE_STATUS
+
+
+def _field(obj: Any, name: str) -> Any:
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def usage_tokens(result: Any) -> Optional[int]:
+    """Tokens actually used by an Anthropic message, OpenAI run or {"usage": ...} dict"""
+    usage = _field(result, "usage")
+    if usage is None:
+        return None
+    total = _field(usage, "total_tokens")
+    if total is not None:
+        return int(total)
+    parts = [_field(usage, name) for name in ("input_tokens", "output_tokens", "cache_creation_input_tokens")]
+    if all(part is None for part in parts):
+        return None
+    return sum(int(part or 0) for part in parts)
+
+
+def estimate_request_tokens(payload: Any, max_tokens: int) -> int:
+    """Rough token estimate of a request: serialized size / 4 plus the output budget"""
+    return len(json.dumps(payload, default=str)) // 4 + max_tokens
+
+
+class _SharedState:
+    """Per-bucket window state kept in a JSON file under an exclusive lock"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._memory: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            if not self.path:
+                yield self._memory
+                return
+            with open(self.path, "a+") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    raw = f.read()
+                    try:
+                        state = json.loads(raw) if raw.strip() else {}
+                    except ValueError:
+                        state = {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class LLMScheduler:
+    """Queues, paces and retries LLM calls against shared per-model budgets"""
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, int]]] = None,
+                 state_path: Optional[str] = DEFAULT_STATE_PATH, batch_share: float = 0.8,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        """
+        Initialize the scheduler
+
+        Args:
+            limits: Budgets keyed by "provider:model" or "provider" ({"rpm": ..., "tpm": ...})
+            state_path: JSON file shared between processes (None keeps state in memory)
+            batch_share: Fraction of each budget that batch calls may use
+            max_retries: Retries of a rate-limited call before the error is raised
+            base_delay: First backoff step in seconds
+            max_delay: Backoff cap in seconds
+        """
+        self.limits = limits if limits is not None else load_limits()
+        self.state = _SharedState(state_path)
+        self.batch_share = batch_share
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"calls": 0, "retries": 0, "waits": 0, "waited_seconds": 0.0}
+        self._ids = itertools.count(1)
+        self._waiting: Dict[str, List[int]] = {}
+        self._waiting_lock = threading.Lock()
+
+    def limits_for(self, provider: str, model: str) -> Dict[str, int]:
+        return self.limits.get(f"{provider}:{model}") or self.limits.get(provider) or {}
+
+    # -- budget window ---------------------------------------------------
+
+    def _try_acquire(self, bucket: str, limits: Dict[str, int], tokens: int,
+                     priority: int) -> Tuple[float, Optional[str]]:
+        """(0, lease id) when the call may start, otherwise (seconds to wait, None)"""
+        with self._waiting_lock:
+            if any(waiting < priority for waiting in self._waiting.get(bucket, [])):
+                return 0.05, None
+        share = 1.0 if priority <= INTERACTIVE else self.batch_share
+        now = time.time()
+        with self.state.transaction() as state:
+            entry = state.setdefault(bucket, {"events": [], "blocked_until": 0})
+            events = [event for event in entry["events"] if event[0] > now - WINDOW_SECONDS]
+            entry["events"] = events
+            if entry["blocked_until"] > now:
+                return entry["blocked_until"] - now, None
+            rpm, tpm = limits.get("rpm"), limits.get("tpm")
+            # At least one request per window, or a small rpm would lock batch calls out
+            if rpm and len(events) + 1 > max(rpm * share, 1):
+                return events[0][0] + WINDOW_SECONDS - now, None
+            used = sum(event[1] for event in events)
+            if tpm and events and used + tokens > tpm * share:
+                excess, freed = used + tokens - tpm * share, 0
+                for started, spent, _ in events:
+                    freed += spent
+                    if freed >= excess:
+                        return started + WINDOW_SECONDS - now, None
+            lease_id = f"{os.getpid()}-{next(self._ids)}"
+            events.append([now, tokens, lease_id])
+            return 0.0, lease_id
+
+    def _settle(self, bucket: str, lease_id: str, tokens: Optional[int]) -> None:
+        """Replace a call's estimated tokens with the tokens it actually used"""
+        if tokens is None:
+            return
+        with self.state.transaction() as state:
+            for event in state.get(bucket, {}).get("events", []):
+                if event[2] == lease_id:
+                    event[1] = tokens
+                    break
+
+    def _block(self, bucket: str, seconds: float) -> None:
+        """Hold every call of the bucket for `seconds` (retry-after)"""
+        with self.state.transaction() as state:
+            entry = state.setdefault(bucket, {"events": [], "blocked_until": 0})
+            entry["blocked_until"] = max(entry["blocked_until"], time.time() + seconds)
+
+    @contextmanager
+    def _waiter(self, bucket: str, priority: int):
+        with self._waiting_lock:
+            self._waiting.setdefault(bucket, []).append(priority)
+        try:
+            yield
+        finally:
+            with self._waiting_lock:
+                self._waiting[bucket].remove(priority)
+
+    def _backoff(self, bucket: str, exc: Exception, attempt: int) -> float:
+        """Delay before retrying a rejected call; retry-after blocks the whole bucket"""
+        self.stats["retries"] += 1
+        retry_after = retry_after_seconds(exc)
+        if retry_after is not None:
+            self._block(bucket, retry_after)
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    # -- public API ------------------------------------------------------
+
+    def acquire(self, provider: str, model: str, tokens: int, priority: int = INTERACTIVE) -> str:
+        """Block until the bucket has room for a call; returns its lease id"""
+        bucket, limits = f"{provider}:{model}", self.limits_for(provider, model)
+        started = time.time()
+        with self._waiter(bucket, priority):
+            while True:
+                wait, lease_id = self._try_acquire(bucket, limits, tokens, priority)
+                if lease_id:
+                    break
+                time.sleep(min(wait, 1.0))
+        self._record_wait(time.time() - started)
+        return lease_id
+
+    async def acquire_async(self, provider: str, model: str, tokens: int, priority: int = INTERACTIVE) -> str:
+        """acquire() for asyncio code"""
+        bucket, limits = f"{provider}:{model}", self.limits_for(provider, model)
+        started = time.time()
+        with self._waiter(bucket, priority):
+            while True:
+                wait, lease_id = self._try_acquire(bucket, limits, tokens, priority)
+                if lease_id:
+                    break
+                await asyncio.sleep(min(wait, 1.0))
+        self._record_wait(time.time() - started)
+        return lease_id
+
+    def _record_wait(self, waited: float) -> None:
+        self.stats["calls"] += 1
+        if waited > 0.01:
+            self.stats["waits"] += 1
+            self.stats["waited_seconds"] += waited
+
+    def call(self, provider: str, model: str, fn: Callable[[], Any], *, tokens: int = 1000,
+             priority: int = INTERACTIVE, token_counter: Callable[[Any], Optional[int]] = usage_tokens) -> Any:
+        """
+        Run fn() inside the budget of provider/model, retrying rate-limit errors
+
+        Args:
+            provider: "anthropic" or "openai"
+            model: Model name (budgets may be set per model)
+            fn: Performs the request; called again on every retry
+            tokens: Estimated tokens of the call, corrected with token_counter(result)
+            priority: INTERACTIVE or BATCH
+            token_counter: Extracts the tokens actually used from the result
+        """
+        bucket = f"{provider}:{model}"
+        for attempt in range(self.max_retries + 1):
+            lease_id = self.acquire(provider, model, tokens, priority)
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(bucket, e, attempt))
+                continue
+            self._settle(bucket, lease_id, token_counter(result))
+            return result
+
+    async def call_async(self, provider: str, model: str, fn: Callable[[], Awaitable[Any]], *,
+                         tokens: int = 1000, priority: int = INTERACTIVE,
+                         token_counter: Callable[[Any], Optional[int]] = usage_tokens) -> Any:
+        """call() for coroutine functions"""
+        bucket = f"{provider}:{model}"
+        for attempt in range(self.max_retries + 1):
+            lease_id = await self.acquire_async(provider, model, tokens, priority)
+            try:
+                result = await fn()
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(bucket, e, attempt))
+                continue
+            self._settle(bucket, lease_id, token_counter(result))
+            return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Call/retry/wait counters of this process"""
+        return {**self.stats, "waited_seconds": round(self.stats["waited_seconds"], 3)}
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Process-wide scheduler; LLM_SCHEDULER_STATE sets the shared state file ("" = this process only)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(state_path=os.getenv("LLM_SCHEDULER_STATE", DEFAULT_STATE_PATH) or None)
+        return _scheduler
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Minimal synchronous client for an MCP server on the Streamable HTTP transport
+(server/main.py --transport streamable-http), for the scripts that otherwise
+speak JSON-RPC to a spawned stdio server.
+
+    with MCPHttpSession("http://127.0.0.1:8000/mcp") as session:
+        response = session.call_tool("send_message", {"recipient": "...", "message": "..."})
+
+Responses are the raw JSON-RPC messages ({"result": ...} or {"error": ...}),
+the same shape the stdio clients read line by line. The server may answer a
+POST with a JSON body or an SSE stream; both are handled.
+
+Tool calls carry a deadline (deadlines.py) in _meta.timeout; a call that gets
+no answer in time is cancelled with notifications/cancelled and raises
+DeadlineExceeded.
+"""
+
+import itertools
+import json
+import os
+import time
+from typing import Dict, Any, Iterator, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from deadlines import Deadline, DeadlineExceeded, cancelled_notification
+from traffic_log import record_exchange
+
+PROTOCOL_VERSION = "2025-03-26"
+SESSION_HEADER = "mcp-session-id"
+
+
+def _sse_messages(response: requests.Response) -> Iterator[Dict[str, Any]]:
+    """JSON-RPC messages carried in the data fields of an SSE stream"""
+    data = []
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("data:"):
+            data.append(line[5:].lstrip())
+        elif not line and data:
+            yield json.loads("\n".join(data))
+            data = []
+    if data:
+        yield json.loads("\n".join(data))
+
+
+class MCPHttpSession:
+    """One MCP session over Streamable HTTP (initialize on enter, DELETE on exit)"""
+
+    def __init__(self, url: str, auth_token: Optional[str] = None, timeout: float = 30,
+                 client_name: str = "simple-client"):
+        """
+        Args:
+            url: MCP endpoint, e.g. "http://127.0.0.1:8000/mcp"
+            auth_token: Bearer token (defaults to MCP_AUTH_TOKEN)
+            timeout: Seconds per HTTP request
+            client_name: clientInfo.name sent in initialize
+        """
+        self.url = url
+        self.timeout = timeout
+        self.client_name = client_name
+        self.session_id: Optional[str] = None
+        self.server_info: Dict[str, Any] = {}
+        self._ids = itertools.count(1)
+        self._http = requests.Session()
+        self._http.headers.update({"Content-Type": "application/json",
+                                   "Accept": "application/json, text/event-stream"})
+        token = auth_token or os.getenv("MCP_AUTH_TOKEN")
+        if token:
+            self._http.headers["Authorization"] = f"Bearer {token}"
+
+    def _post(self, message: Dict[str, Any], timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        headers = {SESSION_HEADER: self.session_id} if self.session_id else {}
+        start = time.perf_counter()
+        response = self._http.post(self.url, json=message, headers=headers, timeout=timeout or self.timeout,
+                                   stream=True)
+        with response:
+            response.raise_for_status()
+            if SESSION_HEADER in response.headers:
+                self.session_id = response.headers[SESSION_HEADER]
+            if "id" not in message or response.status_code == 202:
+                return None
+            if response.headers.get("content-type", "").startswith("text/event-stream"):
+                # Server-to-client requests/notifications may precede the answer
+                reply = next((m for m in _sse_messages(response) if m.get("id") == message["id"]
+                              and "method" not in m), None)
+            else:
+                reply = response.json()
+        record_exchange(
+            "mcp-http",
+            {"method": "POST", "path": urlparse(self.url).path or "/", "body": message},
+            {"status": response.status_code, "headers": {"content-type": "application/json"}, "body": reply},
+            time.perf_counter() - start
+        )
+        if reply is None:
+            raise ConnectionError(f"No response to {message['method']} in the stream")
+        return reply
+
+    def request(self, method: str, params: Optional[Dict[str, Any]] = None,
+                deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Send a JSON-RPC request and return the response message
+
+        Args:
+            method: JSON-RPC method
+            params: Request params
+            deadline: Give up (and cancel the request on the server) when it passes;
+                the time left is sent in params._meta.timeout
+        """
+        message = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": dict(params or {})}
+        if deadline is None:
+            return self._post(message)
+        remaining = deadline.check(method)
+        message["params"]["_meta"] = dict(message["params"].get("_meta") or {}, **deadline.meta())
+        try:
+            return self._post(message, timeout=remaining)
+        except requests.Timeout as e:
+            try:
+                self._post(cancelled_notification(message["id"]))
+            except requests.RequestException:
+                pass
+            raise DeadlineExceeded(f"{method} did not complete before its deadline") from e
+
+    def notify(self, method: str, params: Optional[Dict[str, Any]] = None) -> None:
+        """Send a JSON-RPC notification"""
+        message: Dict[str, Any] = {"jsonrpc": "2.0", "method": method}
+        if params:
+            message["params"] = params
+        self._post(message)
+
+    def initialize(self) -> Dict[str, Any]:
+        """Open the session (initialize + notifications/initialized); returns the initialize response"""
+        response = self.request("initialize", {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": self.client_name, "version": "1.0.0"}
+        })
+        if "error" not in response:
+            self.server_info = response["result"].get("serverInfo", {})
+            self.notify("notifications/initialized")
+        return response
+
+    def call_tool(self, name: str, arguments: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """tools/call response message (deadline: the tool's budget unless given or scoped sooner)"""
+        return self.request("tools/call", {"name": name, "arguments": arguments},
+                            deadline=Deadline.for_tool(name, deadline))
+
+    def close(self) -> None:
+        """End the session on the server (frees its slot) and the HTTP connection"""
+        try:
+            if self.session_id:
+                self._http.delete(self.url, headers={SESSION_HEADER: self.session_id}, timeout=self.timeout)
+        except requests.RequestException:
+            pass
+        finally:
+            self.session_id = None
+            self._http.close()
+
+    def __enter__(self) -> "MCPHttpSession":
+        response = self.initialize()
+        if "error" in response:
+            self.close()
+            raise ConnectionError(f"initialize failed: {response['error']}")
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
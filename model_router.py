@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Latency-aware model routing for the agent loop.
+
+Each step of a query is routed either to a fast model or to the large one.
+A lightweight heuristic sends short, dispatch-style requests ("envía X a Y",
+"busca a Ana") and the steps that follow small tool results to the fast model.
+Long or analytical requests, and steps that have to digest large tool results,
+go to the large model.
+
+A fast-model step is checked before it takes effect. Invalid tool arguments,
+truncated or empty output, and hedging text escalate the step to the large
+model. Latency and token usage are recorded per route (optionally appended
+to MODEL_ROUTING_LOG as JSONL) so the thresholds can be tuned.
+"""
+
+import json
+import os
+import re
+import time
+import unicodedata
+from typing import Dict, Any, Iterable, List, Optional, Pattern, Tuple
+
+from latency_stats import LatencyWindow
+
+FAST = "fast"
+LARGE = "large"
+
+# Optional JSONL file where every routed call is appended
+MODEL_ROUTING_LOG = os.getenv("MODEL_ROUTING_LOG")
+
+# Matched as whole words; a trailing "*" also matches longer words ("envia*": enviale, enviar)
+DISPATCH_WORDS = (
+    "envia*", "manda*", "responde*", "reenvia*", "busca*", "lista", "muestra*", "descarga*", "marca",
+    "send", "reply", "forward", "search", "find", "list", "show", "download", "mark",
+)
+COMPLEX_WORDS = (
+    "resum*", "analiz*", "compara*", "explica*", "por que", "redacta*", "traduc*", "planifica*",
+    "summar*", "analy*", "compare", "explain", "why", "draft", "translate", "plan",
+)
+HEDGES = (
+    "no estoy seguro", "no estoy segura", "no se si", "no puedo determinar", "no tengo claro",
+    "i'm not sure", "i am not sure", "not certain", "i cannot determine", "unclear",
+)
+
+
+
+def keyword_pattern(words: Iterable[str]) -> Pattern:
+    """Regex matching any of the words (see DISPATCH_WORDS) at word boundaries"""
+    parts = [re.escape(word[:-1]) + r"\w*" if word.endswith("*") else re.escape(word) for word in words]
+    return re.compile(r"\b(?:" + "|".join(parts) + r")\b")
+
+
+DISPATCH_PATTERN = keyword_pattern(DISPATCH_WORDS)
+COMPLEX_PATTERN = keyword_pattern(COMPLEX_WORDS)
+HEDGE_PATTERN = keyword_pattern(HEDGES)
+
+JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+
+def _fold(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def validate_tool_input(schema: Dict[str, Any], args: Any) -> Optional[str]:
+    """
+    Check tool arguments against the top level of a JSON schema
+
+    Returns:
+        Description of the first problem, or None if the arguments look valid
+    """
+    if not isinstance(args, dict):
+        return "arguments are not an object"
+    properties = schema.get("properties", {})
+    for name in schema.get("required", []):
+        if name not in args:
+            return f"missing required argument '{name}'"
+    for name, value in args.items():
+        if properties and name not in properties:
+            return f"unknown argument '{name}'"
+        expected = JSON_TYPES.get(properties.get(name, {}).get("type"))
+        if expected is None or value is None:
+            continue
+        if isinstance(value, bool) and expected is not bool:
+            return f"argument '{name}' should be {properties[name]['type']}"
+        if not isinstance(value, expected):
+            return f"argument '{name}' should be {properties[name]['type']}"
+    return None
+
+
+class ModelRouter:
+    """Chooses the model for every agent step and records latency/tokens per route"""
+
+    def __init__(self, fast_model: str, large_model: str, enabled: bool = True,
+                 max_fast_query_chars: int = 200, max_fast_result_chars: int = 4000,
+                 log_path: Optional[str] = MODEL_ROUTING_LOG):
+        """
+        Initialize the router
+
+        Args:
+            fast_model: Model for simple steps
+            large_model: Model for complex steps and escalations
+            enabled: False routes everything to the large model
+            max_fast_query_chars: Longer queries start on the large model
+            max_fast_result_chars: Tool results larger than this are digested by the large model
+            log_path: JSONL file receiving one line per routed call
+        """
+        self.models = {FAST: fast_model, LARGE: large_model}
+        self.enabled = enabled and fast_model != large_model
+        self.max_fast_query_chars = max_fast_query_chars
+        self.max_fast_result_chars = max_fast_result_chars
+        self.log_path = log_path
+        self.escalations: Dict[str, int] = {}
+        self._calls: Dict[str, int] = {FAST: 0, LARGE: 0}
+        self._latencies: Dict[str, LatencyWindow] = {
+            route: LatencyWindow(max_samples=2048, window_seconds=None) for route in self.models
+        }
+        self._tokens: Dict[str, Dict[str, int]] = {
+            route: {"input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0} for route in self.models
+        }
+
+    def choose(self, query: str, step: int, previous_route: Optional[str] = None,
+               tool_result_chars: int = 0) -> Tuple[str, str, str]:
+        """
+        Route one step of the agent loop
+
+        Args:
+            query: The user's query
+            step: 0 for the first call, then one per tool round trip
+            previous_route: Route that handled the previous step
+            tool_result_chars: Size of the tool results the step has to read
+
+        Returns:
+            (route, model, reason)
+        """
+        if not self.enabled:
+            return LARGE, self.models[LARGE], "routing disabled"
+        if step > 0:
+            if previous_route == LARGE:
+                return LARGE, self.models[LARGE], "previous step on large model"
+            if tool_result_chars > self.max_fast_result_chars:
+                return LARGE, self.models[LARGE], "large tool results"
+            return FAST, self.models[FAST], "small tool results"
+
+        folded = _fold(query)
+        if len(query) > self.max_fast_query_chars:
+            return LARGE, self.models[LARGE], "long query"
+        if COMPLEX_PATTERN.search(folded):
+            return LARGE, self.models[LARGE], "complex request"
+        if DISPATCH_PATTERN.search(folded):
+            return FAST, self.models[FAST], "tool dispatch"
+        return FAST, self.models[FAST], "short query"
+
+    def check(self, response: Any, tools: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Decide whether a fast-model response must be redone by the large model
+
+        Returns:
+            Escalation reason, or None if the response can be used
+        """
+        if response.stop_reason == "max_tokens":
+            return "truncated output"
+        schemas = {tool["name"]: tool.get("input_schema", {}) for tool in tools}
+        text = []
+        tool_uses = 0
+        for block in response.content:
+            if block.type == "tool_use":
+                tool_uses += 1
+                if block.name not in schemas:
+                    return f"unknown tool '{block.name}'"
+                problem = validate_tool_input(schemas[block.name], block.input)
+                if problem:
+                    return f"invalid arguments for {block.name}: {problem}"
+            elif block.type == "text":
+                text.append(block.text)
+        folded = _fold(" ".join(text))
+        if not tool_uses and not folded.strip():
+            return "empty output"
+        if HEDGE_PATTERN.search(folded):
+            return "low confidence"
+        return None
+
+    def _log(self, entry: Dict[str, Any]) -> None:
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": time.time(), **entry}) + "\n")
+
+    def record(self, route: str, model: str, latency: float, usage: Any = None) -> None:
+        """Record the latency and token usage of one call"""
+        self._calls[route] += 1
+        self._latencies[route].add(latency)
+        for key in self._tokens[route]:
+            self._tokens[route][key] += int(getattr(usage, key, 0) or 0)
+        self._log({"route": route, "model": model, "latency": round(latency, 4),
+                   "input_tokens": getattr(usage, "input_tokens", None),
+                   "output_tokens": getattr(usage, "output_tokens", None)})
+
+    def record_escalation(self, reason: str) -> None:
+        """Record that a fast-model response was discarded and redone on the large model"""
+        self.escalations[reason] = self.escalations.get(reason, 0) + 1
+        self._log({"route": FAST, "escalation": reason})
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-route call count, latency percentiles (last 2048 calls) and tokens, plus escalation reasons"""
+        routes = {}
+        for route, model in self.models.items():
+            latency = self._latencies[route].summary()
+            routes[route] = {
+                "model": model,
+                "calls": self._calls[route],
+                "latency": {key: round(latency[key], 3) for key in ("mean", "p50", "p95", "max")},
+                **self._tokens[route],
+            }
+        return {"routes": routes, "escalations": dict(self.escalations)}
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Prompt caching helpers shared by the Claude entry points.
+
+Places cache_control breakpoints on the stable prefix of a Messages API
+request (tool definitions, system prompt and the conversation so far) and
+records the cache read/write token counts reported in each response.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Any, List, Optional, Union
+
+EPHEMERAL = {"type": "ephemeral"}
+
+# Optional JSONL file where every response's token usage is appended
+PROMPT_CACHE_LOG = os.getenv("PROMPT_CACHE_LOG")
+
+
+def cached_tools(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Return a copy of the tool list with a cache breakpoint after the last tool
+    
+    Args:
+        tools: Tool definitions in Messages API format
+        
+    Returns:
+        New list whose last tool carries cache_control
+    """
+    if not tools:
+        return tools
+    return tools[:-1] + [{**tools[-1], "cache_control": EPHEMERAL}]
+
+
+def cached_system(text: str) -> List[Dict[str, Any]]:
+    """
+    Build a system prompt as a single cached text block
+    
+    Args:
+        text: System instructions
+        
+    Returns:
+        System content blocks with cache_control
+    """
+    return [{"type": "text", "text": text, "cache_control": EPHEMERAL}]
+
+
+def cached_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Return a copy of the conversation with a cache breakpoint on its last block
+    
+    The next request of the same conversation then reads every earlier turn
+    from the cache and only pays full price for the new content.
+    
+    Args:
+        messages: Conversation in Messages API format
+        
+    Returns:
+        New message list; the input list and its blocks are not modified
+    """
+    if not messages:
+        return messages
+    last = messages[-1]
+    content: Union[str, List[Dict[str, Any]]] = last["content"]
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    else:
+        blocks = list(content)
+    if not blocks:
+        return messages
+    blocks[-1] = {**blocks[-1], "cache_control": EPHEMERAL}
+    return messages[:-1] + [{**last, "content": blocks}]
+
+
+class CacheStats:
+    """Accumulates prompt cache hit/miss token counts from API responses"""
+    
+    def __init__(self, name: str = "claude", log_path: Optional[str] = PROMPT_CACHE_LOG):
+        """
+        Initialize the collector
+        
+        Args:
+            name: Label written with each log record
+            log_path: Optional JSONL file to append per-response usage to
+        """
+        self.name = name
+        self.log_path = log_path
+        self.requests = 0
+        self.input_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.cache_read_input_tokens = 0
+        self.output_tokens = 0
+    
+    def record(self, usage: Any) -> Dict[str, int]:
+        """
+        Record the usage block of one Messages API response
+        
+        Args:
+            usage: response.usage from the Anthropic SDK
+            
+        Returns:
+            Token counts of this response
+        """
+        counts = {
+            field: getattr(usage, field, 0) or 0
+            for field in ("input_tokens", "cache_creation_input_tokens",
+                          "cache_read_input_tokens", "output_tokens")
+        }
+        self.requests += 1
+        self.input_tokens += counts["input_tokens"]
+        self.cache_creation_input_tokens += counts["cache_creation_input_tokens"]
+        self.cache_read_input_tokens += counts["cache_read_input_tokens"]
+        self.output_tokens += counts["output_tokens"]
+        
+        if self.log_path:
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"ts": time.time(), "source": self.name, **counts}) + "\n")
+            except OSError:
+                pass
+        return counts
+    
+    @property
+    def hit_ratio(self) -> float:
+        """Share of prompt tokens that were served from the cache"""
+        total = self.input_tokens + self.cache_creation_input_tokens + self.cache_read_input_tokens
+        return self.cache_read_input_tokens / total if total else 0.0
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the accumulated counters as a dict"""
+        return {
+            "requests": self.requests,
+            "input_tokens": self.input_tokens,
+            "cache_creation_input_tokens": self.cache_creation_input_tokens,
+            "cache_read_input_tokens": self.cache_read_input_tokens,
+            "output_tokens": self.output_tokens,
+            "hit_ratio": round(self.hit_ratio, 4),
+        }
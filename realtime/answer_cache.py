@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Answer cache for repeated FAQ-style questions ("horario?", "precio?").
+
+Questions are normalized (accents, case, punctuation, repeated letters and
+plural "s" are folded) and matched against cached questions exactly or,
+failing that, with a local similarity measure (word overlap and character
+trigrams); a fuzzy match also needs the same content words, so "cuanto cuesta
+el plan?" does not hit "cuanto cuesta el plan basico?". Entries expire after a
+TTL, the cache is bounded with LRU eviction, and everything is dropped when the
+assistant configuration (assistant, model, instructions, tools or vector store)
+changes.
+
+The cache is for global FAQ answers only: it is shared by every chat, so only
+answers produced without calling any WhatsApp tool (i.e. from the instructions
+and the vector store's file_search) are cached. An answer built from a chat's
+messages or contacts is never served to another chat, and a hit never skips a
+message being sent or a chat being marked as read.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Set
+
+# Words that carry no meaning of their own when comparing questions
+STOPWORDS = frozenset({
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los", "me", "mi",
+    "para", "por", "que", "se", "su", "te", "tu", "un", "una", "uno", "y", "o",
+})
+
+# Minimum trigram similarity for two content words to count as the same (typos)
+WORD_THRESHOLD = 0.6
+
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+_REPEATS = re.compile(r"(\w)\1{2,}", re.UNICODE)
+_PLURAL = re.compile(r"(\w{3,})s\b", re.UNICODE)
+
+
+def normalize_question(text: str) -> str:
+    """Fold accents, case, punctuation, repeated letters, plural "s" and whitespace"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    folded = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+    folded = _PUNCTUATION.sub(" ", folded)
+    folded = _REPEATS.sub(r"\1", folded)
+    folded = _PLURAL.sub(r"\1", folded)
+    return " ".join(folded.split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: str, b: str) -> float:
+    grams_a, grams_b = _trigrams(a), _trigrams(b)
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def content_words(text: str) -> Set[str]:
+    """Words of a normalized question other than STOPWORDS"""
+    return {word for word in text.split() if word not in STOPWORDS}
+
+
+def same_content(a: str, b: str) -> bool:
+    """True if every content word of each normalized question has a close match in the other"""
+    words_a, words_b = content_words(a), content_words(b)
+
+    def covered(words: Set[str], others: Set[str]) -> bool:
+        return all(word in others or any(_dice(word, other) >= WORD_THRESHOLD for other in others)
+                   for word in words)
+
+    return covered(words_a, words_b) and covered(words_b, words_a)
+
+
+def similarity(a: str, b: str) -> float:
+    """
+    Similarity of two normalized questions in [0, 1]
+
+    The best of word-set Jaccard (robust to word order) and character-trigram
+    Dice (robust to typos and plurals).
+    """
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    words_a, words_b = set(a.split()), set(b.split())
+    words = len(words_a & words_b) / len(words_a | words_b)
+    return max(words, _dice(a, b))
+
+
+def config_fingerprint(config: Dict[str, Any]) -> str:
+    """Fingerprint of the assistant_config.json fields that change answers"""
+    relevant = {key: config.get(key) for key in ("assistant_id", "model", "fingerprint", "vector_store_id")}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Thread-safe TTL + LRU cache of global FAQ answers keyed on normalized questions"""
+
+    def __init__(self, max_entries: int = 500, ttl: float = 3600, threshold: float = 0.85,
+                 max_question_chars: int = 200, config_path: Optional[str] = None,
+                 cacheable_tools: Iterable[str] = ()):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum cached answers (least recently used are evicted)
+            ttl: Seconds an answer stays valid
+            threshold: Minimum similarity for a fuzzy hit (the content words must match as well)
+            max_question_chars: Longer questions are neither looked up nor cached
+            config_path: assistant_config.json to watch; the cache is cleared when it changes
+            cacheable_tools: WhatsApp tools an answer may call and still be cached; none by
+                default, since their results are private to a chat or change state
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_question_chars = max_question_chars
+        self.config_path = config_path
+        self.cacheable_tools = frozenset(cacheable_tools)
+        self.fingerprint: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._config_mtime: Optional[float] = None
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidate(self, fingerprint: Optional[str] = None) -> None:
+        """Drop every entry if the fingerprint changed (or unconditionally without one)"""
+        with self._lock:
+            if fingerprint is not None and fingerprint == self.fingerprint:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.fingerprint = fingerprint
+
+    def _check_config(self) -> None:
+        """Invalidate when the watched assistant configuration file changed"""
+        if not self.config_path:
+            return
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            return
+        if mtime == self._config_mtime:
+            return
+        self._config_mtime = mtime
+        try:
+            with open(self.config_path, "r") as f:
+                self.invalidate(config_fingerprint(json.load(f)))
+        except (OSError, ValueError):
+            self.invalidate()
+
+    def lookup(self, question: str) -> Optional[str]:
+        """Cached answer for the question, or None"""
+        if len(question) > self.max_question_chars:
+            return None
+        self._check_config()
+        key = normalize_question(question)
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                best, best_key = 0.0, None
+                for candidate_key, candidate in self._entries.items():
+                    score = similarity(key, candidate_key)
+                    if score > best and same_content(key, candidate_key):
+                        best, entry, best_key = score, candidate, candidate_key
+                if best < self.threshold:
+                    entry = None
+                key = best_key
+            if entry is not None and now - entry["stored_at"] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry["hits"] += 1
+            self.hits += 1
+            return entry["answer"]
+
+    def store(self, question: str, answer: str, tools_called: Iterable[str] = ()) -> bool:
+        """
+        Cache an answer unless it called WhatsApp tools outside cacheable_tools
+
+        Returns:
+            True if the answer was cached
+        """
+        if not answer or len(question) > self.max_question_chars:
+            return False
+        if set(tools_called) - self.cacheable_tools:
+            return False
+        key = normalize_question(question)
+        if not key:
+            return False
+        self._check_config()
+        with self._lock:
+            self._entries[key] = {"answer": answer, "stored_at": time.time(), "hits": 0}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
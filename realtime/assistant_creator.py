@@ -2,6 +2,8 @@
 import os
 import openai
 import json
+import hashlib
+from typing import Dict, Any, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -183,6 +185,27 @@ whatsapp_tools = [
                 "required": []
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "fetch_more_result",
+            "description": "Fetch more rows of a previous tool result that was truncated. Use the handle and offset given in the truncation marker.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "handle": {
+                        "type": "string",
+                        "description": "Handle from the truncation marker"
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Index of the first row to return"
+                    }
+                },
+                "required": ["handle", "offset"]
+            }
+        }
     }
 ]
 
@@ -195,36 +218,95 @@ tool_resources = {}
 if vector_store_id:
     tool_resources["file_search"] = {"vector_store_ids": [vector_store_id]}
 
-# Create the Hybrid WhatsApp Assistant
-assistant = client.beta.assistants.create(
-    name="Hybrid WhatsApp Assistant",
-    instructions="""You are a hybrid WhatsApp assistant that can:
+CONFIG_PATH = "assistant_config.json"
+
+# Full assistant configuration; any change to it changes the fingerprint
+assistant_params = {
+    "name": "Hybrid WhatsApp Assistant",
+    "instructions": """You are a hybrid WhatsApp assistant that can:
 1. Manage WhatsApp operations: send messages, search contacts, list messages and chats, send files, download media, and check for new messages
 2. Search through uploaded documents using file_search to find relevant information
 3. Combine information from both WhatsApp and documents when needed
 
 Use WhatsApp tools for messaging operations and file_search for document queries. Always be helpful and clear in your responses.""",
-    tools=tools,
-    tool_resources=tool_resources if tool_resources else None,
-    model="gpt-4o-mini",
-    temperature=0.7,
-    response_format={"type": "text"}
-)
-
-# Save assistant and thread IDs to a file for the runner
-config = {
-    "assistant_id": assistant.id,
-    "model": assistant.model,
-    "name": assistant.name
+    "tools": tools,
+    "tool_resources": tool_resources if tool_resources else None,
+    "model": "gpt-4o-mini",
+    "temperature": 0.7,
+    "response_format": {"type": "text"}
 }
 
-with open("assistant_config.json", "w") as f:
-    json.dump(config, f, indent=2)
+def config_fingerprint(params: Dict[str, Any]) -> str:
+    """Stable hash of the assistant configuration (tools, instructions, model, vector store)"""
+    canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def load_config(path: str = CONFIG_PATH) -> Dict[str, Any]:
+    """Load the saved assistant configuration, or an empty dict if there is none"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def provision_assistant(path: str = CONFIG_PATH) -> Tuple[Dict[str, Any], str]:
+    """Create, update or reuse the assistant so it matches assistant_params.
+
+    An unchanged configuration costs a single retrieve call, which confirms the
+    saved assistant still exists; one deleted remotely is created again.
+
+    Returns:
+        The saved configuration and the action taken: "reused", "updated" or "created"
+    """
+    fingerprint = config_fingerprint(assistant_params)
+    config = load_config(path)
+    assistant_id = config.get("assistant_id")
+    
+    # Unchanged configuration: reuse the assistant if it still exists
+    if assistant_id and config.get("fingerprint") == fingerprint:
+        try:
+            client.beta.assistants.retrieve(assistant_id)
+            return config, "reused"
+        except openai.NotFoundError:
+            print(f"Assistant {assistant_id} no longer exists, creating a new one")
+            assistant_id = None
+    
+    assistant = None
+    action = "created"
+    if assistant_id:
+        try:
+            # Update in place so the assistant ID (and existing threads) stay valid
+            assistant = client.beta.assistants.update(assistant_id, **assistant_params)
+            action = "updated"
+        except openai.NotFoundError:
+            print(f"Assistant {assistant_id} no longer exists, creating a new one")
+    if assistant is None:
+        assistant = client.beta.assistants.create(**assistant_params)
+    
+    # Save assistant configuration to a file for the runner
+    config = {
+        "assistant_id": assistant.id,
+        "model": assistant.model,
+        "name": assistant.name,
+        "vector_store_id": vector_store_id,
+        "fingerprint": fingerprint
+    }
+    
+    with open(path, "w") as f:
+        json.dump(config, f, indent=2)
+    
+    return config, action
+
+def main():
+    config, action = provision_assistant()
+    
+    print(f"Hybrid WhatsApp Assistant {action} successfully!")
+    print(f"Assistant ID: {config['assistant_id']}")
+    print(f"Model: {config['model']}")
+    print(f"Vector Store ID: {vector_store_id if vector_store_id else 'None'}")
+    print(f"Tools: WhatsApp functions + {'File Search' if vector_store_id else 'No File Search'}")
+    print(f"Configuration saved to: {CONFIG_PATH}")
+    print("\nYou can now run assistant_running.py to start chatting!")
 
-print("Hybrid WhatsApp Assistant created successfully!")
-print(f"Assistant ID: {assistant.id}")
-print(f"Model: {assistant.model}")
-print(f"Vector Store ID: {vector_store_id if vector_store_id else 'None'}")
-print(f"Tools: WhatsApp functions + {'File Search' if vector_store_id else 'No File Search'}")
-print(f"Configuration saved to: assistant_config.json")
-print("\nYou can now run assistant_running.py to start chatting!")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
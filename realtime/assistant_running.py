@@ -1,123 +1,282 @@
+import contextvars
 import os
-import openai
 import json
+import sys
+import threading
 import time
-from typing import Dict, Any
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Dict, Any, List, Callable, Optional
 from dotenv import load_dotenv
-from claude_chat_client import create_whatsapp_client
+from claude_chat_client import create_whatsapp_client, stats_scope
+from deadlines import Deadline, deadline_scope
+from tool_result_encoder import ResultStore, encode_tool_result
+from realtime.answer_cache import AnswerCache
+from llm_scheduler import INTERACTIVE, RateLimited, get_scheduler
+from traffic_log import http_client
 
 load_dotenv()
 
-# Initialize clients
-openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-whatsapp_client = create_whatsapp_client("https://3319c2e6b9bd.ngrok-free.app")
-
-# Load assistant configuration
-try:
-    with open("assistant_config.json", "r") as f:
-        config = json.load(f)
-    assistant_id = config["assistant_id"]
-    print(f" Loaded assistant: {config['name']} ({config['model']})")
-except FileNotFoundError:
-    print("L Assistant config not found. Please run assistant_creator.py first.")
-    exit(1)
-
-# Create a new thread for this conversation
-thread = openai_client.beta.threads.create()
-print(f">� Created conversation thread: {thread.id}")
-
-def execute_whatsapp_tool(tool_name: str, arguments: Dict[str, Any]) -> str:
-    """Execute WhatsApp tool and return result as string"""
+WHATSAPP_MCP_URL = "https://3319c2e6b9bd.ngrok-free.app"
+
+# Clients are built on first use so importing this module (auto_reply workers,
+# benchmarks) doesn't pay for the OpenAI SDK import; callers may also assign
+# assistant_running.openai_client / whatsapp_client before the first run
+_clients_lock = threading.Lock()
+
+def get_openai_client():
+    """Shared openai.OpenAI client (traffic is teed to TRAFFIC_LOG when set)"""
+    global openai_client
+    with _clients_lock:
+        if "openai_client" not in globals():
+            import openai
+            # Rate-limit retries are left to the shared LLM scheduler
+            openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0,
+                                          http_client=http_client("openai"))
+        return openai_client
+
+def get_whatsapp_client():
+    """Shared WhatsApp MCP client"""
+    global whatsapp_client
+    with _clients_lock:
+        if "whatsapp_client" not in globals():
+            whatsapp_client = create_whatsapp_client(WHATSAPP_MCP_URL)
+        return whatsapp_client
+
+def __getattr__(name):
+    # Module attribute access (assistant_running.openai_client) before first use
+    if name == "openai_client":
+        return get_openai_client()
+    if name == "whatsapp_client":
+        return get_whatsapp_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Rows of truncated tool results, paged through with fetch_more_result
+result_store = ResultStore()
+
+# Bounded pool for concurrent tool calls and per-call deadline (seconds; each
+# tool's own budget from MCP_TOOL_BUDGETS applies if it is shorter)
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "8"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="whatsapp-tool")
+
+# Tokens reserved in the shared LLM budget per run, corrected with the run's real usage
+RUN_TOKEN_ESTIMATE = int(os.getenv("ASSISTANT_RUN_TOKENS", "4000"))
+
+# Tool registry: tool name -> handler(arguments) returning the raw tool result
+TOOL_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "send_message": lambda args: get_whatsapp_client().send_message(args["recipient"], args["message"]),
+    "search_contacts": lambda args: get_whatsapp_client().search_contacts(args["query"]),
+    "list_messages": lambda args: get_whatsapp_client().list_messages(**args),
+    "list_chats": lambda args: get_whatsapp_client().list_chats(**args),
+    "send_file": lambda args: get_whatsapp_client().send_file(args["recipient"], args["media_path"]),
+    "download_media": lambda args: get_whatsapp_client().download_media(args["message_id"], args["chat_jid"]),
+    "check_new_messages": lambda args: get_whatsapp_client().check_new_messages(args.get("mark_as_seen", True)),
+    "mark_messages_as_seen": lambda args: get_whatsapp_client().mark_messages_as_seen(),
+    "fetch_more_result": lambda args: result_store.fetch(args["handle"], args.get("offset", 0)),
+}
+
+def execute_whatsapp_tool(tool_name: str, arguments: Dict[str, Any], deadline: Optional[Deadline] = None) -> str:
+    """Execute WhatsApp tool (within `deadline`, if given) and return result as string"""
+    handler = TOOL_HANDLERS.get(tool_name)
+    if handler is None:
+        return json.dumps({"error": f"Unknown tool: {tool_name}"})
     try:
-        if tool_name == "send_message":
-            result = whatsapp_client.send_message(arguments["recipient"], arguments["message"])
-        elif tool_name == "search_contacts":
-            result = whatsapp_client.search_contacts(arguments["query"])
-        elif tool_name == "list_messages":
-            result = whatsapp_client.list_messages(**arguments)
-        elif tool_name == "list_chats":
-            result = whatsapp_client.list_chats(**arguments)
-        elif tool_name == "send_file":
-            result = whatsapp_client.send_file(arguments["recipient"], arguments["media_path"])
-        elif tool_name == "download_media":
-            result = whatsapp_client.download_media(arguments["message_id"], arguments["chat_jid"])
-        elif tool_name == "check_new_messages":
-            mark_as_seen = arguments.get("mark_as_seen", True)
-            result = whatsapp_client.check_new_messages(mark_as_seen)
-        elif tool_name == "mark_messages_as_seen":
-            result = whatsapp_client.mark_messages_as_seen()
-        else:
-            return json.dumps({"error": f"Unknown tool: {tool_name}"})
-        
-        return json.dumps(result, ensure_ascii=False)
+        with deadline_scope(deadline):
+            result = handler(arguments)
+        return encode_tool_result(result, tool_name, store=result_store)
     except Exception as e:
         return json.dumps({"error": f"Tool execution failed: {str(e)}"})
 
-def wait_for_completion(thread_id: str, run_id: str) -> Dict[str, Any]:
-    """Wait for assistant run completion with tool handling"""
-    while True:
+def execute_tool_calls(tool_calls) -> List[Dict[str, str]]:
+    """Execute the tool calls of a requires_action event and build the tool outputs.
+
+    Function calls are dispatched concurrently on the shared tool pool; each one
+    gets a deadline TOOL_TIMEOUT seconds from submission, which its MCP request
+    carries to the server, and the outputs are returned in the original order
+    of the tool calls.
+    """
+    pending = []
+
+    for tool_call in tool_calls:
         try:
-            run_status = openai_client.beta.threads.runs.retrieve(
-                thread_id=thread_id, 
-                run_id=run_id
-            )
-            
-            if run_status.status == "completed":
-                return {"status": "completed"}
-                
-            elif run_status.status == "requires_action":
-                tool_outputs = []
-                
-                for tool_call in run_status.required_action.submit_tool_outputs.tool_calls:
-                    try:
-                        if tool_call.type == "function":
-                            # Handle WhatsApp function calls
-                            args = json.loads(tool_call.function.arguments)
-                            print(f"🔧 Executing WhatsApp tool: {tool_call.function.name}")
-                            
-                            result = execute_whatsapp_tool(tool_call.function.name, args)
-                            tool_outputs.append({
-                                "tool_call_id": tool_call.id,
-                                "output": result
-                            })
-                        elif tool_call.type == "file_search":
-                            # file_search is handled automatically by OpenAI
-                            print(f"📄 File search operation in progress...")
-                            # No output needed for file_search - it's handled internally
-                            pass
-                        else:
-                            print(f"⚠️ Unknown tool type: {tool_call.type}")
-                            
-                    except Exception as e:
-                        print(f"❌ Tool error: {e}")
-                        tool_outputs.append({
-                            "tool_call_id": tool_call.id,
-                            "output": json.dumps({"error": str(e)})
-                        })
-                
-                # Submit tool outputs (only if there are WhatsApp tool outputs)
-                if tool_outputs:
-                    openai_client.beta.threads.runs.submit_tool_outputs(
+            if tool_call.type == "function":
+                # Handle WhatsApp function calls
+                args = json.loads(tool_call.function.arguments)
+                print(f"🔧 Executing WhatsApp tool: {tool_call.function.name}")
+
+                # Run in a copy of this context so the call is counted in the run's stats scope
+                deadline = Deadline.after(TOOL_TIMEOUT)
+                future = tool_executor.submit(
+                    contextvars.copy_context().run, execute_whatsapp_tool, tool_call.function.name, args, deadline
+                )
+                pending.append((tool_call, future, deadline))
+            elif tool_call.type == "file_search":
+                # file_search is handled automatically by OpenAI
+                print(f"📄 File search operation in progress...")
+                # No output needed for file_search - it's handled internally
+                pass
+            else:
+                print(f"⚠️ Unknown tool type: {tool_call.type}")
+
+        except Exception as e:
+            print(f"❌ Tool error: {e}")
+            pending.append((tool_call, None, json.dumps({"error": str(e)})))
+
+    tool_outputs = []
+    for tool_call, future, deadline in pending:
+        if future is None:
+            output = deadline
+        else:
+            try:
+                output = future.result(timeout=deadline.remaining())
+            except FuturesTimeoutError:
+                # The call gives up at the same deadline; a result that races it is discarded
+                future.cancel()
+                print(f"⏱️ Tool timed out: {tool_call.function.name}")
+                output = json.dumps({"error": f"Tool timed out after {TOOL_TIMEOUT}s"})
+            except Exception as e:
+                print(f"❌ Tool error: {e}")
+                output = json.dumps({"error": str(e)})
+        tool_outputs.append({
+            "tool_call_id": tool_call.id,
+            "output": output
+        })
+
+    return tool_outputs
+
+def stream_run(thread_id: str, assistant_id: str,
+               on_run_created: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Run the assistant on a thread, reacting to streamed run events.
+
+    Tool calls are executed as soon as the requires_action event arrives and
+    their outputs are submitted through the streaming submit path, so there is
+    no polling delay between run steps. The reply text is collected from the
+    message events, which saves the final messages.list call.
+
+    on_run_created, if given, receives the run ID as soon as the run exists
+    (e.g. so that another thread can cancel it).
+
+    The result carries "timing": the run's wall time and the WhatsApp tool
+    calls made during it (whatsapp_client.stats for the run's scope).
+    """
+    scope = f"run-{uuid.uuid4().hex}"
+    started = time.perf_counter()
+    with stats_scope(scope):
+        result = _stream_run(thread_id, assistant_id, on_run_created)
+    result["timing"] = {"total_seconds": round(time.perf_counter() - started, 4),
+                        "tools": get_whatsapp_client().pop_stats(scope)}
+    return result
+
+def _stream_run(thread_id: str, assistant_id: str,
+                on_run_created: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    text_parts = []
+    tools_called = []
+    manager = get_openai_client().beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id
+    )
+
+    while manager is not None:
+        with manager as stream:
+            manager = None
+            for event in stream:
+                if event.event == "thread.run.created" and on_run_created:
+                    on_run_created(event.data.id)
+
+                elif event.event == "thread.run.requires_action":
+                    run = event.data
+                    tool_calls = run.required_action.submit_tool_outputs.tool_calls
+                    tools_called.extend(
+                        tool_call.function.name for tool_call in tool_calls if tool_call.type == "function"
+                    )
+                    tool_outputs = execute_tool_calls(tool_calls)
+                    # Continue the same run on a new event stream
+                    manager = get_openai_client().beta.threads.runs.submit_tool_outputs_stream(
                         thread_id=thread_id,
-                        run_id=run_id,
+                        run_id=run.id,
                         tool_outputs=tool_outputs
                     )
-                    
-            elif run_status.status in ["failed", "cancelled", "expired"]:
-                error_msg = f"Run {run_status.status}"
-                if hasattr(run_status, 'last_error') and run_status.last_error:
-                    error_msg += f": {run_status.last_error.message}"
-                return {"status": "failed", "error": error_msg}
-            
-            time.sleep(1)
-            
-        except Exception as e:
-            print(f"L Polling error: {e}")
-            time.sleep(2)
+                    break
+
+                elif event.event == "thread.message.completed":
+                    for content in event.data.content:
+                        if content.type == "text":
+                            text_parts.append(content.text.value)
+
+                elif event.event == "thread.run.completed":
+                    response = "\n".join(text_parts) or get_assistant_response(thread_id)
+                    return {"status": "completed", "response": response, "tools_called": tools_called,
+                            "usage": getattr(event.data, "usage", None)}
+
+                elif event.event in ["thread.run.failed", "thread.run.cancelled", "thread.run.expired"]:
+                    run = event.data
+                    error_msg = f"Run {run.status}"
+                    error_code = None
+                    if getattr(run, 'last_error', None):
+                        error_msg += f": {run.last_error.message}"
+                        error_code = run.last_error.code
+                    return {"status": "failed", "error": error_msg, "error_code": error_code,
+                            "tools_called": tools_called}
+
+                elif event.event == "error":
+                    return {"status": "failed", "error": str(event.data), "tools_called": tools_called}
+
+    return {"status": "failed", "error": "Run stream ended unexpectedly", "tools_called": tools_called}
+
+def scheduled_run(thread_id: str, assistant_id: str, model: str = "assistant", priority: int = INTERACTIVE,
+                  on_run_created: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """stream_run() paced by the shared LLM scheduler.
+
+    Runs rejected for rate limits before calling any tool are retried with
+    backoff; a run that already executed tools is never repeated.
+    """
+    def run():
+        result = stream_run(thread_id, assistant_id, on_run_created=on_run_created)
+        if result.get("error_code") == "rate_limit_exceeded" and not result["tools_called"]:
+            raise RateLimited(result["error"])
+        return result
+
+    try:
+        return get_scheduler().call("openai", model, run, tokens=RUN_TOKEN_ESTIMATE, priority=priority)
+    except RateLimited as e:
+        return {"status": "failed", "error": str(e), "error_code": "rate_limit_exceeded", "tools_called": []}
+
+def answer_question(thread_id: str, assistant_id: str, text: str,
+                    answer_cache: Optional[AnswerCache] = None,
+                    on_run_created: Optional[Callable[[str], None]] = None,
+                    model: str = "assistant", priority: int = INTERACTIVE) -> Dict[str, Any]:
+    """Add the user's text to the thread and answer it, from the cache when possible.
+
+    A cached answer is appended to the thread as an assistant message so the
+    conversation history stays the same as after a real run.
+    """
+    get_openai_client().beta.threads.messages.create(thread_id=thread_id, role="user", content=text)
+
+    if answer_cache is not None:
+        cached = answer_cache.lookup(text)
+        if cached is not None:
+            get_openai_client().beta.threads.messages.create(thread_id=thread_id, role="assistant", content=cached)
+            return {"status": "completed", "response": cached, "tools_called": [], "cached": True}
+
+    result = scheduled_run(thread_id, assistant_id, model, priority, on_run_created)
+    if answer_cache is not None and result["status"] == "completed":
+        answer_cache.store(text, result["response"], result["tools_called"])
+    return result
+
+def create_answer_cache(config_path: str = "assistant_config.json") -> Optional[AnswerCache]:
+    """Answer cache configured from the environment (opt-in with ASSISTANT_ANSWER_CACHE=1)"""
+    if os.getenv("ASSISTANT_ANSWER_CACHE", "0").lower() not in ("1", "true", "yes"):
+        return None
+    return AnswerCache(
+        max_entries=int(os.getenv("ASSISTANT_ANSWER_CACHE_SIZE", "500")),
+        ttl=float(os.getenv("ASSISTANT_ANSWER_CACHE_TTL", "3600")),
+        config_path=config_path
+    )
 
 def get_assistant_response(thread_id: str) -> str:
     """Get the latest assistant response"""
-    messages = openai_client.beta.threads.messages.list(thread_id=thread_id, limit=1)
+    messages = get_openai_client().beta.threads.messages.list(thread_id=thread_id, limit=1)
     
     for msg in messages.data:
         if msg.role == "assistant" and msg.content:
@@ -127,47 +286,70 @@ def get_assistant_response(thread_id: str) -> str:
     
     return "No response received."
 
-print("\n> WhatsApp Assistant is ready!")
-print("=� Type your messages below (type 'quit' to exit):")
-print("=� You can ask me to send messages, search contacts, list chats, etc.\n")
+def format_timing(timing: Dict[str, Any]) -> str:
+    """One-line breakdown of where a run's time went"""
+    tools = timing["tools"]
+    parts = [f"{name} {stats['calls']}x {stats['total_seconds']:.2f}s"
+             for name, stats in sorted(tools["tools"].items(), key=lambda item: -item[1]["total_seconds"])]
+    retries = f", {tools['retries']} retries" if tools["retries"] else ""
+    return (f"⏱️ Run {timing['total_seconds']:.2f}s, WhatsApp tools {tools['total_seconds']:.2f}s{retries}"
+            + (f" ({', '.join(parts)})" if parts else ""))
 
-while True:
+def load_assistant_config(path: str = "assistant_config.json") -> Dict[str, Any]:
+    """Load the configuration written by assistant_creator.py"""
+    with open(path, "r") as f:
+        return json.load(f)
+
+def main():
+    """Interactive chat loop with the assistant"""
+    # Load assistant configuration
     try:
-        user_input = input("You: ").strip()
-        
-        if user_input.lower() in ['quit', 'exit', 'bye']:
-            print("=K Goodbye!")
-            break
-        
-        if not user_input:
-            continue
+        config = load_assistant_config()
+        assistant_id = config["assistant_id"]
+        print(f" Loaded assistant: {config['name']} ({config['model']})")
+    except FileNotFoundError:
+        print("L Assistant config not found. Please run assistant_creator.py first.")
+        sys.exit(1)
+
+    # Opt-in cache for repeated questions (ASSISTANT_ANSWER_CACHE=1)
+    answer_cache = create_answer_cache()
+
+    # Create a new thread for this conversation
+    thread = get_openai_client().beta.threads.create()
+    print(f">� Created conversation thread: {thread.id}")
+
+    print("\n> WhatsApp Assistant is ready!")
+    print("=� Type your messages below (type 'quit' to exit):")
+    print("=� You can ask me to send messages, search contacts, list chats, etc.\n")
+
+    while True:
+        try:
+            user_input = input("You: ").strip()
         
-        # Add user message to thread
-        openai_client.beta.threads.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=user_input
-        )
+            if user_input.lower() in ['quit', 'exit', 'bye']:
+                print("=K Goodbye!")
+                break
         
-        # Run the assistant
-        run = openai_client.beta.threads.runs.create(
-            thread_id=thread.id,
-            assistant_id=assistant_id
-        )
+            if not user_input:
+                continue
         
-        print("> Assistant is thinking...")
+            print("> Assistant is thinking...")
         
-        # Wait for completion
-        result = wait_for_completion(thread.id, run.id)
+            # Answer from the cache, or run the assistant and handle its events as they stream in
+            result = answer_question(thread.id, assistant_id, user_input, answer_cache, model=config["model"])
         
-        if result["status"] == "completed":
-            response = get_assistant_response(thread.id)
-            print(f"> Assistant: {response}\n")
-        else:
-            print(f"L Error: {result.get('error', 'Unknown error')}\n")
+            if result["status"] == "completed":
+                print(f"> Assistant: {result['response']}\n")
+                if "timing" in result:
+                    print(format_timing(result["timing"]))
+            else:
+                print(f"L Error: {result.get('error', 'Unknown error')}\n")
             
-    except KeyboardInterrupt:
-        print("\n=K Goodbye!")
-        break
-    except Exception as e:
-        print(f"L Error: {e}\n")
\ No newline at end of file
+        except KeyboardInterrupt:
+            print("\n=K Goodbye!")
+            break
+        except Exception as e:
+            print(f"L Error: {e}\n")
+
+if __name__ == "__main__":
+    main()
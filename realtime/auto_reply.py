@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+Headless auto-reply engine: answers inbound WhatsApp messages with the OpenAI assistant.
+
+The parent process polls check_new_messages and routes every inbound message
+to a worker process chosen by a stable hash of its chat JID. Inside a worker,
+messages of the same chat are processed strictly in order while different
+chats run in parallel on a thread pool. Each chat JID is mapped to a persistent
+assistant thread stored in SQLite, so conversations survive restarts.
+
+Quick bursts of messages from one chat are merged into a single assistant
+turn (see realtime/coalescer.py), and a run that is still in flight when more
+input arrives for its chat is cancelled, so the reply covers everything the
+user said. With --answer-cache, repeated FAQ-style questions are answered
+from a local cache (see realtime/answer_cache.py) without a run.
+
+Throughput and queue-lag metrics are logged periodically and, with
+--metrics-port, served as JSON on http://<host>:<port>/metrics.
+
+Usage (from the repository root):
+    python -m realtime.auto_reply --workers 4 --metrics-port 9108
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Callable, Optional
+
+from latency_stats import LatencyWindow
+from realtime.answer_cache import AnswerCache
+from realtime.coalescer import BurstCoalescer
+
+logger = logging.getLogger("auto_reply")
+
+THREADS_DB = "chat_threads.db"
+
+
+def shard_for(chat_jid: str, shards: int) -> int:
+    """Stable shard index for a chat JID (identical across processes and restarts)"""
+    return zlib.crc32(chat_jid.encode("utf-8")) % shards
+
+
+class ThreadStore:
+    """Persistent chat JID -> assistant thread ID map, safe across processes"""
+
+    def __init__(self, path: str = THREADS_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS chat_threads (chat_jid TEXT PRIMARY KEY, thread_id TEXT NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get_or_create(self, chat_jid: str, create: Callable[[], str]) -> str:
+        """
+        Return the thread of a chat, creating it on first contact
+
+        Args:
+            chat_jid: WhatsApp chat JID
+            create: Function creating a new assistant thread and returning its ID
+
+        Returns:
+            Assistant thread ID
+        """
+        conn = self._conn()
+        row = conn.execute("SELECT thread_id FROM chat_threads WHERE chat_jid = ?", (chat_jid,)).fetchone()
+        if row:
+            return row[0]
+        thread_id = create()
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO chat_threads (chat_jid, thread_id) VALUES (?, ?)", (chat_jid, thread_id))
+        return conn.execute("SELECT thread_id FROM chat_threads WHERE chat_jid = ?", (chat_jid,)).fetchone()[0]
+
+
+class ChatScheduler:
+    """Processes items strictly in order per chat while different chats run in parallel"""
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], None], max_concurrent_chats: int = 8):
+        """
+        Initialize the scheduler
+
+        Args:
+            handler: Function processing one queued item
+            max_concurrent_chats: Number of chats processed at the same time
+        """
+        self.handler = handler
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent_chats, thread_name_prefix="chat")
+        self._queues: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, chat_jid: str, item: Dict[str, Any]) -> None:
+        """Queue an item behind earlier items of the same chat"""
+        with self._lock:
+            chat_queue = self._queues.get(chat_jid)
+            if chat_queue is not None:
+                chat_queue.append(item)
+                return
+            self._queues[chat_jid] = deque([item])
+        self.executor.submit(self._drain, chat_jid)
+
+    def _drain(self, chat_jid: str) -> None:
+        """Process a chat's queue until it is empty"""
+        while True:
+            with self._lock:
+                chat_queue = self._queues[chat_jid]
+                if not chat_queue:
+                    del self._queues[chat_jid]
+                    return
+                item = chat_queue.popleft()
+            try:
+                self.handler(item)
+            except Exception:
+                logger.exception("Unhandled error processing chat %s", chat_jid)
+
+    def pending(self) -> int:
+        """Items waiting behind a chat that is being processed"""
+        with self._lock:
+            return sum(len(chat_queue) for chat_queue in self._queues.values())
+
+    def shutdown(self) -> None:
+        """Wait for all queued items to finish"""
+        self.executor.shutdown(wait=True)
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """Text sent to the assistant for one inbound WhatsApp message"""
+    content = (message.get("content") or "").strip()
+    media_type = message.get("media_type")
+    if media_type:
+        content = f"[{media_type}] {content}".strip()
+    return content
+
+
+class InFlightRun:
+    """Run currently answering a chat; cancelled if new input arrives before the reply"""
+
+    def __init__(self, thread_id: str):
+        self.thread_id = thread_id
+        self.run_id: Optional[str] = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+
+class ReplyWorker:
+    """Answers the chats of one shard (runs inside a worker process or in-process)"""
+
+    def __init__(self, shard: int, events, assistant_id: str,
+                 threads_db: str = THREADS_DB, max_concurrent_chats: int = 8,
+                 quiet_window: float = 2.0, max_wait: float = 8.0, answer_cache_ttl: float = 0):
+        from realtime import assistant_running
+
+        self.shard = shard
+        self.events = events
+        self.assistant_id = assistant_id
+        self.runner = assistant_running
+        try:
+            self.model = assistant_running.load_assistant_config()["model"]
+        except (OSError, ValueError, KeyError):
+            self.model = "assistant"
+        self.threads = ThreadStore(threads_db)
+        self.scheduler = ChatScheduler(self.reply, max_concurrent_chats)
+        self.coalescer = BurstCoalescer(self._flush_burst, quiet_window, max_wait)
+        self._in_flight: Dict[str, InFlightRun] = {}
+        self._in_flight_lock = threading.Lock()
+        # Shared by every chat of the shard: it only keeps answers that called no WhatsApp tool
+        self.answer_cache = (AnswerCache(ttl=answer_cache_ttl, config_path="assistant_config.json")
+                             if answer_cache_ttl > 0 else None)
+
+    def submit(self, item: Dict[str, Any]) -> None:
+        chat_jid = item["message"]["chat_jid"]
+        self._cancel_in_flight(chat_jid)
+        self.coalescer.add(chat_jid, item)
+
+    def _flush_burst(self, chat_jid: str, items) -> None:
+        """Queue a completed burst as one assistant turn"""
+        self.scheduler.submit(chat_jid, {
+            "chat_jid": chat_jid,
+            "messages": [item["message"] for item in items],
+            "enqueued_at": min(item["enqueued_at"] for item in items),
+        })
+
+    def _cancel_in_flight(self, chat_jid: str) -> None:
+        """Cancel the chat's running turn; its input stays on the thread for the next run"""
+        with self._in_flight_lock:
+            in_flight = self._in_flight.get(chat_jid)
+        if in_flight is None:
+            return
+        with in_flight.lock:
+            if in_flight.cancelled:
+                return
+            in_flight.cancelled = True
+            run_id = in_flight.run_id
+        if run_id:
+            try:
+                self.runner.openai_client.beta.threads.runs.cancel(thread_id=in_flight.thread_id, run_id=run_id)
+            except Exception as e:
+                logger.info("Could not cancel run %s: %s", run_id, e)
+
+    def _run_created(self, in_flight: InFlightRun, run_id: str) -> None:
+        with in_flight.lock:
+            in_flight.run_id = run_id
+            cancel = in_flight.cancelled
+        if cancel:
+            try:
+                self.runner.openai_client.beta.threads.runs.cancel(thread_id=in_flight.thread_id, run_id=run_id)
+            except Exception as e:
+                logger.info("Could not cancel run %s: %s", run_id, e)
+
+    def reply(self, item: Dict[str, Any]) -> None:
+        """Run the assistant on one burst of inbound messages and send its reply to the chat"""
+        chat_jid = item["chat_jid"]
+        started = time.time()
+        ok = False
+        cancelled = False
+        cached = False
+        in_flight = None
+        try:
+            client = self.runner.openai_client
+            thread_id = self.threads.get_or_create(chat_jid, lambda: client.beta.threads.create().id)
+            text = "\n".join(message_text(message) for message in item["messages"])
+
+            in_flight = InFlightRun(thread_id)
+            with self._in_flight_lock:
+                self._in_flight[chat_jid] = in_flight
+            result = self.runner.answer_question(
+                thread_id, self.assistant_id, text, self.answer_cache,
+                on_run_created=lambda run_id: self._run_created(in_flight, run_id),
+                model=self.model
+            )
+            cached = result.get("cached", False)
+
+            with in_flight.lock:
+                cancelled = in_flight.cancelled
+            if cancelled:
+                # Newer input arrived: the next run answers this burst too
+                logger.info("Dropped reply to %s: newer input arrived", chat_jid)
+            elif result["status"] == "completed":
+                self.runner.whatsapp_client.send_message(chat_jid, result["response"])
+                ok = True
+            else:
+                logger.warning("Run for %s failed: %s", chat_jid, result.get("error"))
+        except Exception:
+            if in_flight is not None and in_flight.cancelled:
+                cancelled = True
+            else:
+                logger.exception("Reply to %s failed", chat_jid)
+        finally:
+            with self._in_flight_lock:
+                if in_flight is not None and self._in_flight.get(chat_jid) is in_flight:
+                    del self._in_flight[chat_jid]
+            finished = time.time()
+            self.events.put({
+                "type": "done",
+                "shard": self.shard,
+                "ok": ok,
+                "cancelled": cancelled,
+                "cached": cached,
+                "messages": len(item["messages"]),
+                "queue_lag": started - item["enqueued_at"],
+                "processing": finished - started,
+                "end_to_end": finished - item["enqueued_at"],
+            })
+
+    def close(self) -> None:
+        self.coalescer.close()
+        self.scheduler.shutdown()
+
+
+def worker_main(shard: int, inbox, events, assistant_id: str, threads_db: str, max_concurrent_chats: int,
+                quiet_window: float, max_wait: float, answer_cache_ttl: float) -> None:
+    """Entry point of a worker process"""
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [shard {shard}] %(levelname)s %(message)s")
+    worker = ReplyWorker(shard, events, assistant_id, threads_db, max_concurrent_chats,
+                         quiet_window, max_wait, answer_cache_ttl)
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+        worker.submit(item)
+    worker.close()
+
+
+class EngineMetrics:
+    """Throughput and queue-lag metrics aggregated in the parent process"""
+
+    def __init__(self, window_seconds: float = 60):
+        self.started = time.time()
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.superseded = 0
+        self.runs = 0
+        self.cancelled_runs = 0
+        self.cached_replies = 0
+        self.per_shard: Dict[int, int] = {}
+        self.queue_lag = LatencyWindow(window_seconds=window_seconds)
+        self.processing = LatencyWindow(window_seconds=window_seconds)
+        self.end_to_end = LatencyWindow(window_seconds=window_seconds)
+        self._lock = threading.Lock()
+
+    def record_received(self, shard: int) -> None:
+        with self._lock:
+            self.received += 1
+            self.per_shard[shard] = self.per_shard.get(shard, 0) + 1
+
+    def record_done(self, event: Dict[str, Any]) -> None:
+        messages = event.get("messages", 1)
+        with self._lock:
+            if event.get("cached"):
+                self.cached_replies += 1
+            else:
+                self.runs += 1
+            if event.get("cancelled"):
+                # Answered by the run that superseded this one
+                self.cancelled_runs += 1
+                self.superseded += messages
+            elif event["ok"]:
+                self.processed += messages
+            else:
+                self.failed += messages
+            self.per_shard[event["shard"]] = self.per_shard.get(event["shard"], 0) - messages
+        self.queue_lag.add(event["queue_lag"])
+        self.processing.add(event["processing"])
+        self.end_to_end.add(event["end_to_end"])
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "received": self.received,
+                "processed": self.processed,
+                "failed": self.failed,
+                "superseded": self.superseded,
+                "in_flight": self.received - self.processed - self.failed - self.superseded,
+                "runs": self.runs,
+                "cancelled_runs": self.cancelled_runs,
+                "cached_replies": self.cached_replies,
+                "messages_per_run": round((self.processed + self.failed + self.superseded)
+                                          / (self.runs + self.cached_replies), 2)
+                if self.runs + self.cached_replies else 0.0,
+                "in_flight_per_shard": dict(self.per_shard),
+            }
+        counters["throughput_per_second"] = round(self.processing.rate(), 3)
+        for name, window in (("queue_lag", self.queue_lag), ("processing", self.processing),
+                             ("end_to_end", self.end_to_end)):
+            counters[name] = {key: round(value, 3) for key, value in window.summary().items()}
+        return counters
+
+
+def serve_metrics(metrics: EngineMetrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve metrics.snapshot() as JSON on /metrics in a background thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = json.dumps(metrics.snapshot()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class AutoReplyEngine:
+    """Polls inbound messages and dispatches them to sharded reply workers"""
+
+    def __init__(self, assistant_id: str, workers: int = 2, poll_interval: float = 2.0,
+                 max_concurrent_chats: int = 8, threads_db: str = THREADS_DB,
+                 quiet_window: float = 2.0, max_wait: float = 8.0, answer_cache_ttl: float = 0):
+        """
+        Initialize the engine
+
+        Args:
+            assistant_id: OpenAI assistant answering the chats
+            workers: Number of worker processes (0 runs a single in-process worker)
+            poll_interval: Seconds between check_new_messages calls
+            max_concurrent_chats: Chats processed in parallel per worker
+            threads_db: SQLite file mapping chat JIDs to assistant threads
+            quiet_window: Seconds of silence that close a burst of messages (0 disables coalescing)
+            max_wait: Maximum seconds a burst is held before it is answered
+            answer_cache_ttl: Seconds cached FAQ answers stay valid (0 disables the answer cache)
+        """
+        self.assistant_id = assistant_id
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_concurrent_chats = max_concurrent_chats
+        self.threads_db = threads_db
+        self.quiet_window = quiet_window
+        self.max_wait = max_wait
+        self.answer_cache_ttl = answer_cache_ttl
+        self.metrics = EngineMetrics()
+        self._inboxes = []
+        self._processes = []
+        self._local_worker: Optional[ReplyWorker] = None
+        self._events = None
+        self._collector: Optional[threading.Thread] = None
+        self._running = False
+
+    @property
+    def shards(self) -> int:
+        return max(self.workers, 1)
+
+    def start(self) -> None:
+        """Start the worker processes (or the in-process worker)"""
+        if self.workers == 0:
+            self._events = queue.Queue()
+            self._local_worker = ReplyWorker(0, self._events, self.assistant_id,
+                                             self.threads_db, self.max_concurrent_chats,
+                                             self.quiet_window, self.max_wait, self.answer_cache_ttl)
+        else:
+            self._events = multiprocessing.Queue()
+            for shard in range(self.workers):
+                inbox = multiprocessing.Queue()
+                process = multiprocessing.Process(
+                    target=worker_main,
+                    args=(shard, inbox, self._events, self.assistant_id, self.threads_db,
+                          self.max_concurrent_chats, self.quiet_window, self.max_wait, self.answer_cache_ttl),
+                    name=f"auto-reply-{shard}",
+                    daemon=True
+                )
+                process.start()
+                self._inboxes.append(inbox)
+                self._processes.append(process)
+        self._running = True
+        self._collector = threading.Thread(target=self._collect_events, daemon=True)
+        self._collector.start()
+
+    def dispatch(self, message: Dict[str, Any]) -> bool:
+        """
+        Route one inbound message to the worker owning its chat
+
+        Returns:
+            False if the message is ignored (sent by us, or without chat/content)
+        """
+        chat_jid = message.get("chat_jid")
+        if not chat_jid or message.get("is_from_me") or not message_text(message):
+            return False
+        shard = shard_for(chat_jid, self.shards)
+        item = {"message": message, "enqueued_at": time.time()}
+        self.metrics.record_received(shard)
+        if self._local_worker is not None:
+            self._local_worker.submit(item)
+        else:
+            self._inboxes[shard].put(item)
+        return True
+
+    def poll_once(self, whatsapp_client) -> int:
+        """Fetch new messages once and dispatch them; returns the number dispatched"""
+        messages = whatsapp_client.check_new_messages(mark_as_seen=True) or []
+        if isinstance(messages, dict):
+            messages = messages.get("messages", [])
+        return sum(1 for message in messages if isinstance(message, dict) and self.dispatch(message))
+
+    def run_forever(self, whatsapp_client, log_interval: float = 30.0) -> None:
+        """Poll and dispatch until interrupted, logging metrics every log_interval seconds"""
+        last_log = time.time()
+        while self._running:
+            try:
+                self.poll_once(whatsapp_client)
+            except Exception as e:
+                logger.warning("Polling failed: %s", e)
+            if time.time() - last_log >= log_interval:
+                logger.info("metrics %s", json.dumps(self.metrics.snapshot()))
+                last_log = time.time()
+            time.sleep(self.poll_interval)
+
+    def _collect_events(self) -> None:
+        while self._running or not self._events.empty():
+            try:
+                event = self._events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if event.get("type") == "done":
+                self.metrics.record_done(event)
+
+    def stop(self) -> None:
+        """Let the workers finish queued messages and stop them"""
+        if self._local_worker is not None:
+            self._local_worker.close()
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join()
+        self._running = False
+        if self._collector is not None:
+            self._collector.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WhatsApp auto-reply engine")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="Worker processes (0 = single in-process worker)")
+    parser.add_argument("--chats-per-worker", type=int, default=8, help="Chats processed in parallel per worker")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between new-message checks")
+    parser.add_argument("--threads-db", default=THREADS_DB, help="SQLite file mapping chats to assistant threads")
+    parser.add_argument("--quiet-window", type=float, default=2.0,
+                        help="Seconds of silence that close a burst of messages (0 = answer each message)")
+    parser.add_argument("--max-wait", type=float, default=8.0, help="Maximum seconds a burst is held")
+    parser.add_argument("--answer-cache", type=float, default=0, metavar="TTL",
+                        help="Answer repeated FAQ-style questions from a cache valid for TTL seconds (0 = off)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve JSON metrics on this port")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from realtime import assistant_running
+
+    assistant_id = assistant_running.load_assistant_config()["assistant_id"]
+    engine = AutoReplyEngine(assistant_id, args.workers, args.poll_interval,
+                             args.chats_per_worker, args.threads_db, args.quiet_window, args.max_wait,
+                             args.answer_cache)
+    if args.metrics_port:
+        serve_metrics(engine.metrics, args.metrics_port)
+    engine.start()
+    logger.info("Auto-reply engine started with %d worker(s)", args.workers)
+    try:
+        engine.run_forever(assistant_running.whatsapp_client)
+    except KeyboardInterrupt:
+        logger.info("Stopping, waiting for in-flight replies...")
+    finally:
+        engine.stop()
+        logger.info("final metrics %s", json.dumps(engine.metrics.snapshot()))
+
+
+if __name__ == "__main__":
+    main()
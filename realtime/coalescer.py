@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Burst coalescing for inbound WhatsApp messages.
+
+People often send one thought as several quick messages. BurstCoalescer
+buffers the messages of each chat and hands them over as a single batch once
+the chat has been quiet for `quiet_window` seconds, or at the latest
+`max_wait` seconds after the first buffered message, so the assistant runs
+once per burst instead of once per fragment.
+"""
+
+import threading
+import time
+from typing import Dict, Any, Callable, List
+
+
+class BurstCoalescer:
+    """Debounces items per key and flushes each burst as one batch"""
+
+    def __init__(self, on_flush: Callable[[str, List[Any]], None],
+                 quiet_window: float = 2.0, max_wait: float = 8.0):
+        """
+        Initialize the coalescer and start its timer thread
+
+        Args:
+            on_flush: Called with (key, items) for every completed burst
+            quiet_window: Seconds without new items after which a burst is flushed
+            max_wait: Maximum seconds between the first item of a burst and its flush
+        """
+        self.on_flush = on_flush
+        self.quiet_window = quiet_window
+        self.max_wait = max(max_wait, quiet_window)
+        self._buffers: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="coalescer", daemon=True)
+        self._thread.start()
+
+    def add(self, key: str, item: Any) -> None:
+        """Buffer an item for its key, extending the key's quiet window"""
+        now = time.monotonic()
+        with self._cond:
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                self._buffers[key] = {"items": [item], "first": now, "last": now}
+            else:
+                buffer["items"].append(item)
+                buffer["last"] = now
+            self._cond.notify()
+
+    def pending(self) -> int:
+        """Items buffered but not flushed yet"""
+        with self._cond:
+            return sum(len(buffer["items"]) for buffer in self._buffers.values())
+
+    def _due_at(self, buffer: Dict[str, Any]) -> float:
+        return min(buffer["last"] + self.quiet_window, buffer["first"] + self.max_wait)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = [key for key, buffer in self._buffers.items()
+                           if self._closed or self._due_at(buffer) <= now]
+                    if due:
+                        break
+                    if self._closed:
+                        return
+                    next_due = min((self._due_at(buffer) for buffer in self._buffers.values()), default=None)
+                    self._cond.wait(timeout=None if next_due is None else next_due - now)
+                batches = [(key, self._buffers.pop(key)["items"]) for key in due]
+            for key, items in batches:
+                self.on_flush(key, items)
+
+    def close(self) -> None:
+        """Flush everything that is still buffered and stop the timer thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
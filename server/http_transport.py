@@ -0,0 +1,154 @@
+"""Network transports for the WhatsApp MCP server.
+
+With stdio every client spawns (and pays for) its own server process. In
+network mode one long-running process serves many clients, so its caches and
+the WhatsApp store connection are shared:
+
+    python main.py --transport streamable-http --host 0.0.0.0 --port 8000 \\
+        --auth-token secret --max-sessions 32
+
+- streamable-http: MCP endpoint at /mcp (stateful sessions, or --stateless
+  for plain request/response JSON-RPC such as claude_chat_client sends)
+- sse: the older HTTP+SSE transport, stream at /sse and messages at /messages/
+
+Every route (including /metrics) requires `Authorization: Bearer <token>`
+when a token is configured. Past --max-sessions open sessions, new ones are
+refused with 503 and Retry-After until one closes; idle stateful sessions are
+closed after --session-idle-timeout seconds.
+"""
+
+import hmac
+import json
+import logging
+from typing import Any, List, Optional
+
+from mcp.server.transport_security import TransportSecuritySettings
+
+logger = logging.getLogger("whatsapp_mcp.http")
+
+TRANSPORTS = ("stdio", "streamable-http", "sse")
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+# Seconds a refused client is told to wait before opening a new session
+RETRY_AFTER_SECONDS = 1
+
+
+async def _json_error(send, status: int, message: str, headers: Optional[List[tuple]] = None) -> None:
+    body = json.dumps({"jsonrpc": "2.0", "id": None, "error": {"code": -32000, "message": message}}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        + (headers or []),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class BearerAuth:
+    """ASGI middleware requiring `Authorization: Bearer <token>` on every HTTP request"""
+
+    def __init__(self, app, token: str):
+        self.app = app
+        self.expected = f"Bearer {token}".encode("utf-8")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            provided = dict(scope["headers"]).get(b"authorization", b"")
+            if not hmac.compare_digest(provided, self.expected):
+                await _json_error(send, 401, "Unauthorized", [(b"www-authenticate", b"Bearer")])
+                return
+        await self.app(scope, receive, send)
+
+
+class SseSessionLimit:
+    """ASGI middleware capping concurrently open SSE streams (each one is a session)"""
+
+    def __init__(self, app, sse_path: str, max_sessions: int):
+        self.app = app
+        self.sse_path = sse_path
+        self.max_sessions = max_sessions
+        self.open = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] != self.sse_path:
+            await self.app(scope, receive, send)
+            return
+        if self.open >= self.max_sessions:
+            logger.warning("Refusing SSE session: %d sessions are already open", self.open)
+            await _json_error(send, 503, "Too many open sessions",
+                              [(b"retry-after", str(RETRY_AFTER_SECONDS).encode())])
+            return
+        self.open += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.open -= 1
+
+
+class RetryAfter:
+    """Adds Retry-After to the SDK's 503 "too many sessions" answers"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_retry_after(message):
+            if message["type"] == "http.response.start" and message["status"] == 503:
+                message = dict(message, headers=list(message.get("headers", []))
+                               + [(b"retry-after", str(RETRY_AFTER_SECONDS).encode())])
+            await send(message)
+
+        await self.app(scope, receive, send_with_retry_after)
+
+
+def configure(mcp, host: str, port: int, max_sessions: Optional[int], session_idle_timeout: Optional[float],
+              stateless: bool = False, json_response: bool = False,
+              allowed_hosts: Optional[List[str]] = None) -> None:
+    """Apply the network settings to a FastMCP server before its app is built"""
+    settings = mcp.settings
+    settings.host = host
+    settings.port = port
+    settings.max_sessions = max_sessions
+    settings.session_idle_timeout = session_idle_timeout
+    settings.stateless_http = stateless
+    settings.json_response = json_response
+    if allowed_hosts:
+        # DNS rebinding protection: only these Host headers (host:port, "*" port wildcard) are served
+        settings.transport_security = TransportSecuritySettings(
+            enable_dns_rebinding_protection=True, allowed_hosts=allowed_hosts, allowed_origins=[])
+    elif host not in LOOPBACK_HOSTS:
+        # FastMCP only allows localhost Host headers by default; behind a tunnel or on
+        # the LAN the Host varies, and the bearer token is what guards the server
+        settings.transport_security = TransportSecuritySettings(enable_dns_rebinding_protection=False)
+
+
+def build_app(mcp, transport: str, auth_token: Optional[str] = None, max_sessions: Optional[int] = None) -> Any:
+    """ASGI app for a network transport, wrapped with the session limit and auth"""
+    if transport == "streamable-http":
+        app = RetryAfter(mcp.streamable_http_app())
+    elif transport == "sse":
+        app = mcp.sse_app()
+        if max_sessions:
+            app = SseSessionLimit(app, mcp.settings.sse_path, max_sessions)
+    else:
+        raise ValueError(f"not a network transport: {transport}")
+    if auth_token:
+        app = BearerAuth(app, auth_token)
+    return app
+
+
+def serve(mcp, transport: str, auth_token: Optional[str] = None, max_sessions: Optional[int] = None) -> None:
+    """Run the server on mcp.settings.host/port until interrupted"""
+    import uvicorn
+
+    if not auth_token and mcp.settings.host not in LOOPBACK_HOSTS:
+        logger.warning("Serving on %s without an auth token", mcp.settings.host)
+    app = build_app(mcp, transport, auth_token, max_sessions)
+    path = mcp.settings.streamable_http_path if transport == "streamable-http" else mcp.settings.sse_path
+    logger.info("WhatsApp MCP server (%s) on http://%s:%d%s", transport, mcp.settings.host, mcp.settings.port, path)
+    uvicorn.run(app, host=mcp.settings.host, port=mcp.settings.port,
+                log_level=mcp.settings.log_level.lower(), lifespan="on")
@@ -1,35 +1,55 @@
+import argparse
+import os
 from typing import List, Dict, Any, Optional
 from mcp.server.fastmcp import FastMCP
-from whatsapp import (
-    search_contacts as whatsapp_search_contacts,
-    list_messages as whatsapp_list_messages,
-    list_chats as whatsapp_list_chats,
-    get_chat as whatsapp_get_chat,
-    get_direct_chat_by_contact as whatsapp_get_direct_chat_by_contact,
-    get_contact_chats as whatsapp_get_contact_chats,
-    get_last_interaction as whatsapp_get_last_interaction,
-    get_message_context as whatsapp_get_message_context,
-    send_message as whatsapp_send_message,
-    send_file as whatsapp_send_file,
-    send_audio_message as whatsapp_audio_voice_message,
-    download_media as whatsapp_download_media
-)
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from metrics import from_env, serve_prometheus
+from http_transport import TRANSPORTS, configure, serve
+from tool_pools import ToolPools
+
+# Each WhatsApp call runs in the executor of its tool class (read/send/media/audio)
+# with that class's concurrency limit and queue, so slow downloads or audio
+# conversions never block quick lookups; see tool_pools.py (MCP_TOOL_CLASSES).
+# Calls are abandoned once the deadline sent in _meta.timeout (or the class
+# budget) passes, or when the client sends notifications/cancelled.
+# The store/bridge module itself is only imported once a tool runs.
+tool_pools = ToolPools()
+whatsapp_search_contacts = tool_pools.whatsapp("search_contacts", "read")
+whatsapp_list_messages = tool_pools.whatsapp("list_messages", "read")
+whatsapp_list_chats = tool_pools.whatsapp("list_chats", "read")
+whatsapp_get_chat = tool_pools.whatsapp("get_chat", "read")
+whatsapp_get_direct_chat_by_contact = tool_pools.whatsapp("get_direct_chat_by_contact", "read")
+whatsapp_get_contact_chats = tool_pools.whatsapp("get_contact_chats", "read")
+whatsapp_get_last_interaction = tool_pools.whatsapp("get_last_interaction", "read")
+whatsapp_get_message_context = tool_pools.whatsapp("get_message_context", "read")
+whatsapp_send_message = tool_pools.whatsapp("send_message", "send")
+whatsapp_send_file = tool_pools.whatsapp("send_file", "send")
+whatsapp_audio_voice_message = tool_pools.whatsapp("send_audio_message", "audio")
+whatsapp_download_media = tool_pools.whatsapp("download_media", "media")
 
 # Initialize FastMCP server
 mcp = FastMCP("whatsapp")
+tool_pools.install(mcp)
+
+# Per-tool call counts, latency, result sizes and optional trace spans
+# (MCP_TRACING=1 / MCP_TRACE_LOG=path); see metrics.py
+tool_metrics = from_env()
 
 @mcp.tool()
-def search_contacts(query: str) -> List[Dict[str, Any]]:
+@tool_metrics.instrument
+async def search_contacts(query: str) -> List[Dict[str, Any]]:
     """Search WhatsApp contacts by name or phone number.
     
     Args:
         query: Search term to match against contact names or phone numbers
     """
-    contacts = whatsapp_search_contacts(query)
+    contacts = await whatsapp_search_contacts(query)
     return contacts
 
 @mcp.tool()
-def list_messages(
+@tool_metrics.instrument
+async def list_messages(
     after: Optional[str] = None,
     before: Optional[str] = None,
     sender_phone_number: Optional[str] = None,
@@ -55,7 +75,7 @@ def list_messages(
         context_before: Number of messages to include before each match (default 1)
         context_after: Number of messages to include after each match (default 1)
     """
-    messages = whatsapp_list_messages(
+    messages = await whatsapp_list_messages(
         after=after,
         before=before,
         sender_phone_number=sender_phone_number,
@@ -70,7 +90,8 @@ def list_messages(
     return messages
 
 @mcp.tool()
-def list_chats(
+@tool_metrics.instrument
+async def list_chats(
     query: Optional[str] = None,
     limit: int = 20,
     page: int = 0,
@@ -86,7 +107,7 @@ def list_chats(
         include_last_message: Whether to include the last message in each chat (default True)
         sort_by: Field to sort results by, either "last_active" or "name" (default "last_active")
     """
-    chats = whatsapp_list_chats(
+    chats = await whatsapp_list_chats(
         query=query,
         limit=limit,
         page=page,
@@ -96,28 +117,31 @@ def list_chats(
     return chats
 
 @mcp.tool()
-def get_chat(chat_jid: str, include_last_message: bool = True) -> Dict[str, Any]:
+@tool_metrics.instrument
+async def get_chat(chat_jid: str, include_last_message: bool = True) -> Dict[str, Any]:
     """Get WhatsApp chat metadata by JID.
     
     Args:
         chat_jid: The JID of the chat to retrieve
         include_last_message: Whether to include the last message (default True)
     """
-    chat = whatsapp_get_chat(chat_jid, include_last_message)
+    chat = await whatsapp_get_chat(chat_jid, include_last_message)
     return chat
 
 @mcp.tool()
-def get_direct_chat_by_contact(sender_phone_number: str) -> Dict[str, Any]:
+@tool_metrics.instrument
+async def get_direct_chat_by_contact(sender_phone_number: str) -> Dict[str, Any]:
     """Get WhatsApp chat metadata by sender phone number.
     
     Args:
         sender_phone_number: The phone number to search for
     """
-    chat = whatsapp_get_direct_chat_by_contact(sender_phone_number)
+    chat = await whatsapp_get_direct_chat_by_contact(sender_phone_number)
     return chat
 
 @mcp.tool()
-def get_contact_chats(jid: str, limit: int = 20, page: int = 0) -> List[Dict[str, Any]]:
+@tool_metrics.instrument
+async def get_contact_chats(jid: str, limit: int = 20, page: int = 0) -> List[Dict[str, Any]]:
     """Get all WhatsApp chats involving the contact.
     
     Args:
@@ -125,21 +149,23 @@ def get_contact_chats(jid: str, limit: int = 20, page: int = 0) -> List[Dict[str
         limit: Maximum number of chats to return (default 20)
         page: Page number for pagination (default 0)
     """
-    chats = whatsapp_get_contact_chats(jid, limit, page)
+    chats = await whatsapp_get_contact_chats(jid, limit, page)
     return chats
 
 @mcp.tool()
-def get_last_interaction(jid: str) -> str:
+@tool_metrics.instrument
+async def get_last_interaction(jid: str) -> str:
     """Get most recent WhatsApp message involving the contact.
     
     Args:
         jid: The JID of the contact to search for
     """
-    message = whatsapp_get_last_interaction(jid)
+    message = await whatsapp_get_last_interaction(jid)
     return message
 
 @mcp.tool()
-def get_message_context(
+@tool_metrics.instrument
+async def get_message_context(
     message_id: str,
     before: int = 5,
     after: int = 5
@@ -151,11 +177,12 @@ def get_message_context(
         before: Number of messages to include before the target message (default 5)
         after: Number of messages to include after the target message (default 5)
     """
-    context = whatsapp_get_message_context(message_id, before, after)
+    context = await whatsapp_get_message_context(message_id, before, after)
     return context
 
 @mcp.tool()
-def send_message(
+@tool_metrics.instrument
+async def send_message(
     recipient: str,
     message: str
 ) -> Dict[str, Any]:
@@ -177,14 +204,15 @@ def send_message(
         }
     
     # Call the whatsapp_send_message function with the unified recipient parameter
-    success, status_message = whatsapp_send_message(recipient, message)
+    success, status_message = await whatsapp_send_message(recipient, message)
     return {
         "success": success,
         "message": status_message
     }
 
 @mcp.tool()
-def send_file(recipient: str, media_path: str) -> Dict[str, Any]:
+@tool_metrics.instrument
+async def send_file(recipient: str, media_path: str) -> Dict[str, Any]:
     """Send a file such as a picture, raw audio, video or document via WhatsApp to the specified recipient. For group messages use the JID.
     
     Args:
@@ -197,14 +225,15 @@ def send_file(recipient: str, media_path: str) -> Dict[str, Any]:
     """
     
     # Call the whatsapp_send_file function
-    success, status_message = whatsapp_send_file(recipient, media_path)
+    success, status_message = await whatsapp_send_file(recipient, media_path)
     return {
         "success": success,
         "message": status_message
     }
 
 @mcp.tool()
-def send_audio_message(recipient: str, media_path: str) -> Dict[str, Any]:
+@tool_metrics.instrument
+async def send_audio_message(recipient: str, media_path: str) -> Dict[str, Any]:
     """Send any audio file as a WhatsApp audio message to the specified recipient. For group messages use the JID. If it errors due to ffmpeg not being installed, use send_file instead.
     
     Args:
@@ -215,14 +244,15 @@ def send_audio_message(recipient: str, media_path: str) -> Dict[str, Any]:
     Returns:
         A dictionary containing success status and a status message
     """
-    success, status_message = whatsapp_audio_voice_message(recipient, media_path)
+    success, status_message = await whatsapp_audio_voice_message(recipient, media_path)
     return {
         "success": success,
         "message": status_message
     }
 
 @mcp.tool()
-def download_media(message_id: str, chat_jid: str) -> Dict[str, Any]:
+@tool_metrics.instrument
+async def download_media(message_id: str, chat_jid: str) -> Dict[str, Any]:
     """Download media from a WhatsApp message and get the local file path.
     
     Args:
@@ -232,7 +262,7 @@ def download_media(message_id: str, chat_jid: str) -> Dict[str, Any]:
     Returns:
         A dictionary containing success status, a status message, and the file path if successful
     """
-    file_path = whatsapp_download_media(message_id, chat_jid)
+    file_path = await whatsapp_download_media(message_id, chat_jid)
     
     if file_path:
         return {
@@ -246,6 +276,58 @@ def download_media(message_id: str, chat_jid: str) -> Dict[str, Any]:
             "message": "Failed to download media"
         }
 
+@mcp.tool()
+def server_stats(include_spans: bool = False) -> Dict[str, Any]:
+    """Get this server's per-tool call counts, errors, latency and result sizes.
+    
+    Args:
+        include_spans: Whether to include the most recent trace spans (default False)
+    
+    Returns:
+        A dictionary with the server uptime, a summary for every tool called so far
+        and the load of each tool class
+    """
+    return dict(tool_metrics.snapshot(include_spans), tool_classes=tool_pools.snapshot())
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """Prometheus scrape endpoint (HTTP transports)."""
+    return PlainTextResponse(tool_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+def parse_args() -> argparse.Namespace:
+    """Transport options; each flag defaults to its MCP_* environment variable"""
+    parser = argparse.ArgumentParser(description="WhatsApp MCP server")
+    parser.add_argument("--transport", choices=TRANSPORTS, default=os.getenv("MCP_TRANSPORT", "stdio"))
+    parser.add_argument("--host", default=os.getenv("MCP_HOST", "127.0.0.1"), help="Bind address")
+    parser.add_argument("--port", type=int, default=int(os.getenv("MCP_PORT", "8000")))
+    parser.add_argument("--auth-token", default=os.getenv("MCP_AUTH_TOKEN"),
+                        help="Required as 'Authorization: Bearer <token>' (network transports)")
+    parser.add_argument("--max-sessions", type=int, default=int(os.getenv("MCP_MAX_SESSIONS", "64")),
+                        help="Concurrent client sessions before new ones get 503 (0 = unlimited)")
+    parser.add_argument("--session-idle-timeout", type=float,
+                        default=float(os.getenv("MCP_SESSION_IDLE_TIMEOUT", "1800")),
+                        help="Seconds before an idle streamable-http session is closed (0 = never)")
+    parser.add_argument("--stateless", action="store_true", default=os.getenv("MCP_STATELESS") == "1",
+                        help="streamable-http without sessions: every POST is a complete JSON-RPC exchange")
+    parser.add_argument("--json-response", action="store_true", default=os.getenv("MCP_JSON_RESPONSE") == "1",
+                        help="streamable-http answers with JSON bodies instead of SSE streams")
+    parser.add_argument("--allowed-hosts", default=os.getenv("MCP_ALLOWED_HOSTS"),
+                        help="Comma-separated Host headers to accept (DNS rebinding protection)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    # Initialize and run the server
-    mcp.run(transport='stdio')
\ No newline at end of file
+    args = parse_args()
+
+    if args.transport == "stdio":
+        # With stdio there is no HTTP server: expose /metrics on its own port if asked
+        if os.getenv("MCP_METRICS_PORT"):
+            serve_prometheus(tool_metrics, int(os.getenv("MCP_METRICS_PORT")), os.getenv("MCP_METRICS_HOST", "127.0.0.1"))
+
+        # Initialize and run the server
+        mcp.run(transport='stdio')
+    else:
+        # One shared server for many clients; /metrics is served on the same port
+        configure(mcp, args.host, args.port, args.max_sessions or None, args.session_idle_timeout or None,
+                  stateless=args.stateless, json_response=args.json_response,
+                  allowed_hosts=args.allowed_hosts.split(",") if args.allowed_hosts else None)
+        serve(mcp, args.transport, args.auth_token, args.max_sessions or None)
\ No newline at end of file
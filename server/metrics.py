@@ -0,0 +1,305 @@
+"""Per-tool metrics and trace spans for the WhatsApp MCP server.
+
+Every tool wrapped with `instrument` records call and error counts (calls
+aborted by a deadline or notifications/cancelled are counted as "cancelled"
+and kept out of the latency histogram), a latency histogram, result sizes (items and JSON bytes) and an in-flight gauge. The
+numbers are served in Prometheus text format (`render_prometheus`) and as a
+plain summary (`snapshot`) for the server_stats tool.
+
+Tracing is optional (MCP_TRACING=1, or MCP_TRACE_LOG=path to also append the
+spans as JSONL). A span joins the client's trace when the tools/call request
+carries `_meta.traceparent` (W3C format) or `_meta.trace_id`.
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    from mcp.server.lowlevel.server import request_ctx
+except ImportError:  # older SDKs: spans are still recorded, without the client's ids
+    request_ctx = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+ITEMS_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 500, 1000)
+
+PREFIX = "whatsapp_mcp"
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (capped at the last bound)"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+class ToolMetrics:
+    """Counters for one tool"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = {"exception": 0, "failed": 0, "cancelled": 0}
+        self.in_flight = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.result_bytes = Histogram(BYTES_BUCKETS)
+        self.result_items = Histogram(ITEMS_BUCKETS)
+
+
+def result_items(result: Any) -> int:
+    """Rows in a tool result: list length, 1 for a single object, 0 for nothing"""
+    if result is None:
+        return 0
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    return 1
+
+
+def _failed(result: Any) -> bool:
+    # Tools report handled failures as {"success": False, "message": ...}
+    return isinstance(result, dict) and result.get("success") is False
+
+
+def _trace_ids() -> Tuple[Optional[str], Optional[str], Optional[Any]]:
+    """(trace id, parent span id, JSON-RPC request id) of the request being served"""
+    if request_ctx is None:
+        return None, None, None
+    try:
+        context = request_ctx.get()
+    except LookupError:
+        return None, None, None
+    meta = context.meta.model_dump() if context.meta is not None else {}
+    traceparent = meta.get("traceparent")
+    if isinstance(traceparent, str) and traceparent.count("-") == 3:
+        _, trace_id, parent_id, _ = traceparent.split("-")
+        return trace_id, parent_id, context.request_id
+    return meta.get("trace_id"), meta.get("span_id"), context.request_id
+
+
+class Registry:
+    """Metrics for all tools of one server process"""
+
+    def __init__(self, tracing: bool = False, trace_log: Optional[str] = None, max_spans: int = 200):
+        self.tools: Dict[str, ToolMetrics] = {}
+        self.started = time.time()
+        self.tracing = tracing or bool(trace_log)
+        self.trace_log = trace_log
+        self.spans: deque = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def _tool(self, name: str) -> ToolMetrics:
+        if name not in self.tools:
+            self.tools[name] = ToolMetrics()
+        return self.tools[name]
+
+    def _begin(self, name: str) -> float:
+        with self._lock:
+            tool = self._tool(name)
+            tool.calls += 1
+            tool.in_flight += 1
+        return time.perf_counter()
+
+    def _end(self, name: str, start: float, result: Any, error: Optional[BaseException]) -> None:
+        duration = time.perf_counter() - start
+        size = None
+        if error is None:
+            try:
+                size = len(json.dumps(result, default=str).encode("utf-8"))
+            except (TypeError, ValueError):
+                pass
+        cancelled = isinstance(error, asyncio.CancelledError)
+        with self._lock:
+            tool = self._tool(name)
+            tool.in_flight -= 1
+            if cancelled:
+                # Aborted calls say nothing about how long the tool takes
+                tool.errors["cancelled"] += 1
+            elif error is not None:
+                tool.latency.observe(duration)
+                tool.errors["exception"] += 1
+            else:
+                tool.latency.observe(duration)
+                if _failed(result):
+                    tool.errors["failed"] += 1
+                tool.result_items.observe(result_items(result))
+                if size is not None:
+                    tool.result_bytes.observe(size)
+        if self.tracing:
+            self._span(name, duration, size, error)
+
+    def _span(self, name: str, duration: float, size: Optional[int], error: Optional[BaseException]) -> None:
+        trace_id, parent_id, request_id = _trace_ids()
+        status = "ok" if error is None else "cancelled" if isinstance(error, asyncio.CancelledError) else "error"
+        span = {
+            "trace_id": trace_id or uuid.uuid4().hex,
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": parent_id,
+            "request_id": request_id,
+            "name": f"tools/call {name}",
+            "start": round(time.time() - duration, 6),
+            "duration_ms": round(duration * 1000, 3),
+            "result_bytes": size,
+            "status": status,
+        }
+        if error is not None:
+            span["error"] = f"{type(error).__name__}: {error}"
+        with self._lock:
+            self.spans.append(span)
+            if self.trace_log:
+                with open(self.trace_log, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span, default=str) + "\n")
+
+    def instrument(self, fn: Callable) -> Callable:
+        """Wrap a tool function (sync or async) so every call is measured"""
+        name = fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start, result, error = self._begin(name), None, None
+                try:
+                    result = await fn(*args, **kwargs)
+                    return result
+                except BaseException as e:  # CancelledError too: deadline or notifications/cancelled
+                    error = e
+                    raise
+                finally:
+                    self._end(name, start, result, error)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start, result, error = self._begin(name), None, None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._end(name, start, result, error)
+        return wrapper
+
+    def snapshot(self, include_spans: bool = False) -> Dict[str, Any]:
+        """Per-tool summary (latency quantiles are histogram bucket bounds)"""
+        with self._lock:
+            tools = {}
+            for name, tool in sorted(self.tools.items()):
+                latency = tool.latency
+                tools[name] = {
+                    "calls": tool.calls,
+                    "errors": dict(tool.errors),
+                    "in_flight": tool.in_flight,
+                    "latency_mean_ms": round(latency.sum / latency.count * 1000, 3) if latency.count else 0.0,
+                    "latency_p50_ms": latency.quantile(0.5) * 1000,
+                    "latency_p99_ms": latency.quantile(0.99) * 1000,
+                    "result_bytes_total": int(tool.result_bytes.sum),
+                    "result_items_mean": round(tool.result_items.sum / tool.result_items.count, 2)
+                    if tool.result_items.count else 0.0,
+                }
+            snapshot = {"uptime_seconds": round(time.time() - self.started, 1), "tools": tools}
+            if include_spans:
+                snapshot["spans"] = list(self.spans)
+        return snapshot
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {PREFIX}_uptime_seconds Seconds since the server started",
+            f"# TYPE {PREFIX}_uptime_seconds gauge",
+            f"{PREFIX}_uptime_seconds {time.time() - self.started:.3f}",
+        ]
+
+        def header(metric: str, kind: str, text: str) -> None:
+            lines.append(f"# HELP {PREFIX}_{metric} {text}")
+            lines.append(f"# TYPE {PREFIX}_{metric} {kind}")
+
+        def histogram(metric: str, tool: str, values: Histogram) -> None:
+            cumulative = 0
+            for bound, count in zip(values.buckets + ("+Inf",), values.counts):
+                cumulative += count
+                lines.append(f'{PREFIX}_{metric}_bucket{{tool="{tool}",le="{bound}"}} {cumulative}')
+            lines.append(f'{PREFIX}_{metric}_sum{{tool="{tool}"}} {values.sum}')
+            lines.append(f'{PREFIX}_{metric}_count{{tool="{tool}"}} {values.count}')
+
+        with self._lock:
+            tools = sorted(self.tools.items())
+            header("tool_calls_total", "counter", "Tool calls started")
+            lines += [f'{PREFIX}_tool_calls_total{{tool="{name}"}} {tool.calls}' for name, tool in tools]
+            header("tool_errors_total", "counter", "Tool calls that raised (exception), returned success=false (failed) or were cancelled")
+            for name, tool in tools:
+                lines += [f'{PREFIX}_tool_errors_total{{tool="{name}",kind="{kind}"}} {count}'
+                          for kind, count in tool.errors.items()]
+            header("tool_in_flight", "gauge", "Tool calls currently running")
+            lines += [f'{PREFIX}_tool_in_flight{{tool="{name}"}} {tool.in_flight}' for name, tool in tools]
+            header("tool_duration_seconds", "histogram", "Tool call latency")
+            for name, tool in tools:
+                histogram("tool_duration_seconds", name, tool.latency)
+            header("tool_result_bytes", "histogram", "Size of tool results as JSON")
+            for name, tool in tools:
+                histogram("tool_result_bytes", name, tool.result_bytes)
+            header("tool_result_items", "histogram", "Rows in tool results")
+            for name, tool in tools:
+                histogram("tool_result_items", name, tool.result_items)
+        return "\n".join(lines) + "\n"
+
+
+def serve_prometheus(registry: Registry, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve GET /metrics on its own port (for the stdio transport) in a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def from_env() -> Registry:
+    """Registry configured by MCP_TRACING / MCP_TRACE_LOG"""
+    return Registry(tracing=os.getenv("MCP_TRACING") == "1", trace_log=os.getenv("MCP_TRACE_LOG"))
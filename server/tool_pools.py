@@ -0,0 +1,279 @@
+"""Non-blocking tool execution with per-class concurrency limits.
+
+FastMCP runs synchronous tools on the event loop, so one slow download or
+audio conversion stalls every other request of the server. Instead, each
+WhatsApp call runs in the executor of its tool class:
+
+    read   search/list/get tools            threads,   8 at a time, 64 queued
+    send   send_message, send_file          threads,   4 at a time, 32 queued
+    media  download_media                   threads,   2 at a time,  8 queued
+    audio  send_audio_message (ffmpeg)      processes, 2 at a time,  4 queued
+
+A class runs at most `concurrency` calls; further calls wait in its queue.
+When the queue is full the tools/call request is rejected before any work
+is done with JSON-RPC error BUSY_ERROR_CODE and data {"retryable": true,
+"retry_after": seconds, "tool_class": ...}, so callers can safely retry even
+non-idempotent tools like send_message.
+
+Every call also has a deadline: the `_meta.timeout` seconds the client sent
+with the request (see deadlines.py in the repository root), capped by the
+class `budget`. Past it, or when the client sends notifications/cancelled,
+the call is abandoned: a call still queued never runs, and one already in its
+executor has its result discarded and keeps counting against the class
+("abandoned") until it returns. An expired call is answered with JSON-RPC
+error DEADLINE_ERROR_CODE, which is not retryable (the tool may have acted).
+
+Override per class with MCP_TOOL_CLASSES, e.g.
+    MCP_TOOL_CLASSES='{"media": {"concurrency": 4, "queue": 16, "budget": 300}, "audio": {"executor": "thread"}}'
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import anyio
+from mcp import types
+from mcp.shared.exceptions import McpError
+
+# JSON-RPC error for "tool class saturated, retry later" (implementation-defined server error range)
+BUSY_ERROR_CODE = -32001
+# JSON-RPC error for "the call's deadline passed before it completed"
+DEADLINE_ERROR_CODE = -32002
+
+# Key of params._meta with the seconds the client allows the call (deadlines.TIMEOUT_META_KEY)
+TIMEOUT_META_KEY = "timeout"
+
+# budget: seconds a call may take when the client sends no (or a longer) deadline
+DEFAULT_CLASSES: Dict[str, Dict[str, Any]] = {
+    "read": {"executor": "thread", "concurrency": 8, "queue": 64, "budget": 30},
+    "send": {"executor": "thread", "concurrency": 4, "queue": 32, "budget": 60},
+    "media": {"executor": "thread", "concurrency": 2, "queue": 8, "budget": 300},
+    "audio": {"executor": "process", "concurrency": 2, "queue": 4, "budget": 300},
+}
+
+# Smoothing of the per-class call duration used for retry_after
+DURATION_EWMA = 0.2
+# Call duration assumed for retry_after until a class has completed a call
+DEFAULT_CALL_SECONDS = 0.5
+
+
+class ToolBusy(McpError):
+    """The tool's class is at its concurrency limit and its queue is full"""
+
+    def __init__(self, tool: str, tool_class: str, retry_after: float):
+        super().__init__(types.ErrorData(
+            code=BUSY_ERROR_CODE,
+            message=f"Server busy: {tool_class} tools are at capacity, retry {tool} in {retry_after:g}s",
+            data={"retryable": True, "retry_after": retry_after, "tool_class": tool_class, "tool": tool},
+        ))
+
+
+class DeadlineExceeded(McpError):
+    """The call's deadline passed before it completed; its work was abandoned"""
+
+    def __init__(self, tool: str, timeout: float):
+        super().__init__(types.ErrorData(
+            code=DEADLINE_ERROR_CODE,
+            message=f"Deadline exceeded: {tool} did not complete within {timeout:g}s",
+            data={"retryable": False, "tool": tool, "timeout": timeout},
+        ))
+
+
+class WhatsAppCall:
+    """whatsapp.<name> as a picklable callable, importing the module where it runs (incl. pool processes)"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        import whatsapp
+        return getattr(whatsapp, self.name)(*args, **kwargs)
+
+
+class ToolClass:
+    """Executor, concurrency limit and bounded queue shared by a group of tools"""
+
+    def __init__(self, name: str, executor: str = "thread", concurrency: int = 4, queue: int = 16,
+                 budget: Optional[float] = None):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"{name}: executor must be 'thread' or 'process'")
+        self.name = name
+        self.executor_kind = executor
+        self.concurrency = concurrency
+        self.max_queue = queue
+        self.budget = budget
+        self.running = 0
+        self.queued = 0
+        self.abandoned = 0
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.mean_seconds = 0.0
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.executor_kind == "process":
+                    # spawn: forking a process that runs the event loop's threads is unsafe
+                    self._executor = ProcessPoolExecutor(self.concurrency, multiprocessing.get_context("spawn"))
+                else:
+                    self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix=f"tool-{self.name}")
+            return self._executor
+
+    def retry_after(self) -> float:
+        """Rough seconds until a queue slot frees up"""
+        mean = self.mean_seconds if self.completed else DEFAULT_CALL_SECONDS
+        return round(max(mean, 0.05) * (self.queued + 1) / self.concurrency, 3)
+
+    def admit(self, tool: str) -> None:
+        """Reserve a place (running or queued), or raise ToolBusy"""
+        if self.running + self.queued + self.abandoned >= self.concurrency + self.max_queue:
+            self.rejected += 1
+            raise ToolBusy(tool, self.name, self.retry_after())
+        self.queued += 1
+
+    async def run(self, tool: str, handler, *args) -> Any:
+        """Run an async handler (the whole tools/call request) within the class limits"""
+        self.admit(tool)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        start = time.perf_counter()
+        try:
+            result = await handler(*args)
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+        # Abandoned calls (cancelled above) don't count: their duration is unknown
+        elapsed = time.perf_counter() - start
+        self.mean_seconds += (DURATION_EWMA if self.completed else 1.0) * (elapsed - self.mean_seconds)
+        self.completed += 1
+        return result
+
+    async def execute(self, fn, *args, **kwargs) -> Any:
+        """Run a blocking call in this class's executor without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(fn, *args, **kwargs)
+        try:
+            return await asyncio.wrap_future(future, loop=loop)
+        except asyncio.CancelledError:
+            # Deadline or client cancellation: work that hasn't started is dropped; a running
+            # call can't be interrupted, so it occupies the class until it returns
+            if not future.cancel():
+                self.abandoned += 1
+                future.add_done_callback(lambda _: self._release_abandoned(loop))
+            raise
+
+    def _release_abandoned(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.call_soon_threadsafe(self._abandoned_done)
+        except RuntimeError:  # loop closed at shutdown
+            pass
+
+    def _abandoned_done(self) -> None:
+        self.abandoned -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "executor": self.executor_kind,
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.queued,
+            "abandoned": self.abandoned,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "budget": self.budget,
+            "mean_seconds": round(self.mean_seconds, 4),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def load_classes() -> Dict[str, Dict[str, Any]]:
+    """DEFAULT_CLASSES merged with the MCP_TOOL_CLASSES environment variable"""
+    classes = {name: dict(config) for name, config in DEFAULT_CLASSES.items()}
+    overrides = os.getenv("MCP_TOOL_CLASSES")
+    if overrides:
+        for name, config in json.loads(overrides).items():
+            classes.setdefault(name, {}).update(config)
+    return classes
+
+
+def call_timeout(request: types.CallToolRequest, budget: Optional[float]) -> Optional[float]:
+    """Seconds a tools/call may take: its _meta.timeout capped by `budget` (None: unbounded)"""
+    meta = request.params.meta.model_dump() if request.params.meta is not None else {}
+    requested = meta.get(TIMEOUT_META_KEY)
+    if not isinstance(requested, (int, float)) or isinstance(requested, bool):
+        return budget
+    return requested if budget is None else min(float(requested), budget)
+
+
+class ToolPools:
+    """Tool classes of one server and the tool -> class assignment"""
+
+    def __init__(self, classes: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.classes = {name: ToolClass(name, **config) for name, config in (classes or load_classes()).items()}
+        self.tool_classes: Dict[str, ToolClass] = {}
+
+    def whatsapp(self, name: str, tool_class: str, tool: Optional[str] = None):
+        """
+        Async stand-in for whatsapp.<name> that runs in the executor of `tool_class`
+
+        Args:
+            name: Function of the whatsapp module
+            tool_class: Class whose executor and limits apply
+            tool: MCP tool the call belongs to (defaults to `name`)
+        """
+        pool = self.classes[tool_class]
+        self.tool_classes[tool or name] = pool
+        call = WhatsAppCall(name)
+
+        async def run(*args, **kwargs):
+            return await pool.execute(call, *args, **kwargs)
+        run.__name__ = name
+        return run
+
+    def install(self, mcp) -> None:
+        """Apply the class limits to tools/call requests of a FastMCP server"""
+        handlers = mcp._mcp_server.request_handlers
+        call_tool = handlers[types.CallToolRequest]
+
+        async def limited_call_tool(request: types.CallToolRequest):
+            tool = request.params.name
+            pool = self.tool_classes.get(tool)
+            timeout = call_timeout(request, pool.budget if pool else None)
+            if timeout is None:
+                return await call_tool(request) if pool is None else await pool.run(tool, call_tool, request)
+            if timeout > 0:
+                with anyio.move_on_after(timeout):
+                    return await call_tool(request) if pool is None else await pool.run(tool, call_tool, request)
+            if pool is not None:
+                pool.expired += 1
+            raise DeadlineExceeded(tool, timeout)
+
+        handlers[types.CallToolRequest] = limited_call_tool
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-class limits and current load"""
+        return {name: pool.snapshot() for name, pool in self.classes.items()}
+
+    def shutdown(self) -> None:
+        for pool in self.classes.values():
+            pool.shutdown()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Compact, size-bounded encoding of WhatsApp tool results for LLM consumption.
+
+Tool results are usually lists of messages, chats or contacts that repeat the
+same keys on every item. Instead of feeding raw JSON (or Python reprs) back to
+the model, results are rendered as:
+
+- Tables: one header line with the column names and one `|`-separated line
+  per item. Columns whose value is the same on every row are hoisted above
+  the table.
+- Null and empty fields are dropped (False is kept and shown as "n").
+- Output is limited to a per-result token budget. Rows that do not fit are
+  kept in a ResultStore and can be fetched later with the fetch_more_result
+  tool and the handle quoted in the truncation marker; rows are cut to the
+  budget before the marker is added, so the marker itself is never cut off.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from conversation_memory import estimate_tokens
+
+DEFAULT_MAX_TOKENS = 1500
+MAX_CELL_CHARS = 300
+# Tokens reserved for a truncation marker
+MARKER_TOKENS = 40
+TRUNCATION_PREFIX = "… [truncated"
+
+# Tool definition (Messages API format) for paging through truncated results
+FETCH_MORE_TOOL = {
+    "name": "fetch_more_result",
+    "description": "Fetch more rows of a previous tool result that was truncated. "
+                   "Use the handle and offset given in the truncation marker.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "handle": {"type": "string", "description": "Handle from the truncation marker"},
+            "offset": {"type": "integer", "description": "Index of the first row to return"}
+        },
+        "required": ["handle", "offset"]
+    }
+}
+
+
+def _is_empty(value: Any) -> bool:
+    """Null/empty values that carry no information for the model (False does: is_from_me=False)"""
+    return value is None or (isinstance(value, (str, list, dict)) and not value)
+
+
+def _flatten(item: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """Flatten one level of nested dicts into dotted keys, dropping empty values"""
+    flat = {}
+    for key, value in item.items():
+        if _is_empty(value):
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and not prefix:
+            flat.update(_flatten(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def _cell(value: Any) -> str:
+    """Render a single value on one line"""
+    if value is True:
+        text = "y"
+    elif value is False:
+        text = "n"
+    elif isinstance(value, (dict, list)):
+        text = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = str(value)
+    text = text.replace("\\", "\\\\").replace("|", "\\|").replace("\r", "").replace("\n", "\\n")
+    if len(text) > MAX_CELL_CHARS:
+        text = text[:MAX_CELL_CHARS] + "…"
+    return text
+
+
+def _is_table(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(item, dict) for item in value)
+
+
+def _table_lines(rows: List[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+    """
+    Build the header and row lines of a table
+
+    Returns:
+        (header lines, one line per row)
+    """
+    flat_rows = [_flatten(row) for row in rows]
+    columns: List[str] = []
+    for row in flat_rows:
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+
+    header = []
+    if len(flat_rows) > 1:
+        # Hoist columns that have the same value on every row
+        constant = [
+            key for key in columns
+            if all(key in row for row in flat_rows)
+            and len({_cell(row[key]) for row in flat_rows}) == 1
+        ]
+        for key in constant:
+            header.append(f"{key}={_cell(flat_rows[0][key])} (all rows)")
+        columns = [key for key in columns if key not in constant]
+
+    header.append("|".join(columns))
+    lines = ["|".join(_cell(row[key]) if key in row else "" for key in columns) for row in flat_rows]
+    return header, lines
+
+
+class ResultStore:
+    """Keeps the rows of truncated results so the model can page through them"""
+
+    def __init__(self, max_results: int = 50):
+        """
+        Initialize the store
+
+        Args:
+            max_results: Number of truncated results kept (least recently used are dropped)
+        """
+        self.max_results = max_results
+        self._results: "OrderedDict[str, Tuple[str, List[Dict[str, Any]]]]" = OrderedDict()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def put(self, tool_name: str, rows: List[Dict[str, Any]]) -> str:
+        """Store rows and return their handle"""
+        with self._lock:
+            self._counter += 1
+            handle = f"r{self._counter}"
+            self._results[handle] = (tool_name, rows)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+            return handle
+
+    def fetch(self, handle: str, offset: int = 0, max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        """
+        Encode the rows of a stored result starting at offset
+
+        Args:
+            handle: Handle returned by put (quoted in the truncation marker)
+            offset: Index of the first row to return
+            max_tokens: Token budget for this page
+
+        Returns:
+            Encoded page, with a new truncation marker if rows remain
+        """
+        with self._lock:
+            entry = self._results.get(handle)
+            if entry is not None:
+                self._results.move_to_end(handle)
+        if entry is None:
+            return f"error: unknown or expired handle {handle!r}"
+        tool_name, rows = entry
+        return _encode_rows(tool_name, rows, max_tokens, self, offset=max(int(offset), 0), handle=handle)
+
+
+def _encode_rows(tool_name: str, rows: List[Dict[str, Any]], max_tokens: int,
+                 store: Optional[ResultStore], offset: int = 0, handle: Optional[str] = None) -> str:
+    """Encode a list of dicts as a table limited to max_tokens"""
+    total = len(rows)
+    page = rows[offset:]
+    if not page:
+        return f"{tool_name}: no rows from offset {offset} (total {total})"
+
+    header, lines = _table_lines(page)
+    title = f"{tool_name}: {total} rows" if offset == 0 else f"{tool_name}: rows {offset}-{total - 1} of {total}"
+    output = [title] + header
+    used = estimate_tokens("\n".join(output))
+    # Reserve room for the truncation marker
+    budget = max_tokens - MARKER_TOKENS
+
+    shown = 0
+    for line in lines:
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            if shown:
+                break
+            # Always show one row, cut to what is left of the budget
+            line = line[:max(budget - used, 0) * 4] + "…"
+            cost = estimate_tokens(line)
+        output.append(line)
+        used += cost
+        shown += 1
+
+    if shown < len(page):
+        next_offset = offset + shown
+        if store is not None:
+            handle = handle or store.put(tool_name, rows)
+            output.append(f"… [truncated: showing {shown} of {len(page)} rows; "
+                          f"call fetch_more_result(handle=\"{handle}\", offset={next_offset}) for more]")
+        else:
+            output.append(f"… [truncated: showing {shown} of {len(page)} rows]")
+    return "\n".join(output)
+
+
+def _encode_value(value: Any, tool_name: str, max_tokens: int, store: Optional[ResultStore]) -> str:
+    """Encode any JSON-like value"""
+    if _is_table(value):
+        return _encode_rows(tool_name, value, max_tokens, store)
+    if isinstance(value, dict):
+        parts: List[Any] = []
+        for key, item in value.items():
+            if _is_empty(item):
+                continue
+            if _is_table(item):
+                parts.append((key, item))
+            elif isinstance(item, dict):
+                parts.extend(f"{key}.{name}: {_cell(sub)}" for name, sub in _flatten(item).items())
+            else:
+                parts.append(f"{key}: {_cell(item)}")
+        # Tables share what the plain fields leave of the budget, so each is cut
+        # (with its own marker) instead of the whole text being cut afterwards
+        tables = sum(1 for part in parts if isinstance(part, tuple))
+        if tables:
+            plain = estimate_tokens("\n".join(part for part in parts if isinstance(part, str)))
+            table_tokens = max((max_tokens - plain) // tables, MARKER_TOKENS * 3)
+        lines = [_encode_rows(part[0], part[1], table_tokens, store) if isinstance(part, tuple) else part
+                 for part in parts]
+        return "\n".join(lines) if lines else "{}"
+    if isinstance(value, list):
+        return "\n".join(_cell(item) for item in value if not _is_empty(item)) or "[]"
+    return _cell(value) if not isinstance(value, str) else value
+
+
+def encode_tool_result(result: Any,
+                       tool_name: str = "result",
+                       max_tokens: int = DEFAULT_MAX_TOKENS,
+                       store: Optional[ResultStore] = None) -> str:
+    """
+    Encode a tool result compactly for the model
+
+    Args:
+        result: Parsed tool result (list, dict, string or scalar)
+        tool_name: Name used in the table title
+        max_tokens: Estimated token budget for the encoded result
+        store: Optional ResultStore; when given, truncated rows get a fetch handle
+
+    Returns:
+        Encoded text, never much longer than max_tokens
+    """
+    text = _encode_value(result, tool_name, max_tokens, store)
+    max_chars = max_tokens * 4
+    if len(text) > max_chars:
+        # Tables are already cut to the budget; should the text still overflow,
+        # keep their markers (with the fetch handles) after the cut
+        markers = [line for line in text.split("\n") if line.startswith(TRUNCATION_PREFIX)]
+        keep = max(max_chars - sum(len(marker) + 1 for marker in markers), 0)
+        head = text[:keep]
+        text = "\n".join([head + f"\n… [truncated: {len(text) - keep} more chars]"]
+                          + [marker for marker in markers if marker not in head])
+    return text
+
+
+def mcp_result_to_python(result: Any) -> Any:
+    """
+    Extract the payload of an MCP CallToolResult as plain Python data
+
+    Prefers structuredContent (unwrapping FastMCP's {"result": ...} wrapper)
+    and otherwise parses each text content item as JSON when possible.
+
+    Args:
+        result: CallToolResult from the MCP client session
+
+    Returns:
+        Parsed result
+    """
+    structured = getattr(result, "structuredContent", None)
+    if structured:
+        if isinstance(structured, dict) and list(structured) == ["result"]:
+            return structured["result"]
+        return structured
+
+    items = []
+    for content in result.content:
+        text = getattr(content, "text", None)
+        if text is None:
+            items.append(f"[{content.type} content]")
+            continue
+        try:
+            items.append(json.loads(text))
+        except ValueError:
+            items.append(text)
+    return items[0] if len(items) == 1 else items
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Recorder for MCP JSON-RPC and LLM traffic.
+
+With TRAFFIC_LOG=path.jsonl set, every exchange is appended to one JSONL log:
+
+- stdio MCP: the server command is wrapped by this file acting as a proxy
+  (`wrap_command`), which tees each JSON-RPC line in both directions
+- HTTP MCP: claude_chat_client calls `record_exchange` for each request
+- LLM: the Anthropic/OpenAI SDK clients get an httpx client whose transport
+  tees the request and the (streamed) response body with chunk timing
+
+Lines are compact ({"ts", "ch", ...}); credentials and transport headers are
+never written: request headers are dropped, and secret fields inside bodies
+and JSON-RPC messages (SECRET_FIELDS, e.g. the MCP authorization_token that
+claude_chat_api sends to Anthropic) are replaced with REDACTED. benchmarks/replay.py serves a log back with the original or
+scaled timing.
+
+Proxy usage (what wrap_command produces):
+    python traffic_log.py --log traffic.jsonl -- uv run main.py
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional
+
+import httpx
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within a process
+    fcntl = None
+
+LOG_ENV = "TRAFFIC_LOG"
+
+# Response headers worth replaying; everything else (auth, cookies, ids) is dropped
+KEPT_HEADERS = ("content-type", "retry-after", "retry-after-ms")
+KEPT_HEADER_PREFIXES = ("x-ratelimit-", "anthropic-ratelimit-")
+
+# Stream chunks closer together than this are merged into one log entry
+CHUNK_MERGE_SECONDS = 0.01
+
+# Body/message fields (any nesting, case-insensitive) whose values are never logged
+SECRET_FIELDS = frozenset(("authorization", "authorization_token", "api_key", "x-api-key", "access_token",
+                           "refresh_token", "auth_token", "token", "password", "secret", "client_secret"))
+REDACTED = "[REDACTED]"
+
+
+def redact(value: Any) -> Any:
+    """Copy of a JSON value with the values of SECRET_FIELDS masked"""
+    if isinstance(value, dict):
+        return {key: REDACTED if isinstance(key, str) and key.lower() in SECRET_FIELDS and item is not None
+                else redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+class TrafficLog:
+    """Append-only JSONL log shared by every process that records into it"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(line)
+
+
+_logs: Dict[str, TrafficLog] = {}
+
+
+def get_log() -> Optional[TrafficLog]:
+    """The log named by TRAFFIC_LOG, or None when recording is off"""
+    path = os.getenv(LOG_ENV)
+    if not path:
+        return None
+    if path not in _logs:
+        _logs[path] = TrafficLog(path)
+    return _logs[path]
+
+
+def read_log(path: str) -> List[Dict[str, Any]]:
+    """All entries of a log, in recording order"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _body(content: bytes, content_type: str) -> Any:
+    if not content:
+        return None
+    if "json" in content_type:
+        try:
+            return json.loads(content)
+        except ValueError:
+            pass
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"binary_bytes": len(content)}
+
+
+def _kept_headers(headers) -> Dict[str, str]:
+    return {name.lower(): value for name, value in headers.items()
+            if name.lower() in KEPT_HEADERS or name.lower().startswith(KEPT_HEADER_PREFIXES)}
+
+
+def record_exchange(channel: str, request: Dict[str, Any], response: Dict[str, Any], ttfb: float,
+                    started: Optional[float] = None) -> None:
+    """
+    Record one request/response pair (no-op unless TRAFFIC_LOG is set)
+
+    Args:
+        channel: Traffic source, e.g. "mcp-http"
+        request: {"method", "path", "body"}
+        response: {"status", "headers", "body"} or {"status", "headers", "chunks"}
+        ttfb: Seconds until the response started
+        started: Wall-clock start time (defaults to now - ttfb)
+    """
+    log = get_log()
+    if log is None:
+        return
+    log.write({"ts": round(started if started is not None else time.time() - ttfb, 4), "ch": channel,
+               "req": redact(request), "res": redact(response), "ttfb": round(ttfb, 4)})
+
+
+# --- LLM (httpx) -----------------------------------------------------------
+
+class _Tape:
+    """Collects a response body as timed chunks and writes the exchange on close"""
+
+    def __init__(self, channel: str, request: httpx.Request, response: httpx.Response, started: float, ttfb: float):
+        self.channel = channel
+        self.started, self.ttfb = started, ttfb
+        self.request = {"method": request.method, "path": request.url.raw_path.decode("ascii"),
+                        "body": redact(_body(request.content, request.headers.get("content-type", "")))}
+        self.status = response.status_code
+        self.headers = _kept_headers(response.headers)
+        self.chunks: List[List[Any]] = []
+        self._t0 = time.perf_counter()
+        self._written = False
+
+    def add(self, chunk: bytes) -> None:
+        offset = round(time.perf_counter() - self._t0, 4)
+        text = chunk.decode("utf-8", errors="replace")
+        if self.chunks and offset - self.chunks[-1][0] < CHUNK_MERGE_SECONDS:
+            self.chunks[-1][1] += text
+        else:
+            self.chunks.append([offset, text])
+
+    def finish(self) -> None:
+        if self._written:
+            return
+        self._written = True
+        response: Dict[str, Any] = {"status": self.status, "headers": self.headers}
+        if "text/event-stream" in self.headers.get("content-type", ""):
+            response["chunks"] = self.chunks
+        else:
+            response["body"] = _body("".join(text for _, text in self.chunks).encode("utf-8"),
+                                     self.headers.get("content-type", ""))
+        record_exchange(self.channel, self.request, response, self.ttfb, self.started)
+
+
+class _TeeStream(httpx.SyncByteStream):
+    def __init__(self, inner, tape: _Tape):
+        self._inner, self._tape = inner, tape
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._inner:
+            self._tape.add(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            self._inner.close()
+        finally:
+            self._tape.finish()
+
+
+class _AsyncTeeStream(httpx.AsyncByteStream):
+    def __init__(self, inner, tape: _Tape):
+        self._inner, self._tape = inner, tape
+
+    async def __aiter__(self):
+        async for chunk in self._inner:
+            self._tape.add(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._inner.aclose()
+        finally:
+            self._tape.finish()
+
+
+def _plain(request: httpx.Request) -> None:
+    # Record readable bodies rather than gzip bytes
+    request.headers["accept-encoding"] = "identity"
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """httpx transport that tees every exchange into the traffic log"""
+
+    def __init__(self, channel: str, inner: Optional[httpx.BaseTransport] = None):
+        self.channel = channel
+        self.inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _plain(request)
+        started, start = time.time(), time.perf_counter()
+        response = self.inner.handle_request(request)
+        tape = _Tape(self.channel, request, response, started, time.perf_counter() - start)
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_TeeStream(response.stream, tape), extensions=response.extensions)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of RecordingTransport"""
+
+    def __init__(self, channel: str, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.channel = channel
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _plain(request)
+        started, start = time.time(), time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        tape = _Tape(self.channel, request, response, started, time.perf_counter() - start)
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_AsyncTeeStream(response.stream, tape), extensions=response.extensions)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def http_client(channel: str) -> Optional[httpx.Client]:
+    """httpx client for an SDK's `http_client=` argument; None (SDK default) when not recording"""
+    if get_log() is None:
+        return None
+    return httpx.Client(transport=RecordingTransport(channel), timeout=None)
+
+
+def async_http_client(channel: str) -> Optional[httpx.AsyncClient]:
+    """Async counterpart of http_client"""
+    if get_log() is None:
+        return None
+    return httpx.AsyncClient(transport=AsyncRecordingTransport(channel), timeout=None)
+
+
+# --- stdio MCP (proxy process) ---------------------------------------------
+
+def wrap_command(command: List[str]) -> List[str]:
+    """Server command routed through the recording proxy when TRAFFIC_LOG is set"""
+    path = os.getenv(LOG_ENV)
+    if not path:
+        return list(command)
+    return [sys.executable, os.path.abspath(__file__), "--log", os.path.abspath(path), "--", *command]
+
+
+def _pump(source, sink, log: TrafficLog, session: str, direction: str) -> None:
+    for line in iter(source.readline, b""):
+        sink.write(line)
+        sink.flush()
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        log.write({"ts": round(time.time(), 4), "ch": "mcp-stdio", "sid": session, "dir": direction,
+                   "msg": redact(message)})
+    try:
+        sink.close()
+    except OSError:
+        pass
+
+
+def proxy(command: List[str], log_path: str) -> int:
+    """Run the stdio server, teeing each JSON-RPC line; returns its exit code"""
+    log = TrafficLog(log_path)
+    session = f"{os.getpid()}-{int(time.time() * 1000)}"
+    server = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    inbound = threading.Thread(target=_pump, args=(sys.stdin.buffer, server.stdin, log, session, "c2s"), daemon=True)
+    inbound.start()
+    _pump(server.stdout, sys.stdout.buffer, log, session, "s2c")
+    return server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record a stdio MCP server's JSON-RPC traffic")
+    parser.add_argument("--log", required=True, help="JSONL file to append to")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="-- server command")
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        parser.error("missing server command after --")
+    sys.exit(proxy(command, args.log))
+
+
+if __name__ == "__main__":
+    main()
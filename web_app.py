@@ -1,15 +1,66 @@
+import time
+from typing import Any, Dict
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 from client_request2 import send_whatsapp_message
+from http_metrics import CONTENT_TYPE, MetricsRegistry
 
 app = FastAPI(title="WhatsApp Web Sender")
 
 # Configurar templates
 templates = Jinja2Templates(directory="templates")
 
+# Métricas expuestas en /metrics (formato Prometheus)
+metrics = MetricsRegistry()
+REQUEST_LATENCY = metrics.histogram(
+    "web_app_request_duration_seconds", "Request latency by route", ("method", "route", "status")
+)
+REQUESTS_IN_FLIGHT = metrics.gauge("web_app_requests_in_flight", "Requests being served")
+# Fases de /send: espera del hilo (queue), arranque del servidor MCP + initialize
+# (session), llamada a send_message (tool_call) y render de la plantilla (render)
+SEND_PHASES = metrics.histogram(
+    "web_app_send_phase_seconds", "Time spent in each phase of POST /send", ("phase",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+SEND_RESULTS = metrics.counter(
+    "web_app_send_messages_total", "send_message outcomes (success, failure, invalid, error)", ("result",)
+)
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Medir la latencia de cada petición por ruta"""
+    start = time.perf_counter()
+    status = 500
+    REQUESTS_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        # Plantilla de la ruta (no la URL) para no disparar la cardinalidad
+        route = request.scope.get("route")
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            method=request.method, route=getattr(route, "path", "unmatched"), status=str(status)
+        )
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Métricas en formato Prometheus"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+def render_index(context: Dict[str, Any]) -> HTMLResponse:
+    """Renderizar index.html midiendo el tiempo de render"""
+    start = time.perf_counter()
+    response = templates.TemplateResponse("index.html", context)
+    SEND_PHASES.observe(time.perf_counter() - start, phase="render")
+    return response
+
 @app.get("/", response_class=HTMLResponse)
 async def get_form(request: Request):
     """Mostrar el formulario para enviar mensajes"""
@@ -21,7 +72,8 @@ async def send_message(request: Request, phone_number: str = Form(...), message:
     
     # Validar inputs
     if not phone_number.strip():
-        return templates.TemplateResponse("index.html", {
+        SEND_RESULTS.inc(result="invalid")
+        return render_index({
             "request": request,
             "error": "El número de teléfono es requerido",
             "phone_number": phone_number,
@@ -29,25 +81,44 @@ async def send_message(request: Request, phone_number: str = Form(...), message:
         })
     
     if not message.strip():
-        return templates.TemplateResponse("index.html", {
+        SEND_RESULTS.inc(result="invalid")
+        return render_index({
             "request": request,
             "error": "El mensaje es requerido",
             "phone_number": phone_number,
             "message": message
         })
     
-    # Enviar mensaje
-    result = send_whatsapp_message(phone_number.strip(), message.strip())
+    # Enviar mensaje en un hilo aparte: el cliente MCP es bloqueante y no debe
+    # detener el event loop mientras arranca el servidor
+    queued = time.perf_counter()
+    
+    def send() -> Dict[str, Any]:
+        SEND_PHASES.observe(time.perf_counter() - queued, phase="queue")
+        return send_whatsapp_message(phone_number.strip(), message.strip())
+    
+    try:
+        result = await run_in_threadpool(send)
+    except Exception:
+        SEND_RESULTS.inc(result="error")
+        raise
+    
+    # El cliente puede informar la duración de sus fases en result["timings"]
+    for phase in ("session", "tool_call"):
+        if phase in (result.get("timings") or {}):
+            SEND_PHASES.observe(result["timings"][phase], phase=phase)
     
     if result["success"]:
-        return templates.TemplateResponse("index.html", {
+        SEND_RESULTS.inc(result="success")
+        return render_index({
             "request": request,
             "success": result["message"],
             "phone_number": "",
             "message": ""
         })
     else:
-        return templates.TemplateResponse("index.html", {
+        SEND_RESULTS.inc(result="failure")
+        return render_index({
             "request": request,
             "error": result["message"],
             "phone_number": phone_number,